@@ -1,17 +1,69 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, g, request, jsonify, has_request_context, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import os
+import sys
 from dotenv import load_dotenv
 import logging
 import json
 from datetime import datetime
 import re
+import hashlib
+import signal
+import sqlite3
+import threading
+import random
+import atexit
+import contextvars
+import time
+import unicodedata
+import uuid
+import zlib
+import gc
+import gzip
+import heapq
+import shutil
+from contextlib import contextmanager
+from functools import lru_cache
+from operator import itemgetter
 import spacy
+from spacy.tokens import DocBin
 import numpy as np
-from collections import Counter
-from sklearn.linear_model import LinearRegression
+import joblib
+from collections import Counter, OrderedDict, deque
+from sklearn.linear_model import LogisticRegression
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction import DictVectorizer
+from sklearn.multiclass import OneVsRestClassifier
+from sklearn.preprocessing import MultiLabelBinarizer
+
+# Optional accelerators: the service falls back to the stdlib when missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Load environment variables
 load_dotenv()
@@ -26,16 +78,831 @@ CORS(app, origins=["http://localhost:5173"], supports_credentials=True,
      allow_headers=["Content-Type", "Authorization"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
+
+def service_json_default(o):
+    """JSON default hook: analysis records become dicts, everything else as in Flask"""
+    to_dict = getattr(o, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    return DefaultJSONProvider.default(o)
+
+
+class ServiceJSONProvider(DefaultJSONProvider):
+    default = staticmethod(service_json_default)
+
+
+class OrjsonProvider(ServiceJSONProvider):
+    """
+    orjson-backed JSON provider for the large nested analysis payloads
+    Keeps Flask's behaviour (compact unless debug, same default() hook) but
+    writes UTF-8 directly instead of escaping every accented character
+    """
+    
+    options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+    
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        option = self.options | (orjson.OPT_INDENT_2 if kwargs.get('indent') else 0)
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.options | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option), mimetype=self.mimetype
+        )
+
+
+# Compact binary formats, negotiated through Accept / Content-Type
+BINARY_MIMETYPES = {}
+if msgpack:
+    BINARY_MIMETYPES.update({'application/msgpack': 'msgpack', 'application/x-msgpack': 'msgpack',
+                             'application/vnd.msgpack': 'msgpack'})
+if cbor2:
+    BINARY_MIMETYPES['application/cbor'] = 'cbor'
+
+
+class CompactSchemaEncoder:
+    """
+    Fixed-schema representation used by the binary formats
+    Every list of records sharing the same keys becomes
+    {"$s": <schema index>, "$rows": [[values...], ...]} and each distinct key
+    tuple is written once in the top-level "$schemas" table, so key strings
+    are not repeated per item. Payload: {"$schemas": [...], "$data": ...}
+    """
+    
+    def __init__(self, default):
+        self.default = default
+    
+    def encode(self, payload):
+        schemas = {}
+        data = self._transform(payload, schemas)
+        return {'$schemas': [list(keys) for keys in schemas], '$data': data}
+    
+    def _transform(self, value, schemas):
+        if isinstance(value, dict):
+            return {str(k): self._transform(v, schemas) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            if len(value) > 1 and isinstance(value[0], AnalysisRecord) \
+                    and all(type(item) is type(value[0]) for item in value):
+                # Analysis records: the slots already are the schema
+                keys = value[0].__slots__
+                index = schemas.setdefault(keys, len(schemas))
+                return {
+                    '$s': index,
+                    '$rows': [[self._transform(getattr(item, k), schemas) for k in keys] for item in value]
+                }
+            if len(value) > 1 and all(isinstance(item, dict) for item in value):
+                keys = tuple(value[0].keys())
+                if all(tuple(item.keys()) == keys for item in value):
+                    index = schemas.setdefault(keys, len(schemas))
+                    return {
+                        '$s': index,
+                        '$rows': [[self._transform(v, schemas) for v in item.values()] for item in value]
+                    }
+            return [self._transform(item, schemas) for item in value]
+        if value is None or isinstance(value, (str, bool, int, float, bytes)):
+            return value
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return self._transform(value.tolist(), schemas)
+        return self._transform(self.default(value), schemas)
+
+
+def encode_binary(payload, fmt, default):
+    compact = CompactSchemaEncoder(default).encode(payload)
+    if fmt == 'cbor':
+        return cbor2.dumps(compact)
+    return msgpack.packb(compact, use_bin_type=True)
+
+
+def negotiated_binary_format():
+    """'msgpack' / 'cbor' when the client prefers a binary format over JSON, else None"""
+    if not BINARY_MIMETYPES or not has_request_context():
+        return None
+    best = request.accept_mimetypes.best_match(['application/json'] + list(BINARY_MIMETYPES))
+    return BINARY_MIMETYPES.get(best)
+
+
+class BinaryNegotiationMixin:
+    """Lets jsonify() answer in MessagePack or CBOR when the Accept header asks for it"""
+    
+    def response(self, *args, **kwargs):
+        fmt = negotiated_binary_format()
+        if fmt is None:
+            response = super().response(*args, **kwargs)
+        else:
+            obj = self._prepare_response_obj(args, kwargs)
+            mimetype = 'application/cbor' if fmt == 'cbor' else 'application/msgpack'
+            response = self._app.response_class(encode_binary(obj, fmt, self.default), mimetype=mimetype)
+        # The representation depends on Accept whenever a binary format is available
+        if BINARY_MIMETYPES and has_request_context():
+            response.vary.add('Accept')
+        return response
+
+
+class NegotiatingJSONProvider(BinaryNegotiationMixin, ServiceJSONProvider):
+    pass
+
+
+class NegotiatingOrjsonProvider(BinaryNegotiationMixin, OrjsonProvider):
+    pass
+
+
+class ServiceRequest(Request):
+    """Request whose get_json() also decodes MessagePack and CBOR bodies"""
+    
+    def get_json(self, force=False, silent=False, cache=True):
+        fmt = BINARY_MIMETYPES.get(self.mimetype)
+        if fmt is None:
+            return super().get_json(force=force, silent=silent, cache=cache)
+        if cache and getattr(self, '_binary_body', None) is not None:
+            return self._binary_body
+        try:
+            data = self.get_data(cache=cache)
+            body = cbor2.loads(data) if fmt == 'cbor' else msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            if silent:
+                return None
+            return self.on_json_loading_failed(e)
+        if cache:
+            self._binary_body = body
+        return body
+
+
+app.request_class = ServiceRequest
+
+JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson' if orjson else 'default')
+if JSON_PROVIDER == 'orjson' and orjson:
+    app.json = NegotiatingOrjsonProvider(app)
+else:
+    app.json = NegotiatingJSONProvider(app)
+
+# Response compression, negotiated from Accept-Encoding
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_ENCODINGS = [e for e in os.getenv('COMPRESSION_ENCODINGS', 'br,gzip').split(',')
+                         if e == 'gzip' or (e == 'br' and brotli)]
+
+
+def compress_payload(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=int(os.getenv('BROTLI_QUALITY', 5)))
+    return gzip.compress(data, compresslevel=int(os.getenv('GZIP_LEVEL', 6)))
+
+
+@app.after_request
+def compress_response(response):
+    """Compress large responses with brotli or gzip when the client accepts it"""
+    if (response.direct_passthrough or response.is_streamed or not COMPRESSION_ENCODINGS
+            or response.status_code != 200 or 'Content-Encoding' in response.headers):
+        return response
+    
+    encoding = request.accept_encodings.best_match(COMPRESSION_ENCODINGS)
+    response.vary.add('Accept-Encoding')
+    if not encoding:
+        return response
+    
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+    
+    response.set_data(compress_payload(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    metrics.observe('response.compression_ratio', len(data) / max(response.content_length or 1, 1))
+    return response
+
 # Configure Gemini AI
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL', 'gemini-flash-latest')
+
+# Runtime state (trained models, indexes, caches) lives under DATA_DIR
+DATA_DIR = os.getenv('NLP_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+# Word vectors can be shared by every worker of a node through a read-only memory map
+SHARED_VECTORS = os.getenv('SHARED_VECTORS', 'false').lower() == 'true'
+SHARED_VECTORS_DIR = os.getenv('SHARED_VECTORS_DIR', os.path.join(DATA_DIR, 'vectors'))
+
+
+def share_vectors(model, directory=SHARED_VECTORS_DIR):
+    """
+    Replace the model's private vector table with a read-only np.memmap
+    The table is exported once (under a file lock, so concurrent workers do
+    not race) to <model>-<version>.npy; every process then maps the same file
+    and the OS page cache holds a single physical copy
+    """
+    vectors = model.vocab.vectors
+    table = vectors.data
+    if isinstance(table, np.memmap) or not isinstance(table, np.ndarray) or not table.size:
+        return False
+    
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, '{}-{}.npy'.format(model.meta.get('name', 'model'), model.meta.get('version', '0')))
+    with open(path + '.lock', 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        mapped = np.load(path, mmap_mode='r') if os.path.exists(path) else None
+        if mapped is None or mapped.shape != table.shape or mapped.dtype != table.dtype:
+            tmp_path = '{}.{}.tmp.npy'.format(path[:-4], os.getpid())
+            np.save(tmp_path, np.ascontiguousarray(table))
+            os.replace(tmp_path, path)
+            mapped = np.load(path, mmap_mode='r')
+            logger.info(f"Exported {table.shape[0]} word vectors to {path}")
+    
+    vectors.data = mapped
+    return True
+
 
 # Load spaCy French model for real NLP
-try: 
-    nlp = spacy.load("fr_core_news_md")
-    logger.info("spaCy French model loaded successfully")
-except: 
-    logger.warning("French spaCy model not found.  Install with: python -m spacy download fr_core_news_md")
-    nlp = None
+def load_nlp_model():
+    try: 
+        model = spacy.load("fr_core_news_md")
+        logger.info("spaCy French model loaded successfully")
+    except: 
+        logger.warning("French spaCy model not found.  Install with: python -m spacy download fr_core_news_md")
+        return None
+    
+    if SHARED_VECTORS:
+        try:
+            if share_vectors(model):
+                logger.info("Word vectors memory-mapped read-only (shared across workers)")
+        except Exception as e:
+            logger.warning(f"Could not share word vectors, keeping a private copy: {str(e)}")
+    return model
+
+
+nlp = load_nlp_model()
+
+
+
+class ServiceMetrics:
+    """
+    Small in-process metrics registry exposed on /metrics
+    Counters and gauges are plain numbers; summaries keep count/sum/max and a
+    bounded window of recent observations for percentiles
+    """
+
+    def __init__(self, window=1024):
+        self._lock = threading.Lock()
+        self._window = window
+        self.counters = Counter()
+        self.gauges = {}
+        self.summaries = {}
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self._lock:
+            summary = self.summaries.get(name)
+            if summary is None:
+                summary = {'count': 0, 'sum': 0.0, 'max': value, 'recent': deque(maxlen=self._window)}
+                self.summaries[name] = summary
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['max'] = max(summary['max'], value)
+            summary['recent'].append(value)
+
+    def ratio(self, numerator, denominator):
+        total = self.counters.get(denominator, 0)
+        return round(self.counters.get(numerator, 0) / total, 4) if total else None
+
+    def snapshot(self):
+        with self._lock:
+            summaries = {}
+            for name, summary in self.summaries.items():
+                recent = sorted(summary['recent'])
+                summaries[name] = {
+                    'count': summary['count'],
+                    'mean': round(summary['sum'] / summary['count'], 6),
+                    'max': round(summary['max'], 6),
+                    'p50': round(recent[int(0.50 * (len(recent) - 1))], 6),
+                    'p99': round(recent[int(0.99 * (len(recent) - 1))], 6)
+                }
+            return {
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'summaries': summaries
+            }
+
+
+metrics = ServiceMetrics()
+
+
+# Priority classes, most urgent first: UI calls, synchronous batches, background jobs
+PRIORITY_CLASSES = ('interactive', 'batch', 'bulk')
+request_priority = contextvars.ContextVar('request_priority', default='interactive')
+
+
+@contextmanager
+def priority_class(priority):
+    """Run the enclosed work (spaCy parses, Gemini calls) under another priority class"""
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class PriorityScheduler:
+    """
+    Concurrency limiter with priority classes and a bulkhead
+    At most `capacity` callers hold a slot; `reserved` of them can only be
+    used by interactive work, so batch and bulk traffic can never starve the
+    UI. Waiting interactive callers are always served first; batch and bulk
+    share the remaining slots by weighted fair queuing (each grant advances
+    the class's virtual time by 1 / weight, the lowest virtual time goes next)
+    """
+    
+    def __init__(self, name, capacity, reserved, weights):
+        self.name = name
+        self.capacity = max(capacity, 1)
+        self.reserved = min(max(reserved, 0), self.capacity - 1)
+        self.weights = weights
+        self._cond = threading.Condition()
+        self._queues = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._vtime = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._clock = 0.0
+        self._in_use = {priority: 0 for priority in PRIORITY_CLASSES}
+    
+    def _dispatch_locked(self):
+        while True:
+            busy = sum(self._in_use.values())
+            if busy >= self.capacity:
+                return
+            if self._queues['interactive']:
+                priority = 'interactive'
+            elif busy - self._in_use['interactive'] >= self.capacity - self.reserved:
+                return
+            else:
+                waiting = [p for p in PRIORITY_CLASSES[1:] if self._queues[p]]
+                if not waiting:
+                    return
+                priority = min(waiting, key=lambda p: self._vtime[p])
+                self._clock = self._vtime[priority]
+                self._vtime[priority] += 1.0 / self.weights.get(priority, 1.0)
+            ticket = self._queues[priority].popleft()
+            ticket['granted'] = True
+            self._in_use[priority] += 1
+            self._cond.notify_all()
+    
+    @contextmanager
+    def slot(self, priority=None):
+        priority = priority or request_priority.get()
+        if priority not in self._queues:
+            priority = 'interactive'
+        ticket = {'granted': False}
+        started = time.perf_counter()
+        with self._cond:
+            if not self._queues[priority]:
+                # An idle class does not bank credit while it was not competing
+                self._vtime[priority] = max(self._vtime[priority], self._clock)
+            self._queues[priority].append(ticket)
+            self._dispatch_locked()
+            while not ticket['granted']:
+                self._cond.wait()
+        metrics.observe('scheduler.{}.{}.queue_seconds'.format(self.name, priority), time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use[priority] -= 1
+                self._dispatch_locked()
+    
+    def stats(self):
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'reserved_interactive': self.reserved,
+                'in_use': dict(self._in_use),
+                'queued': {priority: len(queue) for priority, queue in self._queues.items()}
+            }
+
+
+SCHEDULER_WEIGHTS = {
+    'batch': float(os.getenv('SCHEDULER_BATCH_WEIGHT', 3)),
+    'bulk': float(os.getenv('SCHEDULER_BULK_WEIGHT', 1))
+}
+# spaCy parses hold the GIL for most of their time: a few slots are enough
+nlp_scheduler = PriorityScheduler('spacy', int(os.getenv('SPACY_CONCURRENCY', 4)),
+                                  int(os.getenv('SPACY_RESERVED_INTERACTIVE', 1)), SCHEDULER_WEIGHTS)
+gemini_scheduler = PriorityScheduler('gemini', int(os.getenv('GEMINI_CONCURRENCY', 8)),
+                                     int(os.getenv('GEMINI_RESERVED_INTERACTIVE', 2)), SCHEDULER_WEIGHTS)
+
+
+LEXICON_DIR = os.getenv('LEXICON_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicons'))
+LEXICON_FILES = ('risk', 'domain', 'sentiment', 'anomaly')
+RISK_IMPORTANCE_BONUS = {'high': 0.5, 'medium': 0.3, 'low': 0.1}
+
+
+class CompiledLexicon:
+    """
+    Immutable, precompiled view of the lexicon files
+    Keyword lists are turned into lemma -> labels lookups so matching a token
+    is a single dict access instead of a scan over every list
+    """
+
+    def __init__(self, raw, versions, digest):
+        self.versions = versions
+        self.version = "{}-{}".format('.'.join(versions[name] for name in LEXICON_FILES), digest[:8])
+
+        self.risk_keywords = raw['risk']
+        self.domain_keywords = raw['domain']
+        self.anomaly_contexts = raw['anomaly']
+
+        # Risk: lemma -> matched levels (a lemma may appear in several levels)
+        risk_levels = {}
+        for level, keywords in self.risk_keywords.items():
+            for keyword in keywords:
+                risk_levels.setdefault(keyword.lower(), []).append(level)
+        self.risk_levels = {lemma: tuple(levels) for lemma, levels in risk_levels.items()}
+        self.risk_bonus = {
+            lemma: sum(RISK_IMPORTANCE_BONUS.get(level, 0.1) for level in levels)
+            for lemma, levels in self.risk_levels.items()
+        }
+
+        # Domain: lemma -> domains, plus one substring pattern per domain
+        domain_lemmas = {}
+        for domain, keywords in self.domain_keywords.items():
+            for keyword in keywords:
+                domain_lemmas.setdefault(keyword.lower(), []).append(domain)
+        self.domain_lemmas = {lemma: tuple(domains) for lemma, domains in domain_lemmas.items()}
+        self.domain_patterns = {
+            domain: re.compile('|'.join(re.escape(kw.lower()) for kw in keywords))
+            for domain, keywords in self.domain_keywords.items() if keywords
+        }
+        self.domain_hits = lru_cache(maxsize=50000)(self._compute_domain_hits)
+
+        # Sentiment: positive wins over negative, as in the original rules
+        self.positive_words = frozenset(w.lower() for w in raw['sentiment'].get('positive', []))
+        self.negative_words = frozenset(w.lower() for w in raw['sentiment'].get('negative', [])) - self.positive_words
+
+    def _compute_domain_hits(self, lemma_lower, text_lower):
+        """Domains matched by a token (lemma match or keyword contained in the token text)"""
+        hits = set(self.domain_lemmas.get(lemma_lower, ()))
+        for domain, pattern in self.domain_patterns.items():
+            if domain not in hits and pattern.search(text_lower):
+                hits.add(domain)
+        return tuple(hits)
+
+
+class LexiconStore:
+    """
+    Loads the versioned lexicon files and swaps the compiled lexicon atomically
+    Readers take one snapshot (`store.current`) per analysis, so a reload never
+    affects a request that is already running and never reloads the spaCy model
+    """
+
+    def __init__(self, directory=LEXICON_DIR):
+        self.directory = directory
+        self._reload_lock = threading.Lock()
+        self.loaded_at = None
+        try:
+            self.current = self._compile()
+            self.loaded_at = datetime.now().isoformat()
+            logger.info(f"Lexicons loaded (version {self.current.version})")
+        except Exception as e:
+            logger.error(f"Could not load lexicons from {directory}: {str(e)}")
+            self.current = CompiledLexicon(
+                {'risk': {}, 'domain': {}, 'sentiment': {}, 'anomaly': {}},
+                {name: '0' for name in LEXICON_FILES},
+                'unavailable'
+            )
+
+    def _compile(self):
+        raw = {}
+        versions = {}
+        digest = hashlib.sha256()
+        for name in LEXICON_FILES:
+            with open(os.path.join(self.directory, name + '.json'), 'rb') as f:
+                content = f.read()
+            data = json.loads(content.decode('utf-8'))
+            if not isinstance(data.get('entries'), dict):
+                raise ValueError(f"Lexicon '{name}' has no 'entries' object")
+            raw[name] = data['entries']
+            versions[name] = str(data.get('version', '0'))
+            digest.update(name.encode('utf-8'))
+            digest.update(content)
+        return CompiledLexicon(raw, versions, digest.hexdigest())
+
+    def reload(self):
+        """Recompile the lexicon files; on error the active lexicon is kept"""
+        with self._reload_lock:
+            compiled = self._compile()
+            previous = self.current.version
+            self.current = compiled
+            self.loaded_at = datetime.now().isoformat()
+        logger.info(f"Lexicons reloaded: {previous} -> {compiled.version}")
+        return compiled
+
+    def status(self):
+        return {
+            'version': self.current.version,
+            'versions': self.current.versions,
+            'loaded_at': self.loaded_at,
+            'directory': self.directory
+        }
+
+
+lexicon_store = LexiconStore()
+
+
+def _reload_lexicons():
+    try:
+        lexicon_store.reload()
+    except Exception as e:
+        logger.error(f"Lexicon reload failed, keeping version {lexicon_store.current.version}: {str(e)}")
+
+
+def _reload_lexicons_on_signal(signum, frame):
+    # The handler may interrupt a thread that holds the reload lock (e.g. an
+    # /admin/reload-lexicons request): reload in a thread instead of in place
+    threading.Thread(target=_reload_lexicons, name='lexicon-reload', daemon=True).start()
+
+
+# SIGHUP reloads the lexicons (not available on Windows / outside the main thread)
+try:
+    signal.signal(signal.SIGHUP, _reload_lexicons_on_signal)
+except (AttributeError, ValueError):
+    pass
+
+
+class AnalysisRecord:
+    """
+    Compact slotted record for the per-token results of TextAnalyzer
+    Internal code reads attributes; the JSON and binary encoders turn records
+    into plain dicts only when a response is written (see to_dict)
+    """
+    
+    __slots__ = ()
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def __eq__(self, other):
+        return type(other) is type(self) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+
+class KeyTerm(AnalysisRecord):
+    __slots__ = ('text', 'lemma', 'pos', 'importance')
+    
+    def __init__(self, text, lemma, pos, importance):
+        self.text = text
+        self.lemma = lemma
+        self.pos = pos
+        self.importance = importance
+
+
+class Topic(AnalysisRecord):
+    __slots__ = ('text', 'root', 'root_lemma')
+    
+    def __init__(self, text, root, root_lemma):
+        self.text = text
+        self.root = root
+        self.root_lemma = root_lemma
+
+
+class ActionVerb(AnalysisRecord):
+    __slots__ = ('verb', 'lemma', 'objects', 'is_root')
+    
+    def __init__(self, verb, lemma, objects, is_root):
+        self.verb = verb
+        self.lemma = lemma
+        self.objects = objects
+        self.is_root = is_root
+
+
+class Relationship(AnalysisRecord):
+    __slots__ = ('verb', 'subjects', 'objects')
+    
+    def __init__(self, verb, subjects, objects):
+        self.verb = verb
+        self.subjects = subjects
+        self.objects = objects
+
+
+KEY_TERM_POS = frozenset(('NOUN', 'VERB', 'ADJ', 'PROPN'))
+REGULATION_PATTERN = re.compile(r'(ISO\s*\d+|NF\s*[A-Z]*\s*\d+|RGPD|GDPR|SOX)', re.IGNORECASE)
+
+DOC_CACHE_DIR = os.getenv('DOC_CACHE_DIR', os.path.join(DATA_DIR, 'doc_cache'))
+
+
+class DocCache:
+    """
+    Cache of parsed spaCy Docs keyed by text hash
+    An in-memory LRU sits in front of an on-disk DocBin store (one small file
+    per text, namespaced by model name/version), so a text parsed once is
+    reused across endpoints, requests and restarts instead of re-running nlp.
+    The disk store is bounded in files, bytes and age; the least recently
+    used files (by mtime, refreshed on every disk hit) are pruned first
+    """
+    
+    def __init__(self, nlp_model, capacity=None, directory=DOC_CACHE_DIR):
+        self.nlp = nlp_model
+        self.capacity = capacity or int(os.getenv('DOC_CACHE_SIZE', 512))
+        self.max_chars = int(os.getenv('DOC_CACHE_MAX_CHARS', 100000))
+        self.persist = os.getenv('DOC_CACHE_PERSIST', 'true').lower() == 'true'
+        self.max_files = int(os.getenv('DOC_CACHE_MAX_FILES', 20000))
+        self.max_bytes = int(os.getenv('DOC_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        self.ttl_seconds = float(os.getenv('DOC_CACHE_TTL_DAYS', 30)) * 86400
+        self.directory = directory
+        if nlp_model is not None:
+            self.directory = os.path.join(directory, '{}-{}'.format(
+                nlp_model.meta.get('name', 'model'), nlp_model.meta.get('version', '0')))
+        self._docs = OrderedDict()
+        self._lock = threading.Lock()
+        # (files, bytes) on disk, from a scan on the first write then kept up to date
+        self._disk_usage = None
+        self._pruning = False
+    
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.spacy')
+    
+    def _remember(self, key, doc):
+        with self._lock:
+            self._docs[key] = doc
+            self._docs.move_to_end(key)
+            while len(self._docs) > self.capacity:
+                self._docs.popitem(last=False)
+    
+    def _lookup(self, key):
+        with self._lock:
+            doc = self._docs.get(key)
+            if doc is not None:
+                self._docs.move_to_end(key)
+                metrics.increment('doc_cache.hits')
+                return doc
+        
+        if not self.persist:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                doc = next(iter(DocBin().from_bytes(f.read()).get_docs(self.nlp.vocab)))
+            # Recently used files are the last to be pruned
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Unreadable cached doc {key}: {str(e)}")
+            return None
+        metrics.increment('doc_cache.disk_hits')
+        self._remember(key, doc)
+        return doc
+    
+    def _store(self, key, doc, persist=True):
+        self._remember(key, doc)
+        if not (self.persist and persist):
+            return
+        path = self._path(key)
+        tmp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            doc_bin = DocBin(store_user_data=False)
+            doc_bin.add(doc)
+            data = doc_bin.to_bytes()
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist parsed doc: {str(e)}")
+            return
+        
+        with self._lock:
+            if self._disk_usage is not None:
+                self._disk_usage = (self._disk_usage[0] + 1, self._disk_usage[1] + len(data))
+            over = (self._disk_usage is None or self._disk_usage[0] > self.max_files
+                    or self._disk_usage[1] > self.max_bytes)
+            if over and not self._pruning:
+                self._pruning = True
+            else:
+                over = False
+        if over:
+            try:
+                self.prune()
+            finally:
+                self._pruning = False
+    
+    def prune(self):
+        """Delete expired files, then the least recently used ones down to 80% of the caps"""
+        files = []
+        now = time.time()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        count, size = len(files), sum(f[1] for f in files)
+        removed = 0
+        for mtime, file_size, path in files:
+            if (now - mtime <= self.ttl_seconds and count <= self.max_files * 0.8
+                    and size <= self.max_bytes * 0.8):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            count -= 1
+            size -= file_size
+            removed += 1
+        with self._lock:
+            self._disk_usage = (count, size)
+        if removed:
+            metrics.increment('doc_cache.pruned', removed)
+            logger.info(f"Doc cache pruned {removed} files ({count} files, {size} bytes left)")
+        return removed
+    
+    def parse(self, text, persist=True):
+        """Parsed Doc for text, from memory, disk or the model (persist=False keeps it off disk)"""
+        if len(text) > self.max_chars:
+            with nlp_scheduler.slot():
+                return self.nlp(text)
+        key = self.key(text)
+        doc = self._lookup(key)
+        if doc is None:
+            metrics.increment('doc_cache.misses')
+            with nlp_scheduler.slot():
+                doc = self.nlp(text)
+            self._store(key, doc, persist)
+        return doc
+    
+    def parse_many(self, texts, persist=True):
+        """Parse several texts, batching the cache misses through nlp.pipe"""
+        docs = {}
+        missing = {}
+        for text in texts:
+            if text in docs or text in missing:
+                continue
+            if len(text) > self.max_chars:
+                missing[text] = None
+                continue
+            key = self.key(text)
+            doc = self._lookup(key)
+            if doc is None:
+                missing[text] = key
+            else:
+                docs[text] = doc
+        
+        if missing:
+            metrics.increment('doc_cache.misses', len(missing))
+            with nlp_scheduler.slot():
+                parsed = list(self.nlp.pipe(list(missing)))
+            for (text, key), doc in zip(missing.items(), parsed):
+                if key is not None:
+                    self._store(key, doc, persist)
+                docs[text] = doc
+        return [docs[text] for text in texts]
+    
+    def swap_model(self, nlp_model):
+        """Parse with a new model; cached Docs of the old vocab are dropped from memory"""
+        with self._lock:
+            self.nlp = nlp_model
+            self._docs.clear()
+    
+    def clear(self, disk=False):
+        with self._lock:
+            self._docs.clear()
+        if disk and os.path.isdir(self.directory):
+            shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def stats(self):
+        counters = metrics.counters
+        hits, disk_hits, misses = (counters.get('doc_cache.' + name, 0) for name in ('hits', 'disk_hits', 'misses'))
+        total = hits + disk_hits + misses
+        return {
+            'size': len(self._docs),
+            'capacity': self.capacity,
+            'persist': self.persist,
+            'disk_files': self._disk_usage[0] if self._disk_usage else None,
+            'disk_bytes': self._disk_usage[1] if self._disk_usage else None,
+            'hit_rate': round((hits + disk_hits) / total, 4) if total else None
+        }
+
+
+doc_cache = DocCache(nlp)
 
 
 class TextAnalyzer:
@@ -46,30 +913,10 @@ class TextAnalyzer:
     
     def __init__(self):
         self.nlp = nlp
-        # French risk/priority keywords
-        self.risk_keywords = {
-            'high': ['urgent', 'critique', 'obligatoire', 'immédiat', 'sanction', 
-                    'amende', 'danger', 'risque', 'violation', 'non-conformité',
-                    'impératif', 'essentiel', 'prioritaire', 'grave', 'sévère'],
-            'medium':  ['important', 'nécessaire', 'recommandé', 'attention', 
-                      'surveiller', 'améliorer', 'corriger', 'modifier', 'adapter'],
-            'low':  ['optionnel', 'suggéré', 'envisager', 'considérer', 'possible',
-                   'éventuel', 'mineur', 'secondaire']
-        }
-        
-        # Domain-specific vocabulary
-        self.domain_keywords = {
-            'environnement': ['déchet', 'pollution', 'émission', 'recyclage', 'énergie', 
-                             'carbone', 'environnemental', 'écologique', 'durable'],
-            'sécurité': ['accident', 'protection', 'équipement', 'formation', 'risque',
-                        'prévention', 'sécurité', 'danger', 'incident'],
-            'qualité': ['norme', 'certification', 'processus', 'contrôle', 'audit',
-                       'conformité', 'qualité', 'amélioration', 'standard'],
-            'rh': ['employé', 'formation', 'compétence', 'recrutement', 'personnel',
-                  'ressources humaines', 'contrat', 'salaire'],
-            'finance': ['budget', 'coût', 'investissement', 'comptable', 'financier',
-                       'audit', 'fiscal', 'trésorerie']
-        }
+        # Parsed Docs are shared across endpoints and restarts (see DocCache)
+        self.docs = doc_cache
+        # Risk, domain and sentiment vocabularies live in versioned files (see LexiconStore)
+        self.lexicons = lexicon_store
     
     def analyze_text(self, text):
         """
@@ -80,13 +927,15 @@ class TextAnalyzer:
             return self._get_empty_analysis()
         
         try:
-            doc = self.nlp(text)
+            doc = self.docs.parse(text)
+            # One lexicon snapshot per analysis, so a concurrent reload cannot mix versions
+            lexicon = self.lexicons.current
             
             # 1. Named Entity Recognition
             entities = self._extract_entities(doc)
             
             # 2. Part-of-Speech analysis - extract key terms
-            key_terms = self._extract_key_terms(doc)
+            key_terms = self._extract_key_terms(doc, lexicon)
             
             # 3. Noun phrase extraction (topics)
             topics = self._extract_topics(doc)
@@ -95,16 +944,16 @@ class TextAnalyzer:
             actions = self._extract_actions(doc)
             
             # 5. Risk/Priority detection
-            risk_analysis = self._analyze_risk_level(doc)
+            risk_analysis = self._analyze_risk_level(doc, lexicon)
             
             # 6. Domain detection
-            detected_domain = self._detect_domain(doc)
+            detected_domain = self._detect_domain(doc, lexicon)
             
             # 7. Text complexity analysis
             complexity = self._analyze_complexity(doc, text)
             
             # 8. Sentiment analysis (simple rule-based for French)
-            sentiment = self._analyze_sentiment_simple(doc)
+            sentiment = self._analyze_sentiment_simple(doc, lexicon)
             
             # 9. Dependency parsing for relationships
             relationships = self._extract_relationships(doc)
@@ -119,8 +968,9 @@ class TextAnalyzer:
                 'complexity': complexity,
                 'sentiment':  sentiment,
                 'relationships': relationships,
-                'word_count': len([t for t in doc if not t.is_punct]),
-                'sentence_count': len(list(doc.sents))
+                'word_count': sum(1 for t in doc if not t.is_punct),
+                'sentence_count': sum(1 for _ in doc.sents),
+                'lexicon_version': lexicon.version
             }
         except Exception as e: 
             logger.error(f"Error in analyze_text: {str(e)}")
@@ -150,34 +1000,28 @@ class TextAnalyzer:
                 entities['other'].append({'text': ent.text, 'type': ent.label_})
         
         # Look for regulation patterns (ISO, NF, etc.)
-        regulation_patterns = re.findall(r'(ISO\s*\d+|NF\s*[A-Z]*\s*\d+|RGPD|GDPR|SOX)', doc.text, re.IGNORECASE)
+        regulation_patterns = REGULATION_PATTERN.findall(doc.text)
         entities['regulations'] = list(set(regulation_patterns))
         
         return entities
     
-    def _extract_key_terms(self, doc):
+    def _extract_key_terms(self, doc, lexicon):
         """Extract important terms using POS tagging"""
-        key_terms = []
-        
-        for token in doc: 
-            # Skip stopwords and punctuation
-            if token.is_stop or token. is_punct or token.is_space:
-                continue
-            
-            # Extract nouns, verbs, adjectives
-            if token. pos_ in ['NOUN', 'VERB', 'ADJ', 'PROPN']:
-                key_terms.append({
-                    'text': token.text,
-                    'lemma': token.lemma_,
-                    'pos': token.pos_,
-                    'importance': self._calculate_term_importance(token)
-                })
-        
-        # Sort by importance and return top terms
-        key_terms.sort(key=lambda x: x['importance'], reverse=True)
-        return key_terms[: 15]
+        # Score every candidate but only build records for the top 15
+        # (nlargest is stable, so ties keep document order as before)
+        candidates = (
+            (self._calculate_term_importance(token, lexicon), token)
+            for token in doc
+            # Skip stopwords and punctuation; keep nouns, verbs, adjectives
+            if not (token.is_stop or token.is_punct or token.is_space)
+            and token.pos_ in KEY_TERM_POS
+        )
+        return [
+            KeyTerm(token.text, token.lemma_, token.pos_, importance)
+            for importance, token in heapq.nlargest(15, candidates, key=itemgetter(0))
+        ]
     
-    def _calculate_term_importance(self, token):
+    def _calculate_term_importance(self, token, lexicon):
         """Calculate importance score for a term"""
         score = 1.0
         
@@ -194,10 +1038,7 @@ class TextAnalyzer:
             score += 0.2
         
         # Check if it's a risk keyword
-        lemma_lower = token.lemma_.lower()
-        for level, keywords in self.risk_keywords.items():
-            if lemma_lower in keywords: 
-                score += 0.5 if level == 'high' else 0.3 if level == 'medium' else 0.1
+        score += lexicon.risk_bonus.get(token.lemma_.lower(), 0.0)
         
         return score
     
@@ -207,15 +1048,12 @@ class TextAnalyzer:
         
         for chunk in doc.noun_chunks:
             # Filter out very short or stopword-only chunks
-            meaningful_tokens = [t for t in chunk if not t.is_stop and not t.is_punct]
-            if meaningful_tokens: 
-                topics.append({
-                    'text': chunk.text,
-                    'root': chunk.root. text,
-                    'root_lemma': chunk.root.lemma_
-                })
+            if any(not t.is_stop and not t.is_punct for t in chunk):
+                topics.append(Topic(chunk.text, chunk.root.text, chunk.root.lemma_))
+                if len(topics) == 10:
+                    break
         
-        return topics[: 10]
+        return topics
     
     def _extract_actions(self, doc):
         """Extract action verbs with their objects"""
@@ -226,26 +1064,19 @@ class TextAnalyzer:
                 # Find the object of this verb
                 objects = [child. text for child in token.children if child.dep_ in ['dobj', 'pobj', 'obj']]
                 
-                actions.append({
-                    'verb': token.text,
-                    'lemma': token.lemma_,
-                    'objects': objects,
-                    'is_root': token.dep_ == 'ROOT'
-                })
+                actions.append(ActionVerb(token.text, token.lemma_, objects, token.dep_ == 'ROOT'))
         
         return actions
     
-    def _analyze_risk_level(self, doc):
+    def _analyze_risk_level(self, doc, lexicon):
         """Analyze risk level based on vocabulary"""
         risk_scores = {'high': 0, 'medium': 0, 'low': 0}
         matched_keywords = {'high': [], 'medium': [], 'low': []}
         
         for token in doc: 
-            lemma_lower = token.lemma_.lower()
-            for level, keywords in self.risk_keywords. items():
-                if lemma_lower in keywords:
-                    risk_scores[level] += 1
-                    matched_keywords[level].append(token.text)
+            for level in lexicon.risk_levels.get(token.lemma_.lower(), ()):
+                risk_scores[level] = risk_scores.get(level, 0) + 1
+                matched_keywords.setdefault(level, []).append(token.text)
         
         # Determine overall risk level
         if risk_scores['high'] >= 2 or (risk_scores['high'] >= 1 and risk_scores['medium'] >= 2):
@@ -262,18 +1093,16 @@ class TextAnalyzer:
             'confidence':  min(sum(risk_scores. values()) / 5, 1.0)
         }
     
-    def _detect_domain(self, doc):
+    def _detect_domain(self, doc, lexicon):
         """Detect the domain/category of the text"""
-        domain_scores = {domain: 0 for domain in self.domain_keywords. keys()}
+        domain_scores = {domain: 0 for domain in lexicon.domain_keywords.keys()}
         
         for token in doc:
-            lemma_lower = token. lemma_.lower()
-            for domain, keywords in self.domain_keywords.items():
-                if lemma_lower in keywords or any(kw in token.text.lower() for kw in keywords):
-                    domain_scores[domain] += 1
+            for domain in lexicon.domain_hits(token.lemma_.lower(), token.text.lower()):
+                domain_scores[domain] += 1
         
         # Get the domain with highest score
-        if max(domain_scores. values()) > 0:
+        if domain_scores and max(domain_scores.values()) > 0:
             detected = max(domain_scores, key=domain_scores.get)
             confidence = domain_scores[detected] / max(sum(domain_scores. values()), 1)
         else:
@@ -334,10 +1163,10 @@ class TextAnalyzer:
             }
         }
     
-    def _analyze_sentiment_simple(self, doc):
+    def _analyze_sentiment_simple(self, doc, lexicon):
         """Simple rule-based sentiment analysis for French"""
-        positive_words = ['bon', 'bien', 'excellent', 'positif', 'succès', 'réussi', 'efficace', 'optimal', 'amélioration']
-        negative_words = ['mauvais', 'mal', 'échec', 'problème', 'risque', 'danger', 'critique', 'urgent', 'retard', 'insuffisant']
+        positive_words = lexicon.positive_words
+        negative_words = lexicon.negative_words
         
         pos_count = 0
         neg_count = 0
@@ -382,13 +1211,11 @@ class TextAnalyzer:
                     objects = [child.text for child in token.children if child.dep_ in ['dobj', 'pobj', 'obj', 'obl']]
                     
                     if subjects or objects:
-                        relationships.append({
-                            'verb': token.lemma_,
-                            'subjects': subjects,
-                            'objects': objects
-                        })
+                        relationships.append(Relationship(token.lemma_, subjects, objects))
+                        if len(relationships) == 5:
+                            return relationships
         
-        return relationships[: 5]
+        return relationships
     
     def _get_empty_analysis(self):
         """Return empty analysis structure"""
@@ -403,7 +1230,8 @@ class TextAnalyzer:
             'sentiment': {'label':  'neutre', 'polarity':  0, 'positive_count': 0, 'negative_count': 0},
             'relationships': [],
             'word_count': 0,
-            'sentence_count': 0
+            'sentence_count': 0,
+            'lexicon_version': self.lexicons.current.version
         }
     
     def calculate_text_similarity(self, text1, text2):
@@ -412,8 +1240,7 @@ class TextAnalyzer:
             return 0.5
         
         try:
-            doc1 = self. nlp(text1)
-            doc2 = self.nlp(text2)
+            doc1, doc2 = self.docs.parse_many([text1, text2])
             return doc1.similarity(doc2)
         except Exception as e:
             logger.error(f"Error calculating similarity: {str(e)}")
@@ -457,47 +1284,1654 @@ class TextAnalyzer:
 text_analyzer = TextAnalyzer()
 
 
-class NLPService: 
-    def __init__(self):
-        # FIXED: Use the correct model name from your original code
-        self.model = genai.GenerativeModel('gemini-flash-latest')
-        self.text_analyzer = text_analyzer
-        
-    def analyze_action_description(self, description, domain=None, theme=None):
-        """Analyze action plan description using real NLP + Gemini"""
+def plan_feature_text(plan):
+    """Features of a subscription plan (JSON string or list) joined into one text; None when unreadable"""
+    try:
+        features = plan.get('features', '[]')
+        if isinstance(features, str):
+            features = json.loads(features)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(features, list):
+        return None
+    return ' '.join(str(f) for f in features)
+
+
+class PlanAnalysisCache:
+    """
+    NLP analyses of subscription plans keyed by a hash of the plan name, its
+    feature text and the lexicon version. Dashboard reloads with unchanged
+    plans do no spaCy work; changed plans are parsed together in one batch
+    """
+    
+    def __init__(self, analyzer, capacity=None):
+        self.analyzer = analyzer
+        self.capacity = capacity or int(os.getenv('PLAN_CACHE_SIZE', 256))
+        self._entries = OrderedDict()
+        self._keywords = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(name, feature_text, lexicon_version):
+        return hashlib.sha1('\x00'.join([name, feature_text or '', lexicon_version]).encode('utf-8')).hexdigest()
+    
+    def analyze_many(self, plans):
+        """One entry per plan: name/feature analyses and the feature vector (for similarities)"""
+        version = self.analyzer.lexicons.current.version
+        prepared = []
+        for plan in plans:
+            name = plan.get('name') or ''
+            feature_text = plan_feature_text(plan)
+            prepared.append((self.key(name, feature_text, version), name, feature_text))
+        
+        entries = {}
+        with self._lock:
+            for key, _, _ in prepared:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    entries[key] = self._entries[key]
+        missing = [(key, name, text) for key, name, text in prepared if key not in entries]
+        metrics.increment('plan_cache.hits', len(prepared) - len(missing))
+        metrics.increment('plan_cache.misses', len(missing))
+        
+        if missing and self.analyzer.nlp:
+            texts = [t for _, name, text in missing for t in (name, text) if t]
+            try:
+                self.analyzer.docs.parse_many(texts)
+            except Exception as e:
+                logger.warning(f"Could not pre-parse plan texts: {str(e)}")
+        for key, name, feature_text in missing:
+            entries[key] = self._analyze(name, feature_text)
+        
+        with self._lock:
+            for key, _, _ in missing:
+                self._entries[key] = entries[key]
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return [entries[key] for key, _, _ in prepared]
+    
+    def _analyze(self, name, feature_text):
+        vector = None
+        if feature_text and self.analyzer.nlp:
+            doc = self.analyzer.docs.parse(feature_text)
+            if doc.has_vector:
+                vector = doc.vector.astype(np.float32)
+        return {
+            'feature_text': feature_text,
+            'name_analysis': self.analyzer.analyze_text(name) if name else None,
+            'feature_analysis': self.analyzer.analyze_text(feature_text) if feature_text else None,
+            'vector': vector
+        }
+    
+    def common_keywords(self, feature_texts):
+        """TF-IDF keywords across the plans' feature texts, memoized on the exact set of texts"""
+        key = hashlib.sha1('\x00'.join(feature_texts).encode('utf-8')).hexdigest()
+        with self._lock:
+            keywords = self._keywords.get(key)
+        if keywords is None:
+            keywords = self.analyzer.extract_keywords_tfidf(feature_texts)
+            with self._lock:
+                self._keywords[key] = keywords
+                while len(self._keywords) > 32:
+                    self._keywords.popitem(last=False)
+        return [dict(k) for k in keywords]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keywords.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'capacity': self.capacity, 'keyword_sets': len(self._keywords)}
+
+
+plan_cache = PlanAnalysisCache(text_analyzer)
+
+
+CLASSIFIER_MODEL_PATH = os.getenv('CLASSIFIER_MODEL_PATH', os.path.join(DATA_DIR, 'models', 'action_classifier.joblib'))
+CLASSIFIER_PAIRS_PATH = os.getenv('CLASSIFIER_PAIRS_PATH', os.path.join(DATA_DIR, 'classifier_pairs.jsonl'))
+PRIORITY_ALIASES = {'Haute': 'Élevée', 'Basse': 'Faible'}
+EFFORT_ALIASES = {'Haut': 'Élevé', 'Bas': 'Faible'}
+
+
+class ActionClassifier:
+    """
+    Local priority/effort/compliance-area classifier distilled from Gemini
+    Trained offline (train_classifier.py) on stored pairs of spaCy features and
+    Gemini outputs; confident predictions let /analyze-action skip Gemini
+    """
+    
+    def __init__(self, model_path=CLASSIFIER_MODEL_PATH, pairs_path=CLASSIFIER_PAIRS_PATH):
+        self.model_path = model_path
+        self.pairs_path = pairs_path
+        self.threshold = float(os.getenv('CLASSIFIER_CONFIDENCE_THRESHOLD', 0.85))
+        # Share of confident cases still sent to Gemini to measure agreement
+        self.shadow_rate = float(os.getenv('CLASSIFIER_SHADOW_RATE', 0.05))
+        self.record_pairs = os.getenv('CLASSIFIER_RECORD_PAIRS', 'true').lower() == 'true'
+        self._bundle = None
+        self._bundle_mtime = None
+        self._lock = threading.Lock()
+    
+    def features(self, nlp_analysis):
+        """Flatten a TextAnalyzer.analyze_text result into a feature dict"""
+        features = {
+            'risk_level=' + nlp_analysis['risk_analysis']['level']: 1.0,
+            'domain=' + nlp_analysis['detected_domain']['domain']: 1.0,
+            'complexity': float(nlp_analysis['complexity'].get('score', 0)),
+            'polarity': float(nlp_analysis['sentiment'].get('polarity', 0)),
+            'log_word_count': float(np.log1p(nlp_analysis.get('word_count', 0))),
+            'sentence_count': float(nlp_analysis.get('sentence_count', 0)),
+            'regulations': float(len(nlp_analysis['entities'].get('regulations', []))),
+            'organizations': float(len(nlp_analysis['entities'].get('organizations', [])))
+        }
+        for level, count in nlp_analysis['risk_analysis'].get('scores', {}).items():
+            features['risk_' + level] = float(count)
+        for domain, count in nlp_analysis['detected_domain'].get('all_scores', {}).items():
+            features['domain_score_' + domain] = float(count)
+        for term in nlp_analysis['key_terms']:
+            features['lemma=' + term.lemma.lower()] = 1.0
+        for action in nlp_analysis['actions'][:10]:
+            features['verb=' + action.lemma.lower()] = 1.0
+        return features
+    
+    def _load(self):
+        """Load (or hot-swap) the trained model when the file changes"""
         try:
-            # STEP 1: Real NLP Analysis using spaCy
-            nlp_analysis = self.text_analyzer.analyze_text(description)
-            
-            # STEP 2: Use NLP insights to enhance Gemini prompt
-            enhanced_prompt = self._create_enhanced_prompt(description, domain, theme, nlp_analysis)
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return None
+        if mtime != self._bundle_mtime:
+            with self._lock:
+                if mtime != self._bundle_mtime:
+                    try:
+                        self._bundle = joblib.load(self.model_path)
+                        logger.info(f"Action classifier loaded ({self._bundle['metadata'].get('n_samples')} samples)")
+                    except Exception as e:
+                        logger.error(f"Could not load action classifier: {str(e)}")
+                        self._bundle = None
+                    self._bundle_mtime = mtime
+        return self._bundle
+    
+    def predict(self, features):
+        """Predict priority, effort and compliance areas with a confidence in [0, 1]"""
+        bundle = self._load()
+        if bundle is None:
+            return None
+        return self._predict_with(bundle, features)
+    
+    def _predict_with(self, bundle, features):
+        try:
+            X = bundle['vectorizer'].transform([features])
             
-            # STEP 3: Generate response using Gemini with NLP context
-            response = self.model.generate_content(enhanced_prompt)
+            priority_proba = bundle['priority'].predict_proba(X)[0]
+            effort_proba = bundle['effort'].predict_proba(X)[0]
+            confidences = {
+                'priority_level': float(priority_proba.max()),
+                'estimated_effort': float(effort_proba.max())
+            }
+            prediction = {
+                'priority_level': bundle['priority'].classes_[priority_proba.argmax()],
+                'estimated_effort': bundle['effort'].classes_[effort_proba.argmax()]
+            }
             
-            # STEP 4: Parse and merge responses
-            gemini_response = self._parse_gemini_response(response. text)
+            if bundle['areas'] is not None:
+                labels = bundle['area_binarizer'].classes_
+                area_proba = bundle['areas'].predict_proba(X)[0]
+                chosen = [label for label, p in zip(labels, area_proba) if p >= 0.5]
+                prediction['compliance_areas'] = chosen or [labels[area_proba.argmax()]]
+                confidences['compliance_areas'] = float(np.min(np.maximum(area_proba, 1 - area_proba)))
             
-            # STEP 5: Merge NLP analysis with Gemini response
+            prediction['confidences'] = confidences
+            prediction['confidence'] = min(confidences.values())
+            return prediction
+        except Exception as e:
+            logger.error(f"Action classifier prediction failed: {str(e)}")
+            return None
+    
+    def should_skip_gemini(self, prediction):
+        if not prediction or prediction['confidence'] < self.threshold:
+            return False
+        return random.random() >= self.shadow_rate
+    
+    def record_pair(self, features, gemini_response):
+        """Append a (features, Gemini labels) training pair"""
+        if not self.record_pairs:
+            return
+        
+        pair = {
+            'features': features,
+            'labels': {
+                'priority_level': gemini_response.get('priority_level'),
+                'estimated_effort': gemini_response.get('estimated_effort'),
+                'compliance_areas': gemini_response.get('compliance_areas', [])
+            },
+            'lexicon_version': lexicon_store.current.version,
+            'recorded_at': datetime.now().isoformat()
+        }
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.pairs_path), exist_ok=True)
+                with open(self.pairs_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(pair, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.warning(f"Could not record classifier pair: {str(e)}")
+    
+    def record_agreement(self, prediction, gemini_response):
+        """Compare a local prediction with the Gemini answer for the same request"""
+        population = 'confident' if prediction['confidence'] >= self.threshold else 'uncertain'
+        prefix = 'classifier.{}.'.format(population)
+        metrics.increment(prefix + 'compared')
+        
+        gemini_priority = PRIORITY_ALIASES.get(gemini_response.get('priority_level'), gemini_response.get('priority_level'))
+        gemini_effort = EFFORT_ALIASES.get(gemini_response.get('estimated_effort'), gemini_response.get('estimated_effort'))
+        if prediction['priority_level'] == gemini_priority:
+            metrics.increment(prefix + 'agree_priority')
+        if prediction['estimated_effort'] == gemini_effort:
+            metrics.increment(prefix + 'agree_effort')
+        if 'compliance_areas' in prediction:
+            local_areas = set(prediction['compliance_areas'])
+            gemini_areas = set(gemini_response.get('compliance_areas', []))
+            union = local_areas | gemini_areas
+            metrics.increment(prefix + 'areas_jaccard', len(local_areas & gemini_areas) / len(union) if union else 1.0)
+    
+    def stats(self):
+        bundle = self._load()
+        agreement = {}
+        for population in ('confident', 'uncertain'):
+            prefix = 'classifier.{}.'.format(population)
+            agreement[population] = {
+                'compared': metrics.counters.get(prefix + 'compared', 0),
+                'priority': metrics.ratio(prefix + 'agree_priority', prefix + 'compared'),
+                'effort': metrics.ratio(prefix + 'agree_effort', prefix + 'compared'),
+                'areas_jaccard': metrics.ratio(prefix + 'areas_jaccard', prefix + 'compared')
+            }
+        return {
+            'model_loaded': bundle is not None,
+            'model': bundle['metadata'] if bundle else None,
+            'threshold': self.threshold,
+            'shadow_rate': self.shadow_rate,
+            'requests': metrics.counters.get('classifier.requests', 0),
+            'skipped_gemini': metrics.counters.get('classifier.skipped_gemini', 0),
+            'skip_rate': metrics.ratio('classifier.skipped_gemini', 'classifier.requests'),
+            'agreement_with_gemini': agreement
+        }
+    
+    def train(self, pairs, min_area_support=5, test_size=0.2, seed=42):
+        """Fit the classifier on recorded pairs, report holdout metrics and save it"""
+        pairs = [p for p in pairs if p.get('labels', {}).get('priority_level') and p['labels'].get('estimated_effort')]
+        if len(pairs) < 20:
+            raise ValueError("Au moins 20 paires annotées sont nécessaires ({} disponibles)".format(len(pairs)))
+        
+        X_dicts = [p['features'] for p in pairs]
+        y_priority = np.array([PRIORITY_ALIASES.get(p['labels']['priority_level'], p['labels']['priority_level']) for p in pairs])
+        y_effort = np.array([EFFORT_ALIASES.get(p['labels']['estimated_effort'], p['labels']['estimated_effort']) for p in pairs])
+        area_counts = Counter(a for p in pairs for a in set(p['labels'].get('compliance_areas') or []))
+        kept_areas = sorted(a for a, c in area_counts.items() if c >= min_area_support)
+        y_areas = [[a for a in (p['labels'].get('compliance_areas') or []) if a in kept_areas] for p in pairs]
+        
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(len(pairs))
+        n_test = max(int(len(pairs) * test_size), 1)
+        test_idx, train_idx = order[:n_test], order[n_test:]
+        for target, y in (('priorité', y_priority), ('effort', y_effort)):
+            if len(set(y[train_idx])) < 2:
+                raise ValueError("Au moins deux classes de {} sont nécessaires pour l'entraînement ({} trouvée(s))".format(
+                    target, len(set(y[train_idx]))))
+        
+        def fit(indices):
+            vectorizer = DictVectorizer(sparse=True)
+            X = vectorizer.fit_transform([X_dicts[i] for i in indices])
+            bundle = {
+                'vectorizer': vectorizer,
+                'priority': LogisticRegression(max_iter=1000).fit(X, y_priority[indices]),
+                'effort': LogisticRegression(max_iter=1000).fit(X, y_effort[indices]),
+                'areas': None,
+                'area_binarizer': None
+            }
+            if len(kept_areas) >= 2:
+                binarizer = MultiLabelBinarizer(classes=kept_areas)
+                Y = binarizer.fit_transform([y_areas[i] for i in indices])
+                if (Y.sum(axis=0) > 0).all() and (Y.sum(axis=0) < len(indices)).all():
+                    bundle['areas'] = OneVsRestClassifier(LogisticRegression(max_iter=1000)).fit(X, Y)
+                    bundle['area_binarizer'] = binarizer
+            return bundle
+        
+        # Holdout evaluation: accuracy overall and on the confident subset
+        holdout_bundle = fit(train_idx)
+        evaluated = 0
+        confident = 0
+        confident_correct = 0
+        correct = Counter()
+        for i in test_idx:
+            prediction = self._predict_with(holdout_bundle, X_dicts[i])
+            if prediction is None:
+                continue
+            evaluated += 1
+            both = prediction['priority_level'] == y_priority[i] and prediction['estimated_effort'] == y_effort[i]
+            correct['priority'] += prediction['priority_level'] == y_priority[i]
+            correct['effort'] += prediction['estimated_effort'] == y_effort[i]
+            if prediction['confidence'] >= self.threshold:
+                confident += 1
+                confident_correct += both
+        
+        bundle = fit(np.arange(len(pairs)))
+        bundle['metadata'] = {
+            'trained_at': datetime.now().isoformat(),
+            'n_samples': len(pairs),
+            'compliance_areas': kept_areas if bundle['areas'] is not None else [],
+            'lexicon_versions': sorted(set(p.get('lexicon_version') or 'unknown' for p in pairs)),
+            'holdout': {
+                'samples': evaluated,
+                'failed_predictions': len(test_idx) - evaluated,
+                'priority_accuracy': round(correct['priority'] / evaluated, 4) if evaluated else None,
+                'effort_accuracy': round(correct['effort'] / evaluated, 4) if evaluated else None,
+                'threshold': self.threshold,
+                'expected_skip_rate': round(confident / evaluated, 4) if evaluated else None,
+                'confident_accuracy': round(confident_correct / confident, 4) if confident else None
+            }
+        }
+        
+        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        tmp_path = self.model_path + '.tmp'
+        joblib.dump(bundle, tmp_path)
+        os.replace(tmp_path, self.model_path)
+        self._bundle = None
+        self._bundle_mtime = None
+        return bundle['metadata']
+
+
+action_classifier = ActionClassifier()
+
+
+DUPLICATE_INDEX_PATH = os.getenv('DUPLICATE_INDEX_PATH', os.path.join(DATA_DIR, 'duplicate_index.joblib'))
+# Largest prime below 2**32: keeps (a * h + b) inside uint64 and signatures inside uint32
+_MINHASH_PRIME = 4294967291
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index over normalized action descriptions
+    Signatures are kept in one contiguous uint32 matrix; each LSH band is a
+    sorted key array (binary search) plus a small dict of recent inserts that is
+    merged in bulk, so lookups stay sub-millisecond at hundreds of thousands of rows
+    """
+    
+    def __init__(self, num_perm=64, bands=8, shingle_size=5, path=DUPLICATE_INDEX_PATH):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        self.path = path
+        self.persist = os.getenv('DUPLICATE_INDEX_PERSIST', 'true').lower() == 'true'
+        self.reuse_threshold = float(os.getenv('DUPLICATE_REUSE_THRESHOLD', 0.9))
+        self.save_every = int(os.getenv('DUPLICATE_INDEX_SAVE_EVERY', 200))
+        self.compact_fraction = float(os.getenv('DUPLICATE_INDEX_COMPACT_FRACTION', 0.25))
+        
+        # Fixed seed: signatures must stay comparable across restarts
+        rng = np.random.RandomState(20240101)
+        self._a = rng.randint(1, _MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.randint(1, 2 ** 63, size=self.rows_per_band, dtype=np.uint64) | np.uint64(1)
+        
+        self._lock = threading.RLock()
+        self._saving = False
+        self._reset()
+        if self.persist:
+            self.load()
+    
+    def _reset(self):
+        self._signatures = np.zeros((1024, self.num_perm), dtype=np.uint32)
+        self._size = 0
+        self._row_keys = []
+        self._key_rows = {}
+        self._analyses = {}
+        self._sorted_keys = [np.zeros(0, dtype=np.uint64) for _ in range(self.bands)]
+        self._sorted_rows = [np.zeros(0, dtype=np.int64) for _ in range(self.bands)]
+        self._pending = [{} for _ in range(self.bands)]
+        self._pending_count = 0
+        self._dirty = 0
+    
+    def __len__(self):
+        return len(self._key_rows)
+    
+    # ----- hashing -----
+    
+    def normalize(self, text):
+        text = unicodedata.normalize('NFKD', text.lower())
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+        return ' '.join(re.findall(r'\w+', text))
+    
+    def signature(self, text):
+        normalized = self.normalize(text)
+        k = self.shingle_size
+        if len(normalized) <= k:
+            shingles = {normalized}
+        else:
+            shingles = {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+        hashes = np.fromiter((zlib.crc32(sh.encode('utf-8')) for sh in shingles), dtype=np.uint64, count=len(shingles))
+        return ((hashes[:, None] * self._a + self._b) % np.uint64(_MINHASH_PRIME)).min(axis=0).astype(np.uint32)
+    
+    def _band_keys(self, signatures):
+        """uint64 bucket key per band, for one (n_perm,) or many (n, n_perm) signatures"""
+        bands = signatures.reshape(-1, self.bands, self.rows_per_band).astype(np.uint64)
+        return (bands * self._band_mix).sum(axis=2)
+    
+    # ----- mutation -----
+    
+    def add(self, key, text, analysis=None, context=None):
+        """Index (or re-index) a description; optionally store its analysis for reuse"""
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)[0]
+        with self._lock:
+            if key in self._key_rows:
+                self._remove_locked(key)
+            row = self._size
+            if row == len(self._signatures):
+                grown = np.zeros((len(self._signatures) * 2, self.num_perm), dtype=np.uint32)
+                grown[:row] = self._signatures[:row]
+                self._signatures = grown
+            self._signatures[row] = signature
+            self._size += 1
+            self._row_keys.append(key)
+            self._key_rows[key] = row
+            if analysis is not None:
+                self._analyses[row] = (context, json.dumps(analysis, ensure_ascii=False).encode('utf-8'))
+            for band, band_key in enumerate(band_keys.tolist()):
+                self._pending[band].setdefault(band_key, []).append(row)
+            self._pending_count += 1
+            if self._pending_count >= 4096:
+                self._merge_pending_locked()
+            self._dirty += 1
+            should_save = self.persist and self._dirty >= self.save_every
+        if should_save:
+            self.save_in_background()
+        return row
+    
+    def remove(self, key):
+        with self._lock:
+            if key not in self._key_rows:
+                return False
+            self._remove_locked(key)
+            self._dirty += 1
+            return True
+    
+    def _remove_locked(self, key):
+        # Rows are tombstoned; their bucket entries are filtered at query time
+        row = self._key_rows.pop(key)
+        self._row_keys[row] = None
+        self._analyses.pop(row, None)
+    
+    def _merge_pending_locked(self):
+        for band in range(self.bands):
+            if not self._pending[band]:
+                continue
+            new_keys = []
+            new_rows = []
+            for band_key, rows in self._pending[band].items():
+                new_keys.extend([band_key] * len(rows))
+                new_rows.extend(rows)
+            keys = np.concatenate([self._sorted_keys[band], np.array(new_keys, dtype=np.uint64)])
+            rows = np.concatenate([self._sorted_rows[band], np.array(new_rows, dtype=np.int64)])
+            order = np.argsort(keys, kind='stable')
+            self._sorted_keys[band] = keys[order]
+            self._sorted_rows[band] = rows[order]
+            self._pending[band] = {}
+        self._pending_count = 0
+    
+    # ----- queries -----
+    
+    def query(self, text, threshold=0.8, limit=10):
+        """Indexed descriptions whose estimated Jaccard similarity is >= threshold"""
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)[0].tolist()
+        with self._lock:
+            candidates = set()
+            for band, band_key in enumerate(band_keys):
+                keys = self._sorted_keys[band]
+                lo = np.searchsorted(keys, np.uint64(band_key), side='left')
+                hi = np.searchsorted(keys, np.uint64(band_key), side='right')
+                if hi > lo:
+                    candidates.update(self._sorted_rows[band][lo:hi].tolist())
+                candidates.update(self._pending[band].get(band_key, ()))
+            candidates = [row for row in candidates if self._row_keys[row] is not None]
+            if not candidates:
+                return []
+            rows = np.array(candidates, dtype=np.int64)
+            similarities = (self._signatures[rows] == signature).mean(axis=1)
+            matches = [
+                (float(sim), int(row)) for sim, row in zip(similarities, rows) if sim >= threshold
+            ]
+            matches.sort(reverse=True)
+            return [
+                {
+                    'id': self._row_keys[row],
+                    'similarity': round(sim, 4),
+                    'has_analysis': row in self._analyses,
+                    '_row': row
+                }
+                for sim, row in matches[:limit]
+            ]
+    
+    def find_reusable_analysis(self, text, context, lexicon_version):
+        """Stored analysis of a near-duplicate with the same domain/theme and lexicon version"""
+        for match in self.query(text, threshold=self.reuse_threshold, limit=5):
+            with self._lock:
+                # The row may have been renumbered by a compaction since the query
+                row = self._key_rows.get(match['id'])
+                stored = self._analyses.get(row) if row is not None else None
+            if stored is None or stored[0] != context:
+                continue
+            analysis = json.loads(stored[1])
+            if analysis.get('nlp_insights', {}).get('lexicon_version') != lexicon_version:
+                continue
+            analysis['duplicate_of'] = {'id': match['id'], 'similarity': match['similarity']}
+            return analysis
+        return None
+    
+    def compact(self):
+        """Drop tombstoned rows: renumber the live ones and rebuild the band tables"""
+        with self._lock:
+            live = np.array([row for row, key in enumerate(self._row_keys) if key is not None], dtype=np.int64)
+            renumber = {int(row): new_row for new_row, row in enumerate(live.tolist())}
+            signatures = np.zeros((max(1024, len(live) * 2), self.num_perm), dtype=np.uint32)
+            signatures[:len(live)] = self._signatures[live]
+            row_keys = [self._row_keys[row] for row in live.tolist()]
+            analyses = {renumber[row]: stored for row, stored in self._analyses.items() if row in renumber}
+            dirty = self._dirty
+            self._reset()
+            self._signatures = signatures
+            self._size = len(live)
+            self._row_keys = row_keys
+            self._key_rows = {key: row for row, key in enumerate(row_keys)}
+            self._analyses = analyses
+            self._dirty = dirty
+            self._rebuild_bands_locked()
+    
+    def _rebuild_bands_locked(self):
+        """Band tables of all live rows in one vectorized pass"""
+        live = np.array(sorted(self._key_rows.values()), dtype=np.int64)
+        if len(live):
+            band_keys = self._band_keys(self._signatures[live])
+            for band in range(self.bands):
+                order = np.argsort(band_keys[:, band], kind='stable')
+                self._sorted_keys[band] = band_keys[order, band]
+                self._sorted_rows[band] = live[order]
+    
+    def analysis_key(self, text, context):
+        return 'analysis:' + hashlib.sha1('|'.join([self.normalize(text)] + list(context)).encode('utf-8')).hexdigest()
+    
+    def stats(self):
+        return {
+            'descriptions': len(self),
+            'with_analysis': len(self._analyses),
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+            'reuse_threshold': self.reuse_threshold,
+            'tombstones': self._size - len(self),
+            'signature_bytes': int(self._size * self.num_perm * 4)
+        }
+    
+    # ----- persistence -----
+    
+    def save(self):
+        with self._lock:
+            # Compact first when too many rows are tombstones (removed or re-indexed descriptions)
+            if self._size - len(self) > self._size * self.compact_fraction:
+                self.compact()
+            state = {
+                'num_perm': self.num_perm,
+                'bands': self.bands,
+                'shingle_size': self.shingle_size,
+                'signatures': self._signatures[:self._size].copy(),
+                'row_keys': list(self._row_keys),
+                'analyses': dict(self._analyses)
+            }
+            self._dirty = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            joblib.dump(state, tmp_path)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist duplicate index: {str(e)}")
+    
+    def save_in_background(self):
+        with self._lock:
+            if self._saving:
+                return
+            self._saving = True
+        
+        def run():
+            try:
+                self.save()
+            finally:
+                self._saving = False
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            state = joblib.load(self.path)
+            if (state['num_perm'], state['bands'], state['shingle_size']) != (self.num_perm, self.bands, self.shingle_size):
+                logger.warning("Duplicate index parameters changed - starting from an empty index")
+                return
+            with self._lock:
+                self._reset()
+                signatures = state['signatures']
+                size = len(signatures)
+                self._signatures = np.zeros((max(1024, size * 2), self.num_perm), dtype=np.uint32)
+                self._signatures[:size] = signatures
+                self._size = size
+                self._row_keys = state['row_keys']
+                self._key_rows = {key: row for row, key in enumerate(self._row_keys) if key is not None}
+                self._analyses = state['analyses']
+                self._rebuild_bands_locked()
+            logger.info(f"Duplicate index loaded ({len(self)} descriptions)")
+        except Exception as e:
+            logger.error(f"Could not load duplicate index: {str(e)}")
+
+
+duplicate_index = NearDuplicateIndex()
+if duplicate_index.persist:
+    atexit.register(duplicate_index.save)
+
+
+EMBEDDING_INDEX_DIR = os.getenv('EMBEDDING_INDEX_DIR', os.path.join(DATA_DIR, 'embedding_index'))
+
+
+class EmbeddingIndex:
+    """
+    Semantic search index over regulatory texts and action plans
+    Unit-normalized spaCy document vectors live in one contiguous float32
+    matrix (row -> id list, id -> row dict). Deleting moves the last row into
+    the hole so the live rows stay packed, and a top-k query is one batched
+    matrix product. The matrix is saved as .npy and memory-mapped on load
+    """
+    
+    def __init__(self, directory=EMBEDDING_INDEX_DIR):
+        self.directory = directory
+        self.persist = os.getenv('EMBEDDING_INDEX_PERSIST', 'true').lower() == 'true'
+        self.save_every = int(os.getenv('EMBEDDING_INDEX_SAVE_EVERY', 200))
+        self.query_batch = int(os.getenv('EMBEDDING_QUERY_BATCH', 256))
+        self._lock = threading.RLock()
+        self._saving = False
+        self._dirty = 0
+        self._reset(0)
+        if self.persist:
+            self.load()
+    
+    def _reset(self, dim):
+        self.dim = dim
+        self._vectors = np.zeros((1024 if dim else 0, dim), dtype=np.float32)
+        self._size = 0
+        self._ids = []
+        self._rows = {}
+        self._items = []
+    
+    def __len__(self):
+        return self._size
+    
+    def embed(self, texts, persist=True):
+        """Unit-normalized document vectors (float32) and a mask of texts that have one"""
+        docs = doc_cache.parse_many(texts, persist=persist)
+        dim = doc_cache.nlp.vocab.vectors_length
+        matrix = np.zeros((len(docs), dim), dtype=np.float32)
+        for i, doc in enumerate(docs):
+            if doc.has_vector:
+                matrix[i] = doc.vector
+        norms = np.linalg.norm(matrix, axis=1)
+        valid = norms > 0
+        matrix[valid] /= norms[valid, None]
+        return matrix, valid
+    
+    def add_many(self, items):
+        """Index (or re-index) [{'id', 'text', 'kind'?, 'title'?}]; returns the ids that had no vector"""
+        if not items:
+            return []
+        matrix, valid = self.embed([item['text'] for item in items])
+        skipped = []
+        with self._lock:
+            if not self.dim:
+                self._reset(matrix.shape[1])
+            for item, vector, ok in zip(items, matrix, valid):
+                item_id = str(item['id'])
+                if not ok:
+                    skipped.append(item_id)
+                    continue
+                row = self._rows.get(item_id)
+                if row is None:
+                    row = self._size
+                    if row == len(self._vectors):
+                        grown = np.zeros((max(1024, len(self._vectors) * 2), self.dim), dtype=np.float32)
+                        grown[:row] = self._vectors[:row]
+                        self._vectors = grown
+                    self._size += 1
+                    self._ids.append(item_id)
+                    self._items.append(None)
+                    self._rows[item_id] = row
+                self._vectors[row] = vector
+                self._items[row] = {'kind': item.get('kind'), 'title': item.get('title')}
+                self._dirty += 1
+            should_save = self.persist and self._dirty >= self.save_every
+        if should_save:
+            self.save_in_background()
+        return skipped
+    
+    def remove(self, item_id):
+        with self._lock:
+            row = self._rows.pop(str(item_id), None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                # Keep the live rows contiguous: move the last row into the hole
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = self._ids[last]
+                self._items[row] = self._items[last]
+                self._rows[self._ids[row]] = row
+            self._ids.pop()
+            self._items.pop()
+            self._size = last
+            self._dirty += 1
+            return True
+    
+    def search(self, texts, k=10, kind=None, min_score=None):
+        """Top-k cosine matches for each query text (one list of matches per text)"""
+        # Ad-hoc queries are never written to the on-disk doc cache
+        queries, valid = self.embed(texts, persist=False)
+        results = [[] for _ in texts]
+        with self._lock:
+            size = self._size
+            if not size or not valid.any():
+                return results
+            matrix = self._vectors[:size]
+            excluded = None
+            if kind is not None:
+                excluded = np.fromiter((item['kind'] != kind for item in self._items), dtype=bool, count=size)
+            k = min(max(k, 1), size)
+            query_rows = np.flatnonzero(valid)
+            for start in range(0, len(query_rows), self.query_batch):
+                batch = query_rows[start:start + self.query_batch]
+                scores = queries[batch] @ matrix.T
+                if excluded is not None:
+                    scores[:, excluded] = -np.inf
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                top_scores = np.take_along_axis(scores, top, axis=1)
+                order = np.argsort(-top_scores, axis=1, kind='stable')
+                top = np.take_along_axis(top, order, axis=1)
+                top_scores = np.take_along_axis(top_scores, order, axis=1)
+                for query_row, rows, row_scores in zip(batch, top, top_scores):
+                    results[query_row] = [
+                        {'id': self._ids[row], 'score': round(float(score), 4),
+                         'kind': self._items[row]['kind'], 'title': self._items[row]['title']}
+                        for row, score in zip(rows.tolist(), row_scores.tolist())
+                        if score != -np.inf and (min_score is None or score >= min_score)
+                    ]
+        return results
+    
+    def stats(self):
+        return {
+            'items': self._size,
+            'dimensions': self.dim,
+            'vector_bytes': int(self._size * self.dim * 4),
+            'memory_mapped': isinstance(self._vectors, np.memmap)
+        }
+    
+    # ----- persistence -----
+    
+    def save(self):
+        with self._lock:
+            vectors = np.array(self._vectors[:self._size])
+            meta = {'dim': self.dim, 'ids': list(self._ids), 'items': list(self._items)}
+            self._dirty = 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            vectors_path = os.path.join(self.directory, 'vectors.npy')
+            meta_path = os.path.join(self.directory, 'meta.json')
+            np.save(vectors_path + '.tmp.npy', vectors)
+            with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(vectors_path + '.tmp.npy', vectors_path)
+            os.replace(meta_path + '.tmp', meta_path)
+        except OSError as e:
+            logger.warning(f"Could not persist embedding index: {str(e)}")
+    
+    def save_in_background(self):
+        with self._lock:
+            if self._saving:
+                return
+            self._saving = True
+        
+        def run():
+            try:
+                self.save()
+            finally:
+                self._saving = False
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def load(self):
+        vectors_path = os.path.join(self.directory, 'vectors.npy')
+        meta_path = os.path.join(self.directory, 'meta.json')
+        if not (os.path.exists(vectors_path) and os.path.exists(meta_path)):
+            return
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            # Copy-on-write map: pages are read from the file and only copied when a row changes
+            vectors = np.load(vectors_path, mmap_mode='c')
+            if vectors.shape != (len(meta['ids']), meta['dim']):
+                logger.warning("Embedding index files do not match - starting from an empty index")
+                return
+            with self._lock:
+                self.dim = meta['dim']
+                self._vectors = vectors
+                self._size = len(meta['ids'])
+                self._ids = meta['ids']
+                self._items = meta['items']
+                self._rows = {item_id: row for row, item_id in enumerate(self._ids)}
+            logger.info(f"Embedding index loaded ({self._size} items)")
+        except Exception as e:
+            logger.error(f"Could not load embedding index: {str(e)}")
+
+
+embedding_index = EmbeddingIndex()
+if embedding_index.persist:
+    atexit.register(embedding_index.save)
+
+
+KEYWORD_INDEX_PATH = os.getenv('KEYWORD_INDEX_PATH', os.path.join(DATA_DIR, 'keyword_index.joblib'))
+
+
+def _append_varint(out, value):
+    """LEB128: 7 bits per byte, high bit set on every byte but the last"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varints(buffer):
+    """Vectorized LEB128 decoding of a whole posting list into a uint64 array"""
+    data = np.frombuffer(bytes(buffer), dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = (7 * (np.arange(len(data)) - starts[group])).astype(np.uint64)
+    return np.add.reduceat((data & 0x7F).astype(np.uint64) << shifts, starts)
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index over the lemmas of indexed texts
+    Documents get increasing internal numbers, so each term's posting list is
+    an append-only byte string of varint (docnum delta, term frequency) pairs.
+    Lists are decoded with NumPy at query time (decoded lists are cached until
+    the term changes) and scored into a dense array; deleted or re-indexed
+    documents are tombstoned and dropped when the index is compacted
+    """
+    
+    def __init__(self, path=KEYWORD_INDEX_PATH, k1=1.2, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.persist = os.getenv('KEYWORD_INDEX_PERSIST', 'true').lower() == 'true'
+        self.save_every = int(os.getenv('KEYWORD_INDEX_SAVE_EVERY', 200))
+        self._lock = threading.RLock()
+        self._saving = False
+        self._dirty = 0
+        self._reset()
+        if self.persist:
+            self.load()
+    
+    def _reset(self):
+        self._postings = {}
+        self._last_doc = {}
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._doc_ids = []
+        self._titles = []
+        self._docnums = {}
+        self._live = 0
+        self._total_length = 0
+        self._decoded = OrderedDict()
+    
+    def __len__(self):
+        return self._live
+    
+    @staticmethod
+    def terms(doc):
+        return [t.lemma_.lower() for t in doc if not (t.is_stop or t.is_punct or t.is_space) and t.lemma_.strip()]
+    
+    def _parse(self, texts):
+        # Only POS tags and lemmas are needed: skip the parser and NER
+        with nlp_scheduler.slot():
+            return list(doc_cache.nlp.pipe(texts, disable=['parser', 'ner']))
+    
+    def add_many(self, items):
+        """Index (or re-index) [{'id', 'text', 'title'?}]; returns the number of documents indexed"""
+        indexed = 0
+        for item, doc in zip(items, self._parse([item['text'] for item in items])):
+            counts = Counter(self.terms(doc))
+            if not counts:
+                continue
+            with self._lock:
+                self._add_locked(str(item['id']), item.get('title'), counts)
+            indexed += 1
+        with self._lock:
+            should_save = self.persist and self._dirty >= self.save_every
+        if should_save:
+            self.save_in_background()
+        return indexed
+    
+    def _add_locked(self, item_id, title, counts):
+        if item_id in self._docnums:
+            self._remove_locked(item_id)
+        docnum = len(self._doc_ids)
+        if docnum == len(self._lengths):
+            grown = np.zeros(len(self._lengths) * 2, dtype=np.float32)
+            grown[:docnum] = self._lengths
+            self._lengths = grown
+        length = sum(counts.values())
+        self._lengths[docnum] = length
+        self._doc_ids.append(item_id)
+        self._titles.append(title)
+        self._docnums[item_id] = docnum
+        self._live += 1
+        self._total_length += length
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = bytearray()
+            _append_varint(postings, docnum - self._last_doc.get(term, 0))
+            _append_varint(postings, tf)
+            self._last_doc[term] = docnum
+        self._dirty += 1
+    
+    def remove(self, item_id):
+        with self._lock:
+            if str(item_id) not in self._docnums:
+                return False
+            self._remove_locked(str(item_id))
+            return True
+    
+    def _remove_locked(self, item_id):
+        docnum = self._docnums.pop(item_id)
+        self._total_length -= int(self._lengths[docnum])
+        self._lengths[docnum] = 0
+        self._doc_ids[docnum] = None
+        self._live -= 1
+        self._dirty += 1
+    
+    def _posting_arrays(self, term):
+        """(docnums, term frequencies) of a term, decoded once per version of its posting list"""
+        postings = self._postings.get(term)
+        if not postings:
+            return None
+        cached = self._decoded.get(term)
+        if cached is not None and cached[0] == len(postings):
+            self._decoded.move_to_end(term)
+            return cached[1], cached[2]
+        values = _decode_varints(postings)
+        docnums = np.cumsum(values[0::2]).astype(np.int64)
+        tfs = values[1::2].astype(np.float32)
+        self._decoded[term] = (len(postings), docnums, tfs)
+        if len(self._decoded) > 4096:
+            self._decoded.popitem(last=False)
+        return docnums, tfs
+    
+    def search(self, query, k=10, operator='or'):
+        """BM25 top-k for the lemmas of query; operator 'and' requires every term"""
+        terms = list(dict.fromkeys(self.terms(next(iter(self._parse([query]))))))
+        with self._lock:
+            if not terms or not self._live:
+                return [], terms
+            count = len(self._doc_ids)
+            lengths = self._lengths[:count]
+            live = lengths > 0
+            avg_length = self._total_length / self._live
+            norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            scores = np.zeros(count, dtype=np.float32)
+            matched = np.zeros(count, dtype=np.int32)
+            for term in terms:
+                arrays = self._posting_arrays(term)
+                if arrays is None:
+                    if operator == 'and':
+                        return [], terms
+                    continue
+                docnums, tfs = arrays
+                keep = live[docnums]
+                docnums, tfs = docnums[keep], tfs[keep]
+                df = len(docnums)
+                if not df:
+                    continue
+                idf = np.log(1 + (self._live - df + 0.5) / (df + 0.5))
+                scores[docnums] += idf * tfs * (self.k1 + 1) / (tfs + norm[docnums])
+                matched[docnums] += 1
+            
+            candidates = np.flatnonzero(matched == len(terms)) if operator == 'and' else np.flatnonzero(matched)
+            if not len(candidates):
+                return [], terms
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return [
+                {'id': self._doc_ids[d], 'score': round(float(scores[d]), 4),
+                 'matched_terms': int(matched[d]), 'title': self._titles[d]}
+                for d in candidates.tolist()
+            ], terms
+    
+    def compact(self):
+        """Rewrite posting lists without tombstoned documents and renumber the live ones"""
+        with self._lock:
+            count = len(self._doc_ids)
+            live = self._lengths[:count] > 0
+            renumber = np.cumsum(live) - 1
+            postings = {}
+            last_doc = {}
+            for term in list(self._postings):
+                docnums, tfs = self._posting_arrays(term)
+                keep = live[docnums]
+                if not keep.any():
+                    continue
+                new_docnums = renumber[docnums[keep]]
+                encoded = bytearray()
+                previous = 0
+                for docnum, tf in zip(new_docnums.tolist(), tfs[keep].astype(np.int64).tolist()):
+                    _append_varint(encoded, docnum - previous)
+                    _append_varint(encoded, tf)
+                    previous = docnum
+                postings[term] = encoded
+                last_doc[term] = previous
+            kept = np.flatnonzero(live)
+            lengths = np.zeros(max(1024, len(kept) * 2), dtype=np.float32)
+            lengths[:len(kept)] = self._lengths[kept]
+            self._postings = postings
+            self._last_doc = last_doc
+            self._lengths = lengths
+            self._doc_ids = [self._doc_ids[d] for d in kept.tolist()]
+            self._titles = [self._titles[d] for d in kept.tolist()]
+            self._docnums = {item_id: docnum for docnum, item_id in enumerate(self._doc_ids)}
+            self._decoded.clear()
+    
+    def stats(self):
+        return {
+            'documents': self._live,
+            'tombstones': len(self._doc_ids) - self._live,
+            'terms': len(self._postings),
+            'postings_bytes': sum(len(p) for p in self._postings.values())
+        }
+    
+    # ----- persistence -----
+    
+    def save(self):
+        with self._lock:
+            # Compact first when more than a quarter of the documents are tombstones
+            if len(self._doc_ids) - self._live > len(self._doc_ids) // 4:
+                self.compact()
+            state = {
+                'k1': self.k1,
+                'b': self.b,
+                'postings': {term: bytes(p) for term, p in self._postings.items()},
+                'last_doc': dict(self._last_doc),
+                'lengths': self._lengths[:len(self._doc_ids)].copy(),
+                'doc_ids': list(self._doc_ids),
+                'titles': list(self._titles)
+            }
+            self._dirty = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            joblib.dump(state, tmp_path)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist keyword index: {str(e)}")
+    
+    def save_in_background(self):
+        with self._lock:
+            if self._saving:
+                return
+            self._saving = True
+        
+        def run():
+            try:
+                self.save()
+            finally:
+                self._saving = False
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            state = joblib.load(self.path)
+            with self._lock:
+                self._reset()
+                self.k1, self.b = state['k1'], state['b']
+                self._postings = {term: bytearray(p) for term, p in state['postings'].items()}
+                self._last_doc = state['last_doc']
+                count = len(state['doc_ids'])
+                self._lengths = np.zeros(max(1024, count * 2), dtype=np.float32)
+                self._lengths[:count] = state['lengths']
+                self._doc_ids = state['doc_ids']
+                self._titles = state['titles']
+                self._docnums = {item_id: d for d, item_id in enumerate(self._doc_ids) if item_id is not None}
+                self._live = len(self._docnums)
+                self._total_length = int(self._lengths[:count].sum())
+            logger.info(f"Keyword index loaded ({self._live} documents)")
+        except Exception as e:
+            logger.error(f"Could not load keyword index: {str(e)}")
+
+
+keyword_index = KeywordIndex()
+if keyword_index.persist:
+    atexit.register(keyword_index.save)
+
+
+GENERATIVE_BACKEND = os.getenv('GENERATIVE_BACKEND', 'gemini')
+STANDIN_RECORDINGS_PATH = os.getenv('STANDIN_RECORDINGS_PATH', os.path.join(DATA_DIR, 'gemini_recordings.jsonl'))
+
+
+def _prompt_key(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def _parse_distribution(spec):
+    """Parse 'lognormal:median_ms=800,sigma=0.5' style latency specs"""
+    kind, _, params = spec.partition(':')
+    values = {}
+    for part in params.split(','):
+        if '=' in part:
+            name, value = part.split('=', 1)
+            values[name.strip()] = float(value)
+    return kind.strip() or 'fixed', values
+
+
+class StandInUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class StandInResponse:
+    """Mimics the parts of a Gemini response the service reads (.text, .usage_metadata)"""
+    
+    def __init__(self, text, prompt):
+        self.text = text
+        self.usage_metadata = StandInUsage(len(prompt) // 4, len(text) // 4)
+
+
+class RecordingModel:
+    """Wraps the real Gemini model and appends every prompt/response pair for later replay"""
+    
+    def __init__(self, model, path=STANDIN_RECORDINGS_PATH):
+        self.model = model
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def generate_content(self, prompt, **kwargs):
+        started = time.perf_counter()
+        response = self.model.generate_content(prompt, **kwargs)
+        if kwargs.get('stream'):
+            return response
+        record = {
+            'key': _prompt_key(prompt),
+            'text': response.text,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+            'recorded_at': datetime.now().isoformat()
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return response
+
+
+TAXONOMY_PROMPT_HEADER = "Vous êtes un expert en taxonomie d'audit et de conformité."
+
+
+class LocalGeminiStandIn:
+    """
+    Local stand-in for the Gemini model, for load tests without the real API
+    Replays recorded responses by prompt hash and otherwise synthesizes
+    schema-valid JSON; latency distribution, error and throttling rates are
+    configurable through STANDIN_* environment variables
+    """
+    
+    def __init__(self, recordings_path=STANDIN_RECORDINGS_PATH, latency=None, error_rate=None,
+                 throttle_rate=None, seed=None):
+        self.latency_kind, self.latency_params = _parse_distribution(
+            latency or os.getenv('STANDIN_LATENCY', 'lognormal:median_ms=800,sigma=0.4'))
+        self.error_rate = float(error_rate if error_rate is not None else os.getenv('STANDIN_ERROR_RATE', 0))
+        self.throttle_rate = float(throttle_rate if throttle_rate is not None else os.getenv('STANDIN_THROTTLE_RATE', 0))
+        self._rng = random.Random(seed if seed is not None else os.getenv('STANDIN_SEED'))
+        self._rng_lock = threading.Lock()
+        self.recordings = {}
+        if recordings_path and os.path.exists(recordings_path):
+            with open(recordings_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.recordings.setdefault(record['key'], []).append(record)
+            logger.info(f"Gemini stand-in loaded {len(self.recordings)} recorded prompts")
+    
+    def _sample_latency(self, recorded_ms=None):
+        params = self.latency_params
+        with self._rng_lock:
+            if self.latency_kind == 'replay' and recorded_ms is not None:
+                ms = recorded_ms * params.get('scale', 1.0)
+            elif self.latency_kind == 'uniform':
+                ms = self._rng.uniform(params.get('min_ms', 100), params.get('max_ms', 1000))
+            elif self.latency_kind == 'lognormal':
+                ms = self._rng.lognormvariate(np.log(params.get('median_ms', 800)), params.get('sigma', 0.4))
+            else:
+                ms = params.get('ms', params.get('median_ms', 0))
+        return ms / 1000
+    
+    def _inject_failures(self):
+        with self._rng_lock:
+            draw = self._rng.random()
+        if draw < self.throttle_rate:
+            raise google_exceptions.ResourceExhausted("Stand-in: quota exceeded")
+        if draw < self.throttle_rate + self.error_rate:
+            raise google_exceptions.ServiceUnavailable("Stand-in: injected error")
+    
+    def generate_content(self, prompt, stream=False, **kwargs):
+        key = _prompt_key(prompt)
+        recorded = self.recordings.get(key)
+        if recorded:
+            record = recorded[int(key[:8], 16) % len(recorded)]
+            text, delay = record['text'], self._sample_latency(record.get('latency_ms'))
+        else:
+            text, delay = self._synthesize(prompt, key), self._sample_latency()
+        
+        self._inject_failures()
+        if stream:
+            return self._stream(text, prompt, delay)
+        time.sleep(delay)
+        return StandInResponse(text, prompt)
+    
+    def _stream(self, text, prompt, delay):
+        chunks = [text[i:i + 64] for i in range(0, len(text), 64)] or ['']
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield StandInResponse(chunk, prompt)
+    
+    def _synthesize(self, prompt, key):
+        """Deterministic (per prompt) JSON matching the schema the prompt asks for"""
+        rng = random.Random(key)
+        # The taxonomy prompt starts with its header; a description mentioning
+        # "taxonomie" must not switch an action prompt to the taxonomy schema
+        if prompt.lstrip().startswith(TAXONOMY_PROMPT_HEADER):
+            domain = rng.choice(['Gouvernance des données', 'Gestion des fournisseurs', 'Continuité d\'activité',
+                                 'Éthique et conformité', 'Énergie et climat', 'Hygiène industrielle'])
+            payload = {
+                'domain': {
+                    'name': domain,
+                    'themes': [
+                        {'name': '{} - thème {}'.format(domain, i + 1),
+                         'subthemes': ['Sous-thème {}.{}'.format(i + 1, j + 1) for j in range(rng.randint(1, 2))]}
+                        for i in range(rng.randint(1, 2))
+                    ]
+                }
+            }
+        else:
+            risk = re.search(r'Niveau de risque détecté:\s*(\S+)', prompt)
+            domain = re.search(r'Domaine identifié:\s*(\S+)', prompt)
+            payload = {
+                'priority_level': risk.group(1) if risk else rng.choice(['Élevée', 'Moyenne', 'Faible']),
+                'risk_assessment': 'Évaluation simulée par le stand-in local',
+                'recommended_tips': ['Conseil {}: action simulée'.format(i + 1) for i in range(3)],
+                'compliance_areas': [(domain.group(1) if domain else 'général').capitalize()],
+                'estimated_effort': rng.choice(['Faible', 'Moyen', 'Élevé']),
+                'suggested_timeline': rng.choice(['1-2 semaines', '2-4 semaines', '1-3 mois']),
+                'key_stakeholders': ['Responsable de l\'Action', 'Équipe de Conformité'],
+                'success_metrics': ['Réalisation dans les délais', 'Qualité de la mise en œuvre']
+            }
+        return '```json\n{}\n```'.format(json.dumps(payload, ensure_ascii=False, indent=2))
+
+
+def create_generative_model(backend=GENERATIVE_BACKEND):
+    """Model backend: gemini (default), record (gemini + recording) or standin/replay (local stand-in)"""
+    if backend in ('standin', 'replay'):
+        logger.info("Using the local Gemini stand-in")
+        return LocalGeminiStandIn()
+    model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    if backend == 'record':
+        logger.info(f"Recording Gemini responses to {STANDIN_RECORDINGS_PATH}")
+        return RecordingModel(model)
+    return model
+
+
+GEMINI_QUOTA_PATH = os.getenv('GEMINI_QUOTA_PATH', os.path.join(DATA_DIR, 'gemini_quota.json'))
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (about 4 characters per token for French prose)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+class QuotaWaitTimeout(Exception):
+    """The Gemini quota did not free up within GEMINI_MAX_QUEUE_SECONDS"""
+
+
+class GeminiRateLimiter:
+    """
+    Client-side token buckets for Gemini requests/minute and tokens/minute
+    Bucket levels live in a small JSON file guarded by an fcntl lock, so every
+    worker process on the node draws from the same quota. A call that does not
+    fit waits (queues) until the buckets refill instead of failing; the token
+    estimate is corrected with the response's usage metadata, and a provider
+    ResourceExhausted pauses every worker for GEMINI_THROTTLE_BACKOFF seconds.
+    Batch and bulk callers leave GEMINI_INTERACTIVE_RESERVE of both buckets to
+    interactive calls, so background work can never drain the quota
+    """
+    
+    def __init__(self, path=GEMINI_QUOTA_PATH):
+        self.path = path
+        self.rpm = float(os.getenv('GEMINI_RPM', 60))
+        self.tpm = float(os.getenv('GEMINI_TPM', 250000))
+        self.expected_output_tokens = int(os.getenv('GEMINI_EXPECTED_OUTPUT_TOKENS', 800))
+        self.max_wait = float(os.getenv('GEMINI_MAX_QUEUE_SECONDS', 120))
+        self.throttle_backoff = float(os.getenv('GEMINI_THROTTLE_BACKOFF', 10))
+        self.interactive_reserve = float(os.getenv('GEMINI_INTERACTIVE_RESERVE', 0.2))
+        self.enabled = self.rpm > 0 or self.tpm > 0
+        self._thread_lock = threading.Lock()
+    
+    @contextmanager
+    def _state(self):
+        """Shared bucket state, refilled up to now; written back on exit"""
+        with self._thread_lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a+', encoding='utf-8') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+                now = time.time()
+                elapsed = max(now - state.get('updated_at', now), 0.0)
+                state['requests'] = min(self.rpm, state.get('requests', self.rpm) + elapsed * self.rpm / 60)
+                state['tokens'] = min(self.tpm, state.get('tokens', self.tpm) + elapsed * self.tpm / 60)
+                state['updated_at'] = now
+                state.setdefault('blocked_until', 0.0)
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+    
+    def _publish(self, state):
+        metrics.set_gauge('gemini.quota.requests_remaining', round(state['requests'], 2))
+        metrics.set_gauge('gemini.quota.tokens_remaining', round(state['tokens'], 1))
+    
+    def acquire(self, prompt, priority=None):
+        """Wait until one request and the estimated tokens fit; returns the tokens reserved"""
+        needed_tokens = estimate_tokens(prompt) + self.expected_output_tokens
+        if not self.enabled:
+            return needed_tokens
+        # Non-interactive calls only proceed while the interactive reserve stays untouched
+        reserve = self.interactive_reserve if (priority or request_priority.get()) != 'interactive' else 0.0
+        # A single call larger than the whole bucket can never fit: cap it
+        needed_requests = min(1 + reserve * self.rpm, self.rpm) if self.rpm > 0 else 0
+        needed_tokens_capped = min(needed_tokens + reserve * self.tpm, self.tpm) if self.tpm > 0 else 0
+        started = time.perf_counter()
+        while True:
+            with self._state() as state:
+                now = state['updated_at']
+                wait = state['blocked_until'] - now
+                if wait <= 0:
+                    missing_requests = needed_requests - state['requests'] if self.rpm > 0 else 0
+                    missing_tokens = needed_tokens_capped - state['tokens'] if self.tpm > 0 else 0
+                    if missing_requests <= 0 and missing_tokens <= 0:
+                        if self.rpm > 0:
+                            state['requests'] -= 1
+                        if self.tpm > 0:
+                            state['tokens'] -= needed_tokens
+                        self._publish(state)
+                        break
+                    wait = max(missing_requests * 60 / self.rpm if missing_requests > 0 else 0,
+                               missing_tokens * 60 / self.tpm if missing_tokens > 0 else 0)
+                self._publish(state)
+            
+            waited = time.perf_counter() - started
+            if waited + wait > self.max_wait:
+                metrics.increment('gemini.quota.wait_timeouts')
+                raise QuotaWaitTimeout("Quota Gemini épuisé (attente > {:.0f} s)".format(self.max_wait))
+            metrics.increment('gemini.quota.waits')
+            time.sleep(min(max(wait, 0.01), 1.0))
+        
+        metrics.observe('gemini.quota.wait_seconds', time.perf_counter() - started)
+        return needed_tokens
+    
+    def reconcile(self, reserved_tokens, response):
+        """Give back (or charge) the difference between the estimate and the reported usage"""
+        usage = getattr(response, 'usage_metadata', None)
+        actual = getattr(usage, 'total_token_count', None)
+        if not self.enabled or self.tpm <= 0 or not actual:
+            return
+        metrics.increment('gemini.tokens_used', actual)
+        with self._state() as state:
+            state['tokens'] = min(self.tpm, state['tokens'] + reserved_tokens - actual)
+            self._publish(state)
+    
+    def throttled(self):
+        """The provider refused a call: pause every worker and empty the request bucket"""
+        metrics.increment('gemini.throttled')
+        if not self.enabled:
+            return
+        with self._state() as state:
+            state['blocked_until'] = max(state['blocked_until'], state['updated_at'] + self.throttle_backoff)
+            state['requests'] = min(state['requests'], 0.0)
+            self._publish(state)
+    
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        with self._state() as state:
+            return {
+                'enabled': True,
+                'rpm': self.rpm,
+                'tpm': self.tpm,
+                'interactive_reserve': self.interactive_reserve,
+                'requests_remaining': round(state['requests'], 2),
+                'tokens_remaining': round(state['tokens'], 1),
+                'blocked_for_seconds': round(max(state['blocked_until'] - state['updated_at'], 0.0), 2)
+            }
+
+
+gemini_rate_limiter = GeminiRateLimiter()
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 3))
+
+
+# Prompt size control: long pasted descriptions are reduced to their most informative sentences
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 1500))
+PROMPT_MIN_DESCRIPTION_TOKENS = int(os.getenv('PROMPT_MIN_DESCRIPTION_TOKENS', 200))
+PROMPT_MAX_ENTITIES = int(os.getenv('PROMPT_MAX_ENTITIES', 10))
+
+ENHANCED_PROMPT_INSTRUCTIONS = """
+        
+        En tenant compte de l'analyse NLP ci-dessus, fournissez une réponse JSON avec la structure suivante EN FRANÇAIS:
+        {
+            "priority_level": "Élevée/Moyenne/Faible",
+            "risk_assessment": "Analyse des risques basée sur les termes détectés",
+            "recommended_tips": [
+                "Conseil 1: Conseil actionnable spécifique",
+                "Conseil 2: Autre recommandation pratique",
+                "Conseil 3: Guidance supplémentaire"
+            ],
+            "compliance_areas": ["domaine1", "domaine2"],
+            "estimated_effort": "Faible/Moyen/Élevé",
+            "suggested_timeline": "Délai recommandé",
+            "key_stakeholders": ["rôle1", "rôle2"],
+            "success_metrics": ["métrique1", "métrique2"]
+        }
+        
+        IMPORTANT: Répondez UNIQUEMENT avec du JSON valide. 
+        """
+
+
+class NLPService: 
+    def __init__(self):
+        self.model = create_generative_model()
+        self.text_analyzer = text_analyzer
+        self.classifier = action_classifier
+        self.duplicates = duplicate_index
+    
+    def _generate(self, prompt, **kwargs):
+        """
+        Single Gemini call path: waits for the shared RPM/TPM quota (priority
+        aware), then for a slot of the caller's priority class, so a caller
+        waiting on quota never holds a slot; provider throttling is retried after
+        the shared backoff instead of falling straight back to NLP-only results
+        """
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            reserved = gemini_rate_limiter.acquire(prompt)
+            try:
+                with gemini_scheduler.slot():
+                    response = self.model.generate_content(prompt, **kwargs)
+            except google_exceptions.ResourceExhausted:
+                gemini_rate_limiter.throttled()
+                if attempt == GEMINI_MAX_RETRIES:
+                    metrics.increment('gemini.throttled_fallbacks')
+                    raise
+                logger.warning(f"Gemini throttled, retrying ({attempt + 1}/{GEMINI_MAX_RETRIES})")
+                continue
+            gemini_rate_limiter.reconcile(reserved, response)
+            return response
+    
+    def _generate_stream(self, prompt):
+        """Streaming variant of _generate: yields text chunks; throttling is only retried before the first chunk"""
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            reserved = gemini_rate_limiter.acquire(prompt)
+            started = False
+            try:
+                with gemini_scheduler.slot():
+                    response = self.model.generate_content(prompt, stream=True)
+                    for chunk in response:
+                        started = True
+                        yield chunk.text
+            except google_exceptions.ResourceExhausted:
+                gemini_rate_limiter.throttled()
+                if started or attempt == GEMINI_MAX_RETRIES:
+                    metrics.increment('gemini.throttled_fallbacks')
+                    raise
+                logger.warning(f"Gemini throttled, retrying ({attempt + 1}/{GEMINI_MAX_RETRIES})")
+                continue
+            # Usage metadata is complete once the stream is consumed
+            gemini_rate_limiter.reconcile(reserved, response)
+            return
+        
+    def analyze_action_description(self, description, domain=None, theme=None):
+        """Analyze action plan description using real NLP + Gemini"""
+        for event, data in self.analyze_action_events(description, domain, theme):
+            if event == 'result':
+                return data
+    
+    def analyze_action_events(self, description, domain=None, theme=None, stream=False):
+        """
+        The analysis pipeline as (event, data) steps: 'nlp' with the nlp_insights
+        block as soon as spaCy is done, 'chunk' for each piece of Gemini text
+        (stream=True only) and finally 'result' with the validated analysis
+        """
+        try:
+            # STEP 0: Reuse the analysis of a near-duplicate description
+            context = (domain or '', theme or '')
+            duplicate = self.duplicates.find_reusable_analysis(description, context, lexicon_store.current.version)
+            if duplicate is not None:
+                metrics.increment('duplicates.reused')
+                yield 'result', duplicate
+                return
+            
+            # STEP 1: Real NLP Analysis using spaCy
+            nlp_analysis = self.text_analyzer.analyze_text(description)
+            yield 'nlp', self._nlp_insights(nlp_analysis)
+            
+            # STEP 2: Local classifier - skip Gemini when it is confident
+            metrics.increment('classifier.requests')
+            features = self.classifier.features(nlp_analysis)
+            local_prediction = self.classifier.predict(features)
+            if self.classifier.should_skip_gemini(local_prediction):
+                metrics.increment('classifier.skipped_gemini')
+                final_response = self._merge_nlp_and_gemini(nlp_analysis, self._create_local_response(local_prediction))
+                self._remember_analysis(description, context, final_response)
+                yield 'result', final_response
+                return
+            
+            # STEP 3: Use NLP insights to enhance Gemini prompt
+            enhanced_prompt = self._create_enhanced_prompt(description, domain, theme, nlp_analysis)
+            
+            # STEP 4: Generate response using Gemini with NLP context
+            if stream:
+                parts = []
+                for text in self._generate_stream(enhanced_prompt):
+                    parts.append(text)
+                    yield 'chunk', text
+                response_text = ''.join(parts)
+            else:
+                response_text = self._generate(enhanced_prompt).text
+            
+            # STEP 5: Parse and merge responses
+            gemini_response = self._parse_gemini_response(response_text)
+            gemini_response['analysis_source'] = 'gemini'
+            
+            # Unparseable answers come back as the text fallback (with 'detailed_analysis')
+            if 'detailed_analysis' not in gemini_response:
+                self.classifier.record_pair(features, gemini_response)
+                if local_prediction:
+                    self.classifier.record_agreement(local_prediction, gemini_response)
+            
+            # STEP 6: Merge NLP analysis with Gemini response
             final_response = self._merge_nlp_and_gemini(nlp_analysis, gemini_response)
+            if 'detailed_analysis' not in gemini_response:
+                self._remember_analysis(description, context, final_response)
             
-            return final_response
+            yield 'result', final_response
             
         except Exception as e: 
             logger.error(f"Error analyzing action description: {str(e)}")
-            return self._get_fallback_response(description)
+            yield 'result', self._get_fallback_response(description)
+    
+    def _remember_analysis(self, description, context, analysis):
+        """Store a successful analysis in the near-duplicate index for reuse"""
+        try:
+            self.duplicates.add(self.duplicates.analysis_key(description, context), description, analysis, context)
+        except Exception as e:
+            logger.warning(f"Could not index analysis for duplicate reuse: {str(e)}")
+    
+    def _create_local_response(self, prediction):
+        """Build a validated response from a confident local classifier prediction"""
+        response = self._validate_response({
+            'priority_level': prediction['priority_level'],
+            'estimated_effort': prediction['estimated_effort'],
+            'compliance_areas': prediction.get('compliance_areas', [])
+        })
+        response['analysis_source'] = 'local_classifier'
+        response['classifier_confidence'] = round(prediction['confidence'], 3)
+        return response
     
     def _create_enhanced_prompt(self, description, domain, theme, nlp_analysis):
-        """Create an enhanced prompt using NLP insights"""
+        """Create an enhanced prompt using NLP insights, kept within PROMPT_TOKEN_BUDGET"""
         
         # Extract NLP insights for the prompt
         risk_level = nlp_analysis['risk_analysis']['level']
         detected_domain = nlp_analysis['detected_domain']['domain']
-        key_terms = [t['lemma'] for t in nlp_analysis['key_terms'][:5]]
+        key_terms = [t.lemma for t in nlp_analysis['key_terms'][:5]]
         entities = nlp_analysis['entities']
         complexity = nlp_analysis['complexity']['level']
+        organizations = list(dict.fromkeys(entities['organizations']))[:PROMPT_MAX_ENTITIES]
+        regulations = list(dict.fromkeys(entities['regulations']))[:PROMPT_MAX_ENTITIES]
         
-        base_prompt = f"""
+        header = f"""
         Vous êtes un consultant expert en audit spécialisé dans la conformité et la gestion des risques. 
         
         === ANALYSE NLP PRÉLIMINAIRE ===
@@ -505,11 +2939,19 @@ class NLPService:
         - Domaine identifié: {detected_domain}
         - Termes clés extraits: {', '.join(key_terms)}
         - Complexité du texte: {complexity}
-        - Organisations mentionnées: {', '.join(entities['organizations']) if entities['organizations'] else 'Aucune'}
-        - Réglementations détectées: {', '.join(entities['regulations']) if entities['regulations'] else 'Aucune'}
+        - Organisations mentionnées: {', '.join(organizations) if organizations else 'Aucune'}
+        - Réglementations détectées: {', '.join(regulations) if regulations else 'Aucune'}
         
         === DESCRIPTION DE L'ACTION ===
-        "{description}"
+        """
+        
+        # The description gets whatever the fixed parts of the prompt leave of the budget
+        fixed_tokens = estimate_tokens(header) + estimate_tokens(ENHANCED_PROMPT_INSTRUCTIONS)
+        fixed_tokens += estimate_tokens((domain or '') + (theme or '')) + 20
+        description_budget = max(PROMPT_TOKEN_BUDGET - fixed_tokens, PROMPT_MIN_DESCRIPTION_TOKENS)
+        description_text = self._fit_description(description, description_budget)
+        
+        base_prompt = header + f"""\"{description_text}\"
         """
         
         if domain:
@@ -517,29 +2959,84 @@ class NLPService:
         if theme:
             base_prompt += f"\nThème spécifié: {theme}"
             
-        base_prompt += """
-        
-        En tenant compte de l'analyse NLP ci-dessus, fournissez une réponse JSON avec la structure suivante EN FRANÇAIS:
-        {
-            "priority_level": "Élevée/Moyenne/Faible",
-            "risk_assessment": "Analyse des risques basée sur les termes détectés",
-            "recommended_tips": [
-                "Conseil 1: Conseil actionnable spécifique",
-                "Conseil 2: Autre recommandation pratique",
-                "Conseil 3: Guidance supplémentaire"
-            ],
-            "compliance_areas": ["domaine1", "domaine2"],
-            "estimated_effort": "Faible/Moyen/Élevé",
-            "suggested_timeline": "Délai recommandé",
-            "key_stakeholders": ["rôle1", "rôle2"],
-            "success_metrics": ["métrique1", "métrique2"]
-        }
-        
-        IMPORTANT: Répondez UNIQUEMENT avec du JSON valide. 
-        """
+        base_prompt += ENHANCED_PROMPT_INSTRUCTIONS
         
+        prompt_tokens = estimate_tokens(base_prompt)
+        metrics.observe('prompt.tokens', prompt_tokens)
+        metrics.observe('prompt.description_tokens', estimate_tokens(description_text))
         return base_prompt
     
+    def _fit_description(self, description, token_budget):
+        """
+        The description itself when it fits the budget; otherwise its most
+        informative sentences (risk keywords, regulations, root verbs, key
+        terms) in their original order, with [...] marking the cuts
+        """
+        if estimate_tokens(description) <= token_budget:
+            return description
+        
+        metrics.increment('prompt.trimmed')
+        lexicon = lexicon_store.current
+        sentences = self._score_sentences(description, lexicon)
+        
+        chosen = set()
+        used = 0
+        for score, index, text in sorted(sentences, key=lambda s: (-s[0], s[1])):
+            cost = estimate_tokens(text) + 2
+            if used + cost <= token_budget:
+                chosen.add(index)
+                used += cost
+        
+        if not chosen:
+            # Not even one sentence fits: cut the best one at the budget
+            best = min(sentences, key=lambda s: (-s[0], s[1]))[2] if sentences else description
+            return best[:token_budget * 4].rstrip() + ' [...]'
+        
+        parts = []
+        previous = -1
+        for score, index, text in sentences:
+            if index in chosen:
+                if index != previous + 1:
+                    parts.append('[...]')
+                parts.append(text)
+                previous = index
+        if previous != len(sentences) - 1:
+            parts.append('[...]')
+        metrics.observe('prompt.sentences_kept_ratio', len(chosen) / len(sentences))
+        return ' '.join(parts)
+    
+    def _score_sentences(self, description, lexicon):
+        """(score, index, text) per sentence; spaCy sentences and lemmas when the text is parseable"""
+        scored = []
+        if self.text_analyzer.nlp and len(description) <= doc_cache.max_chars:
+            # Usually a cache hit: analyze_text parsed the same description just before
+            doc = doc_cache.parse(description)
+            for index, sent in enumerate(doc.sents):
+                lemmas = [t.lemma_.lower() for t in sent]
+                score = self._sentence_score(sent.text, lemmas, lexicon, index)
+                if sent.root.pos_ == 'VERB':
+                    score += 1.0
+                scored.append((score, index, sent.text.strip()))
+        else:
+            for index, text in enumerate(re.split(r'(?<=[.!?;])\s+', description)):
+                if text.strip():
+                    words = re.findall(r'\w+', text.lower())
+                    scored.append((self._sentence_score(text, words, lexicon, len(scored)), len(scored), text.strip()))
+        return scored
+    
+    @staticmethod
+    def _sentence_score(text, lemmas, lexicon, index):
+        score = 0.0
+        for lemma in lemmas:
+            for level in lexicon.risk_levels.get(lemma, ()):
+                score += RISK_IMPORTANCE_BONUS.get(level, 0.1) * 4
+        if REGULATION_PATTERN.search(text):
+            score += 3.0
+        # The opening sentence usually states what the action is about
+        if index == 0:
+            score += 1.0
+        return score
+    
     def _merge_nlp_and_gemini(self, nlp_analysis, gemini_response):
         """Merge NLP analysis with Gemini response for comprehensive output"""
         
@@ -547,16 +3044,7 @@ class NLPService:
         nlp_risk = nlp_analysis['risk_analysis']['level']
         
         # Add NLP-specific insights
-        gemini_response['nlp_insights'] = {
-            'detected_entities': nlp_analysis['entities'],
-            'key_terms':  [t['lemma'] for t in nlp_analysis['key_terms'][:10]],
-            'detected_domain': nlp_analysis['detected_domain'],
-            'text_complexity': nlp_analysis['complexity'],
-            'sentiment':  nlp_analysis['sentiment'],
-            'action_verbs': [a['lemma'] for a in nlp_analysis['actions'][:5]],
-            'main_topics': [t['text'] for t in nlp_analysis['topics'][:5]],
-            'risk_keywords_found': nlp_analysis['risk_analysis']['matched_keywords']
-        }
+        gemini_response['nlp_insights'] = self._nlp_insights(nlp_analysis)
         
         # Override priority if NLP strongly disagrees
         if nlp_analysis['risk_analysis']['confidence'] > 0.7:
@@ -565,11 +3053,25 @@ class NLPService:
         
         return gemini_response
     
+    def _nlp_insights(self, nlp_analysis):
+        """The nlp_insights block of an analysis (also streamed ahead of the Gemini answer)"""
+        return {
+            'detected_entities': nlp_analysis['entities'],
+            'key_terms':  [t.lemma for t in nlp_analysis['key_terms'][:10]],
+            'detected_domain': nlp_analysis['detected_domain'],
+            'text_complexity': nlp_analysis['complexity'],
+            'sentiment':  nlp_analysis['sentiment'],
+            'action_verbs': [a.lemma for a in nlp_analysis['actions'][:5]],
+            'main_topics': [t.text for t in nlp_analysis['topics'][:5]],
+            'risk_keywords_found': nlp_analysis['risk_analysis']['matched_keywords'],
+            'lexicon_version': nlp_analysis.get('lexicon_version')
+        }
+    
     def generate_taxonomy_suggestion(self, existing_domains=None):
         """Generate a new taxonomy suggestion"""
         try:
             prompt = self._create_taxonomy_prompt(existing_domains)
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             return self._parse_taxonomy_response(response. text)
             
         except Exception as e:
@@ -579,7 +3081,7 @@ class NLPService:
     def _create_taxonomy_prompt(self, existing_domains=None):
         """Create a detailed prompt for taxonomy generation in French"""
         base_prompt = """
-        Vous êtes un expert en taxonomie d'audit et de conformité.
+        {}
         
         Générez une suggestion de taxonomie pour un système d'audit qui comprend:
         - 1 domaine principal
@@ -587,7 +3089,7 @@ class NLPService:
         - 1 ou 2 sous-thèmes pour chaque thème
         
         Les domaines couramment utilisés incluent:  Santé et sécurité au travail, Environnement, Qualité, Sécurité informatique, Ressources humaines, Finance, Gouvernance, etc.
-        """
+        """.format(TAXONOMY_PROMPT_HEADER)
         
         if existing_domains: 
             base_prompt += f"\nDomaines existants à éviter: {', '. join(existing_domains)}\n"
@@ -611,8 +3113,8 @@ class NLPService:
         
         return base_prompt
     
-    def _parse_taxonomy_response(self, response_text):
-        """Parse and validate taxonomy response"""
+    def _parse_taxonomy_response(self, response_text, strict=False):
+        """Parse and validate taxonomy response (strict: raise ValueError instead of falling back)"""
         try:
             response_text = response_text. strip()
             
@@ -633,10 +3135,14 @@ class NLPService:
                 parsed_response = json.loads(json_str)
                 return self._validate_taxonomy_response(parsed_response)
             else: 
+                if strict:
+                    raise ValueError("Aucun JSON dans la réponse de taxonomie")
                 return self._get_fallback_taxonomy_response()
                 
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error:  {str(e)}")
+            if strict:
+                raise ValueError(f"JSON de taxonomie invalide: {str(e)}")
             return self._get_fallback_taxonomy_response()
     
     def _validate_taxonomy_response(self, response):
@@ -764,6 +3270,7 @@ class NLPService:
         response = {
             'priority_level': nlp_analysis['risk_analysis']['level'],
             'risk_assessment': 'Analyse automatique basée sur NLP - révision manuelle recommandée',
+            'analysis_source': 'nlp_fallback',
             'recommended_tips':  [
                 'Examinez attentivement les exigences de l\'action',
                 'Identifiez les parties prenantes clés et les dépendances',
@@ -777,10 +3284,11 @@ class NLPService:
             'success_metrics': ['Réalisation dans les délais', 'Respect des normes de qualité'],
             'nlp_insights': {
                 'detected_entities': nlp_analysis['entities'],
-                'key_terms': [t['lemma'] for t in nlp_analysis['key_terms'][:10]],
+                'key_terms': [t.lemma for t in nlp_analysis['key_terms'][:10]],
                 'detected_domain': nlp_analysis['detected_domain'],
                 'text_complexity':  nlp_analysis['complexity'],
-                'sentiment':  nlp_analysis['sentiment']
+                'sentiment':  nlp_analysis['sentiment'],
+                'lexicon_version': nlp_analysis.get('lexicon_version')
             }
         }
         
@@ -805,44 +3313,35 @@ class NLPService:
             
             suggestions = []
             
+            # Cached per plan (name + features); only changed plans are parsed, in one batch
+            plan_entries = plan_cache.analyze_many(plans)
+            subs_by_plan = {}
+            for s in subscription_dist:
+                subs_by_plan.setdefault(s.get('planId'), s)
+            
             # Collect all feature texts for TF-IDF analysis
             all_feature_texts = []
             plan_features_map = {}
+            plan_vectors = {}
             
-            for plan in plans:
+            for plan, entry in zip(plans, plan_entries):
                 plan_id = plan.get('planId')
-                
-                # NLP:  Analyze plan name
-                plan_name = plan.get('name', '')
-                plan_name_analysis = self.text_analyzer.analyze_text(plan_name) if plan_name else None
-                
-                # NLP: Analyze features
-                try:
-                    features_json = plan.get('features', '[]')
-                    if isinstance(features_json, str):
-                        features = json.loads(features_json)
-                    else:
-                        features = features_json
-                    
-                    if isinstance(features, list):
-                        feature_text = ' '.join(str(f) for f in features)
-                        all_feature_texts.append(feature_text)
-                        plan_features_map[plan_id] = feature_text
-                except:
-                    features = []
-                    feature_text = ''
-                    plan_features_map[plan_id] = ''
+                plan_name_analysis = entry['name_analysis']
+                feature_text = entry['feature_text']
+                if feature_text is not None:
+                    all_feature_texts.append(feature_text)
+                plan_features_map[plan_id] = feature_text or ''
+                plan_vectors[plan_id] = entry['vector']
                 
                 # Find subscription data for this plan
-                plan_subs = next((s for s in subscription_dist if s['planId'] == plan_id), None)
+                plan_subs = subs_by_plan.get(plan_id)
                 
                 if plan_subs:
                     adoption_rate = (plan_subs['count'] / max(active_companies, 1)) * 100
                     avg_plan_users = plan_subs. get('avgUsers', 0)
                     subscriber_count = plan_subs['count']
                     
-                    # NLP: Analyze feature descriptions for insights
-                    feature_analysis = self.text_analyzer.analyze_text(feature_text) if feature_text else None
+                    feature_analysis = entry['feature_analysis']
                     
                     # Generate insights based on patterns + NLP
                     insight = self._generate_plan_insights_with_nlp(
@@ -915,10 +3414,10 @@ class NLPService:
                     })
             
             # NLP: Extract common keywords across all plans using TF-IDF
-            common_keywords = self. text_analyzer.extract_keywords_tfidf(all_feature_texts) if all_feature_texts else []
+            common_keywords = plan_cache.common_keywords(all_feature_texts) if all_feature_texts else []
             
             # NLP: Calculate feature similarity between plans
-            feature_similarities = self._calculate_plan_similarities(plan_features_map)
+            feature_similarities = self._calculate_plan_similarities(plan_features_map, plan_vectors)
             
             suggestions.sort(key=lambda x: x['priorityScore'], reverse=True)
             
@@ -946,7 +3445,8 @@ class NLPService:
                 'nlpMetrics': {
                     'commonKeywords': common_keywords,
                     'planSimilarities': feature_similarities
-                }
+                },
+                'lexiconVersion': self.text_analyzer.lexicons.current.version
             }
             
         except Exception as e: 
@@ -983,7 +3483,7 @@ class NLPService:
         
         # NLP Insight: Key terms in features
         if feature_analysis and feature_analysis.get('key_terms'):
-            top_terms = [t['lemma'] for t in feature_analysis['key_terms'][:3]]
+            top_terms = [t.lemma for t in feature_analysis['key_terms'][:3]]
             if top_terms: 
                 insights.append("🔑 Termes clés des fonctionnalités:  {}".format(', '.join(top_terms)))
         
@@ -1062,11 +3562,23 @@ class NLPService:
             'riskLevel':  risk_level
         }
 
-    def _calculate_plan_similarities(self, plan_features_map):
-        """Calculate semantic similarity between plans using spaCy"""
+    def _calculate_plan_similarities(self, plan_features_map, plan_vectors=None):
+        """Calculate semantic similarity between plans using spaCy (one matrix product over the feature vectors)"""
         similarities = []
         
-        plan_ids = list(plan_features_map.keys())
+        plan_ids = [plan_id for plan_id, text in plan_features_map.items() if text]
+        if len(plan_ids) < 2:
+            return similarities
+        
+        if plan_vectors is None or not self.text_analyzer.nlp:
+            matrix = None
+        else:
+            dim = self.text_analyzer.nlp.vocab.vectors_length
+            matrix = np.stack([plan_vectors.get(p) if plan_vectors.get(p) is not None else np.zeros(dim, dtype=np.float32)
+                               for p in plan_ids])
+            norms = np.linalg.norm(matrix, axis=1)
+            matrix = np.divide(matrix, norms[:, None], out=np.zeros_like(matrix), where=norms[:, None] > 0)
+            matrix = matrix @ matrix.T
         
         for i in range(len(plan_ids)):
             for j in range(i + 1, len(plan_ids)):
@@ -1076,23 +3588,28 @@ class NLPService:
                 text1 = plan_features_map[plan1_id]
                 text2 = plan_features_map[plan2_id]
                 
-                if text1 and text2:
-                    similarity = self.text_analyzer. calculate_text_similarity(text1, text2)
-                    
-                    if similarity > 0.7: 
-                        similarities.append({
-                            'plan1': plan1_id,
-                            'plan2':  plan2_id,
-                            'similarity': round(similarity, 2),
-                            'warning': 'Plans très similaires - risque de cannibalisation'
-                        })
-                    elif similarity > 0.5:
-                        similarities.append({
-                            'plan1':  plan1_id,
-                            'plan2': plan2_id,
-                            'similarity': round(similarity, 2),
-                            'note': 'Plans modérément similaires'
-                        })
+                if matrix is None:
+                    similarity = self.text_analyzer.calculate_text_similarity(text1, text2)
+                elif text1 == text2:
+                    # Doc.similarity short-circuits identical texts to 1.0
+                    similarity = 1.0
+                else:
+                    similarity = float(matrix[i, j])
+                
+                if similarity > 0.7: 
+                    similarities.append({
+                        'plan1': plan1_id,
+                        'plan2':  plan2_id,
+                        'similarity': round(similarity, 2),
+                        'warning': 'Plans très similaires - risque de cannibalisation'
+                    })
+                elif similarity > 0.5:
+                    similarities.append({
+                        'plan1':  plan1_id,
+                        'plan2': plan2_id,
+                        'similarity': round(similarity, 2),
+                        'note': 'Plans modérément similaires'
+                    })
         
         return similarities
 
@@ -1224,15 +3741,569 @@ class NLPService:
         return updates
 
 
+def canonical_hash(payload):
+    """Stable fingerprint of a JSON payload (key order and whitespace do not matter)"""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+def segment_least_squares(x, y, segment, count):
+    """
+    Closed-form least squares y = intercept + slope * x, fitted independently on
+    each segment of flat arrays (segment ids 0..count-1) in a few bincounts.
+    r_squared follows scikit-learn: 1.0 for a perfectly fitted constant series
+    """
+    n = np.bincount(segment, minlength=count).astype(np.float64)
+    safe = np.maximum(n, 1)
+    mean_x = np.bincount(segment, x, minlength=count) / safe
+    mean_y = np.bincount(segment, y, minlength=count) / safe
+    dx = x - mean_x[segment]
+    dy = y - mean_y[segment]
+    sxx = np.bincount(segment, dx * dx, minlength=count)
+    sxy = np.bincount(segment, dx * dy, minlength=count)
+    ss_tot = np.bincount(segment, dy * dy, minlength=count)
+    slope = np.divide(sxy, sxx, out=np.zeros(count), where=sxx > 0)
+    r_squared = np.divide(slope * sxy, ss_tot, out=np.ones(count), where=ss_tot > 0)
+    return {
+        'n': n,
+        'slope': slope,
+        'intercept': mean_y - slope * mean_x,
+        'r_squared': np.where(sxx > 0, r_squared, 0.0),
+        'mean': mean_y,
+        'variance': ss_tot / safe
+    }
+
+
+def rolling_slopes(x, y, window):
+    """Least-squares slope of every trailing window of `window` points (cumulative sums, O(n))"""
+    if len(x) < window:
+        return np.zeros(0)
+    # Center x for precision; slopes are shift-invariant
+    x = x - x.mean()
+    sums = [np.concatenate(([0.0], np.cumsum(v))) for v in (x, y, x * x, x * y)]
+    sx, sy, sxx, sxy = [c[window:] - c[:-window] for c in sums]
+    denominator = window * sxx - sx * sx
+    return np.divide(window * sxy - sx * sy, denominator, out=np.zeros(len(sx)), where=denominator > 0)
+
+
+def change_point(y, min_segment=3):
+    """
+    Best single mean shift: (index where the second regime starts, share of the
+    variance it explains), from cumulative sums over every admissible split
+    """
+    n = len(y)
+    if n < 2 * min_segment:
+        return None, 0.0
+    total, total_sq = y.sum(), (y * y).sum()
+    ss_full = total_sq - total * total / n
+    if ss_full <= 0:
+        return None, 0.0
+    k = np.arange(min_segment, n - min_segment + 1)
+    left, left_sq = np.cumsum(y)[k - 1], np.cumsum(y * y)[k - 1]
+    ss_split = (left_sq - left * left / k) + ((total_sq - left_sq) - (total - left) ** 2 / (n - k))
+    best = int(np.argmin(ss_split))
+    return int(k[best]), float(1 - ss_split[best] / ss_full)
+
+
+def statistics_number(value):
+    """A column value back as the int it came in as (counts), else float"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+REPORT_SCALAR_FIELDS = ('totalCompanies', 'activeCompanies', 'avgUsersPerCompany', 'totalActions',
+                        'completedActions', 'totalTexts', 'compliantTexts')
+
+
+def invalid_statistics_field(statistics):
+    """Name of the first report field present but not a number, None when the statistics are usable"""
+    def is_number(container, field):
+        value = container.get(field, 0)
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    
+    for field in REPORT_SCALAR_FIELDS:
+        if not is_number(statistics, field):
+            return field
+    distribution = statistics.get('subscriptionDistribution')
+    if distribution is None:
+        return None
+    if not isinstance(distribution, list):
+        return 'subscriptionDistribution'
+    for index, subscription in enumerate(distribution):
+        if not isinstance(subscription, dict):
+            return 'subscriptionDistribution[{}]'.format(index)
+        for field in ('count', 'avgUsers'):
+            if not is_number(subscription, field):
+                return 'subscriptionDistribution[{}].{}'.format(index, field)
+    return None
+
+SENTIMENT_WEIGHTS = {'activation': 0.3, 'action':  0.4, 'compliance':  0.3}
+# (minimum score, level, emoji, description, color), best level first
+SENTIMENT_LEVELS = [
+    (75, 'excellent', '🎉', "Performance exceptionnelle du système", '#10B981'),
+    (60, 'good', '✅', "Performance satisfaisante avec opportunités d'amélioration", '#3B82F6'),
+    (40, 'moderate', '⚠️', "Performance modérée nécessitant des actions correctives", '#F59E0B'),
+    (float('-inf'), 'critical', '🔴', "Performance critique nécessitant une intervention immédiate", '#EF4444')
+]
+# KPI trend: 'up' above the first threshold, 'down' below the second (None: never down)
+KPI_TREND_THRESHOLDS = {'activation': (60, 40), 'engagement': (3, None), 'actions': (60, 40), 'compliance': (70, 50)}
+# Anomaly rules in report order: (type, severity, emoji, description template, threshold)
+ANOMALY_RULES = {
+    'activation_faible': ('high', '⚠️', "Taux d'activation faible détecté ({:.1f}%) - Moins de 50% des entreprises sont actives", 50),
+    'utilisateurs_faible': ('medium', '👥', "Moyenne d'utilisateurs par entreprise faible ({:.1f}) - Sous-utilisation potentielle", 2),
+    'utilisateurs_eleve': ('info', '📊', "Engagement élevé détecté ({:.1f} utilisateurs/entreprise) - Opportunité d'upselling", 50),
+    'completion_faible': ('high', '📋', "Taux de complétion des actions critiquement bas ({:.1f}%)", 40),
+    'conformite_faible': ('high', '⚖️', "Écart de conformité significatif détecté ({:.1f}%)", 60)
+}
+
+
+# Series behind the history-based trend section of a report
+HISTORY_TREND_METRICS = ['totalSubscribers', 'activeCompanies', 'activationRate', 'actionCompletionRate',
+                         'complianceRate']
+STATS_HISTORY_PATH = os.getenv('STATS_HISTORY_PATH', os.path.join(DATA_DIR, 'statistics_history.sqlite'))
+# Relative change over the observed span: strong growth / minimal move counted as a trend
+TREND_STRONG_CHANGE = float(os.getenv('TREND_STRONG_CHANGE', 0.10))
+TREND_MIN_CHANGE = float(os.getenv('TREND_MIN_CHANGE', 0.02))
+
+
+class StatisticsHistory:
+    """
+    Local time series of statistics snapshots (SQLite, one row per tenant,
+    metric and time bucket). Each /generate-performance-report payload is
+    recorded, so trends are fitted over real history: closed-form least
+    squares, trailing-window slopes and mean-shift change points
+    """
+    
+    def __init__(self, path=STATS_HISTORY_PATH):
+        self.path = path
+        self.enabled = os.getenv('STATS_HISTORY_ENABLED', 'true').lower() == 'true'
+        # Snapshots within one bucket overwrite each other (dashboards refresh often)
+        self.bucket_seconds = float(os.getenv('STATS_HISTORY_BUCKET_SECONDS', 3600))
+        self.retention_days = float(os.getenv('STATS_HISTORY_RETENTION_DAYS', 730))
+        self.min_points = int(os.getenv('STATS_TREND_MIN_POINTS', 3))
+        self.window = int(os.getenv('STATS_ROLLING_WINDOW', 7))
+        self.min_change_gain = float(os.getenv('STATS_CHANGE_POINT_MIN_GAIN', 0.6))
+        self._local = threading.local()
+        self._schema_ready = False
+        self._writes = 0
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS points (
+                        tenant TEXT NOT NULL, metric TEXT NOT NULL, ts REAL NOT NULL, value REAL NOT NULL,
+                        PRIMARY KEY (tenant, metric, ts)
+                    ) WITHOUT ROWID
+                """)
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def snapshot_metrics(statistics):
+        """
+        The tracked series of one statistics payload: counters, rates, subscribers
+        (total and per plan). Raises ValueError when a field is not numeric
+        """
+        def number(value, field):
+            try:
+                value = float(value or 0)
+            except (TypeError, ValueError):
+                raise ValueError("{} doit être numérique".format(field))
+            if not np.isfinite(value):
+                raise ValueError("{} doit être numérique".format(field))
+            return value
+        
+        values = {field: number(statistics.get(field, 0), field) for field in REPORT_SCALAR_FIELDS}
+        values['activationRate'] = values['activeCompanies'] / max(values['totalCompanies'], 1) * 100
+        values['actionCompletionRate'] = values['completedActions'] / max(values['totalActions'], 1) * 100
+        values['complianceRate'] = values['compliantTexts'] / max(values['totalTexts'], 1) * 100
+        subscription_dist = statistics.get('subscriptionDistribution') or []
+        if not isinstance(subscription_dist, list) or not all(isinstance(s, dict) for s in subscription_dist):
+            raise ValueError("subscriptionDistribution doit être une liste d'objets")
+        counts = [number(s.get('count', 0), 'subscriptionDistribution.count') for s in subscription_dist]
+        values['totalSubscribers'] = sum(counts)
+        for s, count in zip(subscription_dist, counts):
+            if s.get('planId') is not None:
+                values['plan:{}'.format(s['planId'])] = count
+        return values
+    
+    def record(self, statistics, tenant='global', timestamp=None):
+        """Store a snapshot in its time bucket; returns the bucket timestamp"""
+        ts = time.time() if timestamp is None else float(timestamp)
+        bucket = ts - ts % self.bucket_seconds if self.bucket_seconds > 0 else ts
+        rows = [(tenant, metric, bucket, float(value)) for metric, value in self.snapshot_metrics(statistics).items()]
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO points (tenant, metric, ts, value) VALUES (?, ?, ?, ?)', rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._writes += 1
+        if self._writes % 500 == 0:
+            self.prune()
+        metrics.increment('stats_history.snapshots')
+        return bucket
+    
+    def prune(self):
+        cutoff = time.time() - self.retention_days * 86400
+        self._connect().execute('DELETE FROM points WHERE ts < ?', (cutoff,))
+    
+    def revision(self, tenant, metrics_filter=HISTORY_TREND_METRICS):
+        """(points, last timestamp, sum of values) of a tenant's series: changes whenever their history does"""
+        row = self._connect().execute(
+            'SELECT COUNT(*), MAX(ts), TOTAL(value) FROM points WHERE tenant = ? AND metric IN ({})'.format(
+                ','.join('?' * len(metrics_filter))), [tenant] + list(metrics_filter)).fetchone()
+        return list(row)
+    
+    def series(self, tenant, metrics_filter=None):
+        """{metric: (timestamps, values)} as float arrays, oldest first"""
+        query = 'SELECT metric, ts, value FROM points WHERE tenant = ?'
+        params = [tenant]
+        if metrics_filter:
+            query += ' AND metric IN ({})'.format(','.join('?' * len(metrics_filter)))
+            params.extend(metrics_filter)
+        rows = self._connect().execute(query + ' ORDER BY metric, ts', params).fetchall()
+        if not rows:
+            return {}
+        names = [r[0] for r in rows]
+        data = np.array([(r[1], r[2]) for r in rows], dtype=np.float64)
+        boundaries = [0] + [i for i in range(1, len(names)) if names[i] != names[i - 1]] + [len(names)]
+        return {names[a]: (data[a:b, 0], data[a:b, 1]) for a, b in zip(boundaries[:-1], boundaries[1:])}
+    
+    def analyze(self, tenant, metrics_filter=None):
+        """Trend of every series of a tenant: one vectorized fit for all, then windows and change points"""
+        series = {m: v for m, v in self.series(tenant, metrics_filter).items() if len(v[0]) >= self.min_points}
+        if not series:
+            return {}
+        names = list(series)
+        lengths = np.array([len(series[m][0]) for m in names])
+        segment = np.repeat(np.arange(len(names)), lengths)
+        # x in days since each series' first point
+        days = np.concatenate([(series[m][0] - series[m][0][0]) / 86400.0 for m in names])
+        values = np.concatenate([series[m][1] for m in names])
+        fit = segment_least_squares(days, values, segment, len(names))
+        
+        trends = {}
+        for i, metric in enumerate(names):
+            ts, y = series[metric]
+            x = days[segment == i]
+            span = float(x[-1])
+            slope = float(fit['slope'][i])
+            level = abs(float(fit['mean'][i]))
+            relative = slope * span / level if level > 0 else 0.0
+            trend = {
+                'points': int(lengths[i]),
+                'first_at': datetime.fromtimestamp(ts[0]).isoformat(),
+                'last_at': datetime.fromtimestamp(ts[-1]).isoformat(),
+                'span_days': round(span, 2),
+                'latest': float(y[-1]),
+                'slope_per_day': round(slope, 6),
+                'r_squared': round(float(fit['r_squared'][i]), 4),
+                'relative_change': round(relative, 4),
+                'direction': 'hausse' if relative > TREND_MIN_CHANGE else 'baisse' if relative < -TREND_MIN_CHANGE else 'stable',
+                'rolling': None,
+                'change_point': None
+            }
+            slopes = rolling_slopes(x, y, self.window)
+            if len(slopes):
+                trend['rolling'] = {
+                    'window': self.window,
+                    'latest_slope_per_day': round(float(slopes[-1]), 6),
+                    'previous_slope_per_day': round(float(slopes[-1 - self.window]), 6) if len(slopes) > self.window else None
+                }
+            index, gain = change_point(y)
+            if index is not None and gain >= self.min_change_gain:
+                before, after = float(y[:index].mean()), float(y[index:].mean())
+                trend['change_point'] = {
+                    'at': datetime.fromtimestamp(ts[index]).isoformat(),
+                    'mean_before': round(before, 4),
+                    'mean_after': round(after, 4),
+                    'relative_shift': round((after - before) / abs(before), 4) if before else None,
+                    'explained_variance': round(gain, 4)
+                }
+            trends[metric] = trend
+        return trends
+    
+    def tenants(self):
+        return [r[0] for r in self._connect().execute('SELECT DISTINCT tenant FROM points').fetchall()]
+    
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        row = self._connect().execute('SELECT COUNT(*), COUNT(DISTINCT tenant) FROM points').fetchone()
+        return {'enabled': True, 'points': row[0], 'tenants': row[1], 'bucket_seconds': self.bucket_seconds}
+
+
+statistics_history = StatisticsHistory()
+
+
+# Running state per series: (count, mean, var) plus the same before the current bucket
+ANOMALY_STATE_COLUMNS = ('count', 'mean', 'var', 'bucket', 'base_count', 'base_mean', 'base_var',
+                         'value', 'expected', 'std', 'z', 'anomalous', 'since', 'at')
+
+
+class OnlineAnomalyDetector:
+    """
+    Streaming anomaly detection over statistics snapshots: an exponentially
+    weighted mean and variance per tenant and metric, updated in O(1) time and
+    space per value. A value is flagged when it deviates from the running mean
+    by more than ANOMALY_Z_THRESHOLD standard deviations. The state is one row
+    per series in the statistics history database, read and written in one
+    transaction per snapshot, so every worker process shares it
+    """
+    
+    def __init__(self, path=STATS_HISTORY_PATH, bucket_seconds=None):
+        self.path = path
+        self.enabled = os.getenv('ANOMALY_DETECTOR_ENABLED', 'true').lower() == 'true'
+        self.alpha = float(os.getenv('ANOMALY_EWMA_ALPHA', 0.1))
+        self.threshold = float(os.getenv('ANOMALY_Z_THRESHOLD', 3.0))
+        # No flag until the running statistics have seen this many buckets
+        self.warmup = int(os.getenv('ANOMALY_WARMUP', 5))
+        # Floor on the deviation, relative to the mean: a constant series must not flag a 1% move
+        self.min_relative_std = float(os.getenv('ANOMALY_MIN_RELATIVE_STD', 0.01))
+        # Tenants and per-plan series come from clients: both are bounded
+        self.max_tenants = int(os.getenv('ANOMALY_MAX_TENANTS', 1000))
+        self.max_series_per_tenant = int(os.getenv('ANOMALY_MAX_SERIES_PER_TENANT', 200))
+        # Snapshots in the same bucket replace each other instead of being counted twice
+        self.bucket_seconds = float(os.getenv('ANOMALY_BUCKET_SECONDS', statistics_history.bucket_seconds
+                                              if bucket_seconds is None else bucket_seconds))
+        self._local = threading.local()
+        self._schema_ready = False
+        self.updates = 0
+        self.flagged = 0
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS anomaly_state (
+                        tenant TEXT NOT NULL, metric TEXT NOT NULL,
+                        count INTEGER NOT NULL, mean REAL NOT NULL, var REAL NOT NULL, bucket REAL,
+                        base_count INTEGER NOT NULL, base_mean REAL NOT NULL, base_var REAL NOT NULL,
+                        value REAL, expected REAL, std REAL, z REAL, anomalous INTEGER NOT NULL, since REAL, at REAL,
+                        PRIMARY KEY (tenant, metric)
+                    ) WITHOUT ROWID
+                """)
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+    
+    def _bucket(self, ts):
+        return ts - ts % self.bucket_seconds if self.bucket_seconds > 0 else ts
+    
+    def _update_series(self, state, value, bucket):
+        """Score value against the statistics before its bucket, then fold it in"""
+        if bucket == state['bucket']:
+            # Refresh of the current bucket: start again from the state before it
+            state['count'], state['mean'], state['var'] = state['base_count'], state['base_mean'], state['base_var']
+        else:
+            state['base_count'], state['base_mean'], state['base_var'] = state['count'], state['mean'], state['var']
+            state['bucket'] = bucket
+        count, mean, var = state['base_count'], state['base_mean'], state['base_var']
+        
+        std = max(var ** 0.5, self.min_relative_std * abs(mean), 1e-9)
+        z = (value - mean) / std if count >= self.warmup else 0.0
+        anomalous = abs(z) >= self.threshold
+        if anomalous and not state['anomalous']:
+            state['since'] = bucket
+        elif not anomalous:
+            state['since'] = None
+        state.update(value=value, expected=mean, std=std, z=z, anomalous=anomalous, at=bucket)
+        
+        if count == 0:
+            state['mean'], state['var'] = value, 0.0
+        else:
+            diff = value - mean
+            increment = self.alpha * diff
+            state['mean'] = mean + increment
+            state['var'] = (1 - self.alpha) * (var + diff * increment)
+        state['count'] = count + 1
+        return anomalous
+    
+    def update(self, statistics, tenant='global', timestamp=None):
+        """
+        Push one snapshot; returns the metrics flagged by it (older buckets than
+        the last are ignored), or None when the tenant cap is reached
+        """
+        ts = time.time() if timestamp is None else float(timestamp)
+        bucket = self._bucket(ts)
+        values = StatisticsHistory.snapshot_metrics(statistics)
+        flagged = []
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            series = {row[0]: dict(zip(ANOMALY_STATE_COLUMNS, row[1:])) for row in conn.execute(
+                'SELECT metric, {} FROM anomaly_state WHERE tenant = ?'.format(', '.join(ANOMALY_STATE_COLUMNS)),
+                (tenant,))}
+            if not series and conn.execute(
+                    'SELECT COUNT(*) FROM (SELECT DISTINCT tenant FROM anomaly_state)').fetchone()[0] >= self.max_tenants:
+                conn.execute('ROLLBACK')
+                metrics.increment('anomaly_detector.rejected_tenants')
+                return None
+            rows = []
+            for metric, value in values.items():
+                state = series.get(metric)
+                if state is None:
+                    if len(series) >= self.max_series_per_tenant:
+                        continue
+                    state = series[metric] = {'count': 0, 'mean': 0.0, 'var': 0.0, 'bucket': None, 'base_count': 0,
+                                              'base_mean': 0.0, 'base_var': 0.0, 'anomalous': False, 'since': None}
+                elif bucket < state['bucket']:
+                    continue
+                if self._update_series(state, float(value), bucket):
+                    flagged.append(self._describe(metric, state))
+                rows.append((tenant, metric) + tuple(state[c] for c in ANOMALY_STATE_COLUMNS))
+            conn.executemany('INSERT OR REPLACE INTO anomaly_state (tenant, metric, {}) VALUES ({})'.format(
+                ', '.join(ANOMALY_STATE_COLUMNS), ', '.join('?' * (len(ANOMALY_STATE_COLUMNS) + 2))), rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.updates += 1
+        self.flagged += len(flagged)
+        metrics.increment('anomaly_detector.updates')
+        if flagged:
+            metrics.increment('anomaly_detector.flagged', len(flagged))
+        return flagged
+    
+    def _describe(self, metric, state):
+        direction = 'hausse' if state['z'] > 0 else 'baisse'
+        return {
+            'metric': metric,
+            'value': statistics_number(state['value']),
+            'expected': round(state['expected'], 4),
+            'std': round(state['std'], 4),
+            'z_score': round(state['z'], 2),
+            'anomalous': bool(state['anomalous']),
+            'direction': direction,
+            'severity': 'critical' if abs(state['z']) >= 2 * self.threshold else 'warning',
+            'since': datetime.fromtimestamp(state['since']).isoformat() if state['since'] is not None else None,
+            'at': datetime.fromtimestamp(state['at']).isoformat(),
+            'observations': state['count'],
+            'message': "{} en {} : {} contre {:.2f} attendu (z = {:+.1f})".format(
+                metric, direction, statistics_number(state['value']), state['expected'], state['z'])
+        }
+    
+    def state(self, tenant):
+        """Current state of every metric of a tenant (None for an unknown tenant)"""
+        rows = self._connect().execute(
+            'SELECT metric, {} FROM anomaly_state WHERE tenant = ?'.format(', '.join(ANOMALY_STATE_COLUMNS)),
+            (tenant,)).fetchall()
+        if not rows:
+            return None
+        return {row[0]: self._describe(row[0], dict(zip(ANOMALY_STATE_COLUMNS, row[1:]))) for row in rows}
+    
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        row = self._connect().execute(
+            'SELECT COUNT(DISTINCT tenant), COUNT(*), TOTAL(anomalous) FROM anomaly_state').fetchone()
+        return {
+            'enabled': True,
+            'tenants': row[0],
+            'series': row[1],
+            'active_anomalies': int(row[2]),
+            'max_tenants': self.max_tenants,
+            'updates': self.updates,
+            'flagged': self.flagged
+        }
+
+
+anomaly_detector = OnlineAnomalyDetector()
+
+
 class PerformanceReportNLP:
     """
     Real NLP-based performance analysis using spaCy
+    Reports are cached by a canonical hash of the statistics; on a miss, each
+    section is memoized on the inputs it actually reads, so a change in the
+    subscription distribution does not recompute the KPI sections and vice versa
     """
     
     def __init__(self):
         self.text_analyzer = text_analyzer
-        
-    def generate_performance_report(self, statistics):
+        self.report_cache_size = int(os.getenv('REPORT_CACHE_SIZE', 64))
+        self.section_cache_size = int(os.getenv('REPORT_SECTION_CACHE_SIZE', 512))
+        self._reports = OrderedDict()
+        self._sections = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    @staticmethod
+    def _lru_get(cache, key, lock):
+        with lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+    
+    @staticmethod
+    def _lru_put(cache, key, value, capacity, lock):
+        with lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > capacity:
+                cache.popitem(last=False)
+    
+    def _section(self, name, inputs, compute):
+        """Memoized report section; cached values are shared between reports and never mutated"""
+        key = canonical_hash([name, inputs, self.text_analyzer.lexicons.current.version])
+        value = self._lru_get(self._sections, key, self._cache_lock)
+        if value is None:
+            metrics.increment('report_sections.misses')
+            value = compute()
+            self._lru_put(self._sections, key, value, self.section_cache_size, self._cache_lock)
+        else:
+            metrics.increment('report_sections.hits')
+        return value
+    
+    @staticmethod
+    def _history_revision(tenant):
+        if tenant is None or not statistics_history.enabled:
+            return None
+        return statistics_history.revision(tenant)
+    
+    def report_fingerprint(self, statistics, tenant=None):
+        """ETag value of the report for these statistics (and the tenant's history, which feeds the trend)"""
+        return canonical_hash([statistics, self.text_analyzer.lexicons.current.version,
+                               tenant, self._history_revision(tenant)])
+    
+    def cached_performance_report(self, statistics, tenant=None):
+        """(report, fingerprint); identical statistics are served from the report cache"""
+        fingerprint = self.report_fingerprint(statistics, tenant)
+        report = self._lru_get(self._reports, fingerprint, self._cache_lock)
+        if report is not None:
+            metrics.increment('report_cache.hits')
+            return report, fingerprint
+        metrics.increment('report_cache.misses')
+        report = self.generate_performance_report(statistics, tenant)
+        if report.get('success'):
+            self._lru_put(self._reports, fingerprint, report, self.report_cache_size, self._cache_lock)
+        return report, fingerprint
+    
+    def clear_cache(self):
+        with self._cache_lock:
+            self._reports.clear()
+            self._sections.clear()
+    
+    def cache_stats(self):
+        with self._cache_lock:
+            return {'reports': len(self._reports), 'sections': len(self._sections)}
+    
+    def generate_performance_report(self, statistics, tenant=None):
         """Generate comprehensive NLP-based performance report"""
         try:
             total_companies = statistics. get('totalCompanies', 0)
@@ -1249,50 +4320,60 @@ class PerformanceReportNLP:
             action_completion_rate = (completed_actions / max(total_actions, 1)) * 100
             compliance_rate = (compliant_texts / max(total_texts, 1)) * 100
             
+            # Section inputs: the scalar counters and/or the subscription distribution
+            scalars = {field: statistics.get(field, 0) for field in REPORT_SCALAR_FIELDS}
+            
             # 1. Sentiment analysis of system health
-            sentiment = self._analyze_system_sentiment(
+            sentiment = self._section('sentiment', scalars, lambda: self._analyze_system_sentiment(
                 activation_rate, 
                 action_completion_rate, 
                 compliance_rate
-            )
+            ))
             
             # 2. Trend detection
-            trend_analysis = self._detect_trends(subscription_dist, total_companies)
+            trend_analysis = self._section('trends', [subscription_dist, total_companies, tenant,
+                                                      self._history_revision(tenant)],
+                                           lambda: self._detect_trends(subscription_dist, total_companies, tenant))
             
             # 3.  Anomaly detection
-            anomalies = self._detect_anomalies(statistics)
+            anomalies = self._section('anomalies', scalars, lambda: self._detect_anomalies(statistics))
             
             # 4. NLP-enhanced executive summary
-            executive_summary = self._generate_executive_summary_nlp(
+            executive_summary = self._section('executive_summary', [scalars, trend_analysis], lambda: self._generate_executive_summary_nlp(
                 sentiment,
                 activation_rate,
                 action_completion_rate,
                 compliance_rate,
                 trend_analysis,
                 statistics
-            )
+            ))
             
             # 5. KPIs with NLP context
-            kpis = self._extract_kpis(statistics)
+            kpis = self._section('kpis', scalars, lambda: self._extract_kpis(statistics))
             
             # 6. NLP-enhanced recommendations
-            recommendations = self._generate_recommendations_nlp(
+            recommendations = self._section('recommendations', scalars, lambda: self._generate_recommendations_nlp(
                 sentiment,
                 anomalies,
                 kpis,
                 statistics
-            )
+            ))
             
             # 7. Detailed sections with NLP analysis
             sections = {
-                'user_engagement': self._analyze_user_engagement(avg_users, active_companies),
-                'compliance_analysis': self._analyze_compliance(compliance_rate, compliant_texts, total_texts),
-                'action_performance': self._analyze_action_performance(action_completion_rate, completed_actions, total_actions),
-                'subscription_insights': self._analyze_subscriptions(subscription_dist, active_companies)
+                'user_engagement': self._section('user_engagement', scalars, lambda: self._analyze_user_engagement(
+                    avg_users, active_companies)),
+                'compliance_analysis': self._section('compliance_analysis', scalars, lambda: self._analyze_compliance(
+                    compliance_rate, compliant_texts, total_texts)),
+                'action_performance': self._section('action_performance', scalars, lambda: self._analyze_action_performance(
+                    action_completion_rate, completed_actions, total_actions)),
+                'subscription_insights': self._section('subscription_insights', [subscription_dist, active_companies],
+                                                       lambda: self._analyze_subscriptions(subscription_dist, active_companies))
             }
             
             # 8. NLP Analysis of plan names and descriptions
-            nlp_text_analysis = self._analyze_subscription_texts(subscription_dist)
+            nlp_text_analysis = self._section('subscription_texts', subscription_dist,
+                                              lambda: self._analyze_subscription_texts(subscription_dist))
             
             return {
                 'success': True,
@@ -1302,7 +4383,8 @@ class PerformanceReportNLP:
                         'report_period': 'Période Complète',
                         'analysis_method': 'Analyse NLP (spaCy) + Analyse Statistique',
                         'language': 'fr',
-                        'nlp_model': 'fr_core_news_md'
+                        'nlp_model': 'fr_core_news_md',
+                        'lexicon_version': self.text_analyzer.lexicons.current.version
                     },
                     'sentiment':  sentiment,
                     'executive_summary': executive_summary,
@@ -1329,6 +4411,140 @@ class PerformanceReportNLP:
             logger.error(traceback.format_exc())
             return self._get_fallback_report()
     
+    def generate_bulk_reports(self, records):
+        """
+        Per-company reports for many statistics records at once. Rates, sentiment
+        scores, anomaly thresholds, KPI trends, trend fits and concentration
+        indices are NumPy column operations over all records; only the final
+        rendering is per record. Plan-name text analysis is not included
+        """
+        n = len(records)
+        if not n:
+            return []
+        
+        # ----- scalar columns -----
+        columns = {field: np.array([r.get(field, 0) or 0 for r in records], dtype=np.float64)
+                   for field in REPORT_SCALAR_FIELDS}
+        total_companies = columns['totalCompanies']
+        total_actions = columns['totalActions']
+        total_texts = columns['totalTexts']
+        avg_users = columns['avgUsersPerCompany']
+        activation = columns['activeCompanies'] / np.maximum(total_companies, 1) * 100
+        action_rate = columns['completedActions'] / np.maximum(total_actions, 1) * 100
+        compliance = columns['compliantTexts'] / np.maximum(total_texts, 1) * 100
+        
+        score = (activation * SENTIMENT_WEIGHTS['activation'] + action_rate * SENTIMENT_WEIGHTS['action']
+                 + compliance * SENTIMENT_WEIGHTS['compliance'])
+        thresholds = np.array([level[0] for level in SENTIMENT_LEVELS])
+        sentiment_level = np.argmax(score[:, None] >= thresholds[None, :], axis=1)
+        
+        rates = {'activation': activation, 'engagement': avg_users, 'actions': action_rate, 'compliance': compliance}
+        kpi_trends = {}
+        for kind, values in rates.items():
+            up, down = KPI_TREND_THRESHOLDS[kind]
+            down_mask = values < down if down is not None else np.zeros(n, dtype=bool)
+            kpi_trends[kind] = np.where(values > up, 'up', np.where(down_mask, 'down', 'neutral'))
+        
+        # Same rules and order as _detect_anomalies
+        anomaly_masks = [
+            ('activation_faible', activation, (total_companies > 0) & (activation < 50)),
+            ('utilisateurs_faible', avg_users, avg_users < 2),
+            ('utilisateurs_eleve', avg_users, avg_users > 50),
+            ('completion_faible', action_rate, (total_actions > 0) & (action_rate < 40)),
+            ('conformite_faible', compliance, (total_texts > 0) & (compliance < 60))
+        ]
+        
+        # ----- subscription distributions, flattened with a record index -----
+        distributions = [r.get('subscriptionDistribution') or [] for r in records]
+        lengths = np.array([len(d) for d in distributions], dtype=np.int64)
+        counts = np.array([s.get('count', 0) or 0 for d in distributions for s in d], dtype=np.float64)
+        segment = np.repeat(np.arange(n), lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        x = np.arange(len(counts)) - np.repeat(starts, lengths)
+        
+        total_subscribers = np.bincount(segment, counts, minlength=n)
+        # Least squares over plan positions (see _detect_trends without history)
+        fit = segment_least_squares(x.astype(np.float64), counts, segment, n)
+        mean, variance = fit['mean'], fit['variance']
+        regression = lengths >= 3
+        slope = np.where(regression, fit['slope'], 0.0)
+        r_squared = np.where(regression, fit['r_squared'], 0.0)
+        
+        concentration = np.divide(np.bincount(segment, counts ** 2, minlength=n), total_subscribers ** 2,
+                                  out=np.zeros(n), where=total_subscribers > 0)
+        penetration = total_subscribers / np.maximum(columns['activeCompanies'], 1) * 100
+        # First max / first min per record, like max()/min() over the list
+        most = np.lexsort((x, -counts, segment))
+        least = np.lexsort((x, counts, segment))
+        first = starts[lengths > 0]
+        most_index = np.full(n, -1)
+        least_index = np.full(n, -1)
+        most_index[lengths > 0] = most[first] - starts[lengths > 0]
+        least_index[lengths > 0] = least[first] - starts[lengths > 0]
+        
+        # ----- per-record rendering -----
+        generated_at = datetime.now().isoformat()
+        lexicon_version = self.text_analyzer.lexicons.current.version
+        reports = []
+        for i, statistics in enumerate(records):
+            dist = distributions[i]
+            subscribers = statistics_number(total_subscribers[i])
+            sentiment = self._render_sentiment(float(score[i]), int(sentiment_level[i]), float(activation[i]),
+                                               float(action_rate[i]), float(compliance[i]))
+            if len(dist) < 2:
+                trend_analysis = self._detect_trends(dist, statistics.get('totalCompanies', 0))
+            else:
+                trend_analysis = self._render_trend(len(dist), subscribers, float(mean[i]), float(variance[i]),
+                                                    float(np.sqrt(variance[i])), float(slope[i]), float(r_squared[i]))
+            # Engagement values are rendered as given (an int stays an int), rates as computed
+            values = {kind: float(v[i]) for kind, v in rates.items()}
+            values['engagement'] = statistics.get('avgUsersPerCompany', 0)
+            anomalies = [self._anomaly(kind, values['engagement'] if column is avg_users else float(column[i]))
+                         for kind, column, mask in anomaly_masks if mask[i]]
+            kpis = self._render_kpis(statistics, values, {kind: str(t[i]) for kind, t in kpi_trends.items()})
+            reports.append({
+                'success': True,
+                'report': {
+                    'metadata': {
+                        'generated_at': generated_at,
+                        'report_period': 'Période Complète',
+                        'analysis_method': 'Analyse Statistique groupée',
+                        'language': 'fr',
+                        'lexicon_version': lexicon_version
+                    },
+                    'sentiment': sentiment,
+                    'executive_summary': self._generate_executive_summary_nlp(
+                        sentiment, float(activation[i]), float(action_rate[i]), float(compliance[i]),
+                        trend_analysis, statistics),
+                    'kpis': kpis,
+                    'trend_analysis': trend_analysis,
+                    'anomalies': anomalies,
+                    'sections': {
+                        'user_engagement': self._analyze_user_engagement(
+                            statistics.get('avgUsersPerCompany', 0), statistics.get('activeCompanies', 0)),
+                        'compliance_analysis': self._analyze_compliance(
+                            float(compliance[i]), statistics.get('compliantTexts', 0), statistics.get('totalTexts', 0)),
+                        'action_performance': self._analyze_action_performance(
+                            float(action_rate[i]), statistics.get('completedActions', 0), statistics.get('totalActions', 0)),
+                        'subscription_insights': self._render_subscriptions(
+                            dist, subscribers, dist[most_index[i]], dist[least_index[i]],
+                            float(penetration[i]), float(concentration[i])) if dist else self._analyze_subscriptions(
+                            dist, statistics.get('activeCompanies', 0))
+                    },
+                    'recommendations': self._generate_recommendations_nlp(sentiment, anomalies, kpis, statistics),
+                    'raw_metrics': {
+                        'totalCompanies': statistics.get('totalCompanies', 0),
+                        'activeCompanies': statistics.get('activeCompanies', 0),
+                        'activationRate': round(float(activation[i]), 2),
+                        'avgUsersPerCompany': round(statistics.get('avgUsersPerCompany', 0), 2),
+                        'actionCompletionRate': round(float(action_rate[i]), 2),
+                        'complianceRate': round(float(compliance[i]), 2)
+                    }
+                }
+            })
+        metrics.increment('reports.bulk_records', n)
+        return reports
+    
     def _analyze_subscription_texts(self, subscription_dist):
         """Use NLP to analyze plan names and extract patterns"""
         if not subscription_dist: 
@@ -1339,15 +4555,18 @@ class PerformanceReportNLP:
         if not plan_names:
             return {'analyzed': False, 'reason': 'Aucun nom de plan disponible'}
         
+        # Name-only plan entries: cached across reports, new names parsed in one batch
+        entries = plan_cache.analyze_many([{'name': name, 'features': []} for name in plan_names])
+        
         # Analyze each plan name
         plan_analyses = []
         all_keywords = []
         
-        for name in plan_names: 
-            analysis = self.text_analyzer.analyze_text(name)
+        for name, entry in zip(plan_names, entries): 
+            analysis = entry['name_analysis']
             
             # Extract key info
-            keywords = [t['lemma'] for t in analysis. get('key_terms', [])]
+            keywords = [t.lemma for t in analysis. get('key_terms', [])]
             all_keywords.extend(keywords)
             
             plan_analyses.append({
@@ -1370,35 +4589,18 @@ class PerformanceReportNLP:
     
     def _analyze_system_sentiment(self, activation_rate, action_rate, compliance_rate):
         """Sentiment analysis based on performance indicators"""
-        weights = {'activation': 0.3, 'action':  0.4, 'compliance':  0.3}
+        weights = SENTIMENT_WEIGHTS
         
         score = (
             (activation_rate * weights['activation']) +
             (action_rate * weights['action']) +
             (compliance_rate * weights['compliance'])
         )
-        
-        if score >= 75:
-            sentiment = 'excellent'
-            emoji = '🎉'
-            description = "Performance exceptionnelle du système"
-            color = '#10B981'
-        elif score >= 60:
-            sentiment = 'good'
-            emoji = '✅'
-            description = "Performance satisfaisante avec opportunités d'amélioration"
-            color = '#3B82F6'
-        elif score >= 40:
-            sentiment = 'moderate'
-            emoji = '⚠️'
-            description = "Performance modérée nécessitant des actions correctives"
-            color = '#F59E0B'
-        else:
-            sentiment = 'critical'
-            emoji = '🔴'
-            description = "Performance critique nécessitant une intervention immédiate"
-            color = '#EF4444'
-        
+        level = next(i for i, (threshold, *_) in enumerate(SENTIMENT_LEVELS) if score >= threshold)
+        return self._render_sentiment(score, level, activation_rate, action_rate, compliance_rate)
+    
+    def _render_sentiment(self, score, level, activation_rate, action_rate, compliance_rate):
+        _, sentiment, emoji, description, color = SENTIMENT_LEVELS[level]
         return {
             'score': round(score, 2),
             'level': sentiment,
@@ -1412,8 +4614,17 @@ class PerformanceReportNLP:
             }
         }
     
-    def _detect_trends(self, subscription_dist, total_companies):
-        """Trend detection using statistical analysis"""
+    def _detect_trends(self, subscription_dist, total_companies, tenant=None):
+        """
+        Trend detection using statistical analysis. With recorded history for the
+        tenant the trend is fitted over time; otherwise it falls back to the
+        shape of the current subscription distribution
+        """
+        if tenant is not None and statistics_history.enabled:
+            history = statistics_history.analyze(tenant, HISTORY_TREND_METRICS)
+            if 'totalSubscribers' in history:
+                return self._render_history_trend(history)
+        
         if not subscription_dist or len(subscription_dist) < 2:
             return {
                 'direction': 'stable',
@@ -1433,19 +4644,63 @@ class PerformanceReportNLP:
         
         # Use linear regression to detect trend direction
         if len(subscriber_counts) >= 3:
-            X = np.array(range(len(subscriber_counts))).reshape(-1, 1)
-            y = np.array(subscriber_counts)
-            
-            reg = LinearRegression()
-            reg.fit(X, y)
-            
-            slope = float(reg.coef_[0])
-            r_squared = float(reg.score(X, y))
-            
+            y = np.array(subscriber_counts, dtype=np.float64)
+            fit = segment_least_squares(np.arange(len(y), dtype=np.float64), y, np.zeros(len(y), dtype=np.int64), 1)
+            slope = float(fit['slope'][0])
+            r_squared = float(fit['r_squared'][0])
+        else:
+            slope = 0
+            r_squared = 0
+        
+        return self._render_trend(len(subscriber_counts), total_subscribers, avg_per_plan, variance, std_dev,
+                                  slope, r_squared)
+    
+    def _render_history_trend(self, history):
+        """Trend over the recorded snapshots, driven by the total subscriber series"""
+        subscribers = history['totalSubscribers']
+        change = subscribers['relative_change']
+        if change > TREND_STRONG_CHANGE and subscribers['r_squared'] > 0.5:
+            direction, emoji = 'croissance_forte', '📈'
+            description = "Hausse de {:.1f}% des abonnements sur {:.0f} jours (R²: {:.2f})".format(
+                change * 100, subscribers['span_days'], subscribers['r_squared'])
+        elif change > TREND_MIN_CHANGE:
+            direction, emoji = 'croissance_stable', '➡️'
+            description = "Croissance légère des abonnements (+{:.1f}% sur {:.0f} jours)".format(
+                change * 100, subscribers['span_days'])
+        elif change < -TREND_MIN_CHANGE:
+            direction, emoji = 'déclin', '📉'
+            description = "Baisse de {:.1f}% des abonnements sur {:.0f} jours - Action requise".format(
+                -change * 100, subscribers['span_days'])
+        else:
+            direction, emoji = 'stable', '➡️'
+            description = "Abonnements stables sur {:.0f} jours".format(subscribers['span_days'])
+        
+        shift = subscribers['change_point']
+        if shift and shift['relative_shift'] is not None:
+            description += " ; rupture le {} ({:+.1f}%)".format(shift['at'][:10], shift['relative_shift'] * 100)
+        
+        return {
+            'direction': direction,
+            'emoji': emoji,
+            'description': description,
+            'source': 'history',
+            'metrics': {
+                'total_subscribers': statistics_number(subscribers['latest']),
+                'history_points': subscribers['points'],
+                'span_days': subscribers['span_days'],
+                'trend_slope': subscribers['slope_per_day'],
+                'r_squared': subscribers['r_squared'],
+                'relative_change': subscribers['relative_change']
+            },
+            'history': history
+        }
+    
+    def _render_trend(self, plan_count, total_subscribers, avg_per_plan, variance, std_dev, slope, r_squared):
+        if plan_count >= 3:
             if slope > 0.5 and r_squared > 0.5:
                 direction = 'croissance_forte'
                 emoji = '📈'
-                description = "Tendance à la hausse détectée (pente:  {:.2f}, R²: {:. 2f})".format(slope, r_squared)
+                description = "Tendance à la hausse détectée (pente:  {:.2f}, R²: {:.2f})".format(slope, r_squared)
             elif slope > 0:
                 direction = 'croissance_stable'
                 emoji = '➡️'
@@ -1461,8 +4716,6 @@ class PerformanceReportNLP:
         else:
             direction = 'stable'
             emoji = '➡️'
-            slope = 0
-            r_squared = 0
             description = "Adoption stable avec {} abonnements actifs".format(total_subscribers)
         
         return {
@@ -1474,7 +4727,7 @@ class PerformanceReportNLP:
                 'avg_per_plan': round(avg_per_plan, 2),
                 'distribution_variance': round(variance, 2),
                 'std_deviation': round(std_dev, 2),
-                'plan_count': len(subscriber_counts),
+                'plan_count': plan_count,
                 'trend_slope': round(slope, 4),
                 'r_squared': round(r_squared, 4)
             }
@@ -1496,118 +4749,43 @@ class PerformanceReportNLP:
         if total_companies > 0: 
             activation_rate = (active_companies / total_companies) * 100
             if activation_rate < 50:
-                anomalies.append({
-                    'type':  'activation_faible',
-                    'severity': 'high',
-                    'emoji': '⚠️',
-                    'description': "Taux d'activation faible détecté ({:.1f}%) - Moins de 50% des entreprises sont actives".format(activation_rate),
-                    'value': round(activation_rate, 2),
-                    'threshold': 50,
-                    'nlp_context': self._get_anomaly_nlp_context('activation_faible')
-                })
+                anomalies.append(self._anomaly('activation_faible', activation_rate))
         
         # Anomaly 2:  Abnormal user count
         if avg_users < 2:
-            anomalies.append({
-                'type': 'utilisateurs_faible',
-                'severity': 'medium',
-                'emoji': '👥',
-                'description': "Moyenne d'utilisateurs par entreprise faible ({:.1f}) - Sous-utilisation potentielle".format(avg_users),
-                'value': round(avg_users, 2),
-                'threshold': 2,
-                'nlp_context': self._get_anomaly_nlp_context('utilisateurs_faible')
-            })
+            anomalies.append(self._anomaly('utilisateurs_faible', avg_users))
         elif avg_users > 50:
-            anomalies.append({
-                'type': 'utilisateurs_eleve',
-                'severity': 'info',
-                'emoji': '📊',
-                'description': "Engagement élevé détecté ({:.1f} utilisateurs/entreprise) - Opportunité d'upselling".format(avg_users),
-                'value': round(avg_users, 2),
-                'threshold': 50,
-                'nlp_context': self._get_anomaly_nlp_context('utilisateurs_eleve')
-            })
+            anomalies.append(self._anomaly('utilisateurs_eleve', avg_users))
         
         # Anomaly 3: Action completion analysis
         if total_actions > 0:
             completion_rate = (completed_actions / total_actions) * 100
             if completion_rate < 40:
-                anomalies.append({
-                    'type':  'completion_faible',
-                    'severity':  'high',
-                    'emoji':  '📋',
-                    'description': "Taux de complétion des actions critiquement bas ({:.1f}%)".format(completion_rate),
-                    'value': round(completion_rate, 2),
-                    'threshold': 40,
-                    'nlp_context':  self._get_anomaly_nlp_context('completion_faible')
-                })
+                anomalies.append(self._anomaly('completion_faible', completion_rate))
         
         # Anomaly 4: Compliance gap
         if total_texts > 0:
             compliance_rate = (compliant_texts / total_texts) * 100
             if compliance_rate < 60:
-                anomalies.append({
-                    'type':  'conformite_faible',
-                    'severity': 'high',
-                    'emoji': '⚖️',
-                    'description': "Écart de conformité significatif détecté ({:.1f}%)".format(compliance_rate),
-                    'value': round(compliance_rate, 2),
-                    'threshold': 60,
-                    'nlp_context':  self._get_anomaly_nlp_context('conformite_faible')
-                })
+                anomalies.append(self._anomaly('conformite_faible', compliance_rate))
         
         return anomalies
     
+    def _anomaly(self, anomaly_type, value):
+        severity, emoji, template, threshold = ANOMALY_RULES[anomaly_type]
+        return {
+            'type': anomaly_type,
+            'severity': severity,
+            'emoji': emoji,
+            'description': template.format(value),
+            'value': round(value, 2),
+            'threshold': threshold,
+            'nlp_context': self._get_anomaly_nlp_context(anomaly_type)
+        }
+    
     def _get_anomaly_nlp_context(self, anomaly_type):
         """Get NLP-generated context for anomaly types"""
-        contexts = {
-            'activation_faible': {
-                'causes_probables': [
-                    'Processus d\'onboarding complexe',
-                    'Manque de formation initiale',
-                    'Interface utilisateur peu intuitive'
-                ],
-                'impact_business': 'Réduction du ROI sur acquisition client',
-                'urgence':  'Élevée'
-            },
-            'utilisateurs_faible': {
-                'causes_probables': [
-                    'Limites de licence restrictives',
-                    'Manque de sensibilisation interne',
-                    'Fonctionnalités non adaptées aux équipes'
-                ],
-                'impact_business': 'Sous-exploitation de la plateforme',
-                'urgence': 'Moyenne'
-            },
-            'utilisateurs_eleve':  {
-                'causes_probables': [
-                    'Forte adoption organique',
-                    'Besoins métier bien adressés',
-                    'Champions internes actifs'
-                ],
-                'impact_business': 'Opportunité de croissance revenue',
-                'urgence': 'Faible - Opportunité'
-            },
-            'completion_faible': {
-                'causes_probables':  [
-                    'Actions mal définies ou trop complexes',
-                    'Manque de ressources assignées',
-                    'Délais irréalistes'
-                ],
-                'impact_business': 'Risque de non-conformité et retards projets',
-                'urgence': 'Élevée'
-            },
-            'conformite_faible': {
-                'causes_probables': [
-                    'Évolutions réglementaires non suivies',
-                    'Manque d\'expertise interne',
-                    'Processus de mise à jour inefficace'
-                ],
-                'impact_business': 'Risque légal et financier',
-                'urgence': 'Critique'
-            }
-        }
-        return contexts.get(anomaly_type, {})
+        return self.text_analyzer.lexicons.current.anomaly_contexts.get(anomaly_type, {})
     
     def _generate_executive_summary_nlp(self, sentiment, activation, action_rate, compliance, trend, statistics):
         """Generate executive summary using NLP-enhanced natural language generation"""
@@ -1673,13 +4851,34 @@ class PerformanceReportNLP:
         action_rate = (completed_actions / max(total_actions, 1)) * 100
         compliance_rate = (compliant_texts / max(total_texts, 1)) * 100
         
+        values = {'activation': activation_rate, 'engagement': avg_users, 'actions': action_rate, 'compliance': compliance_rate}
+        trends = {kind: self._kpi_trend(kind, value) for kind, value in values.items()}
+        return self._render_kpis(statistics, values, trends)
+    
+    @staticmethod
+    def _kpi_trend(kind, value):
+        up, down = KPI_TREND_THRESHOLDS[kind]
+        return 'up' if value > up else 'down' if down is not None and value < down else 'neutral'
+    
+    def _render_kpis(self, statistics, values, trends):
+        total_companies = statistics. get('totalCompanies', 0)
+        active_companies = statistics.get('activeCompanies', 0)
+        total_actions = statistics. get('totalActions', 0)
+        completed_actions = statistics.get('completedActions', 0)
+        total_texts = statistics.get('totalTexts', 0)
+        compliant_texts = statistics.get('compliantTexts', 0)
+        activation_rate = values['activation']
+        avg_users = values['engagement']
+        action_rate = values['actions']
+        compliance_rate = values['compliance']
+        
         kpis = [
             {
                 'name': 'Taux d\'Activation',
                 'value': round(activation_rate, 2),
                 'unit': '%',
                 'category': 'adoption',
-                'trend': 'up' if activation_rate > 60 else 'down' if activation_rate < 40 else 'neutral',
+                'trend': trends['activation'],
                 'description': "{} entreprises actives sur {}".format(active_companies, total_companies),
                 'nlp_insight': self._generate_kpi_insight('activation', activation_rate)
             },
@@ -1688,7 +4887,7 @@ class PerformanceReportNLP:
                 'value': round(avg_users, 2),
                 'unit': ' utilisateurs/entreprise',
                 'category': 'engagement',
-                'trend':  'up' if avg_users > 3 else 'neutral',
+                'trend':  trends['engagement'],
                 'description': "Moyenne de {:.1f} utilisateurs par entreprise".format(avg_users),
                 'nlp_insight': self._generate_kpi_insight('engagement', avg_users)
             },
@@ -1697,7 +4896,7 @@ class PerformanceReportNLP:
                 'value':  round(action_rate, 2),
                 'unit': '%',
                 'category': 'performance',
-                'trend': 'up' if action_rate > 60 else 'down' if action_rate < 40 else 'neutral',
+                'trend': trends['actions'],
                 'description': "{} actions complétées sur {}". format(completed_actions, total_actions),
                 'nlp_insight': self._generate_kpi_insight('actions', action_rate)
             },
@@ -1706,7 +4905,7 @@ class PerformanceReportNLP:
                 'value':  round(compliance_rate, 2),
                 'unit': '%',
                 'category': 'compliance',
-                'trend': 'up' if compliance_rate > 70 else 'down' if compliance_rate < 50 else 'neutral',
+                'trend': trends['compliance'],
                 'description': "{} textes conformes sur {}".format(compliant_texts, total_texts),
                 'nlp_insight':  self._generate_kpi_insight('compliance', compliance_rate)
             }
@@ -2017,6 +5216,11 @@ class PerformanceReportNLP:
         else: 
             concentration_index = 0
         
+        return self._render_subscriptions(subscription_dist, total_subscribers, most_popular, least_popular,
+                                          penetration_rate, concentration_index)
+    
+    def _render_subscriptions(self, subscription_dist, total_subscribers, most_popular, least_popular,
+                              penetration_rate, concentration_index):
         return {
             'penetration_rate': round(penetration_rate, 2),
             'total_subscribers': total_subscribers,
@@ -2082,9 +5286,1053 @@ class PerformanceReportNLP:
         }
 
 
-# Initialize services
-nlp_service = NLPService()
-performance_nlp = PerformanceReportNLP()
+# Initialize services
+nlp_service = NLPService()
+performance_nlp = PerformanceReportNLP()
+
+
+def name_vectors(names):
+    """Unit-normalized vectors of short names (tokenizer + static vectors only, no pipeline); None without vectors"""
+    model = doc_cache.nlp
+    if model is None or not model.vocab.vectors_length:
+        return None
+    matrix = np.zeros((len(names), model.vocab.vectors_length), dtype=np.float32)
+    for i, name in enumerate(names):
+        doc = model.make_doc(name.lower())
+        tokens = [t for t in doc if t.has_vector and not (t.is_stop or t.is_punct)]
+        if tokens:
+            matrix[i] = np.mean([t.vector for t in tokens], axis=0)
+    norms = np.linalg.norm(matrix, axis=1)
+    valid = norms > 0
+    matrix[valid] /= norms[valid, None]
+    return matrix
+
+
+TAXONOMY_POOL_PATH = os.getenv('TAXONOMY_POOL_PATH', os.path.join(DATA_DIR, 'taxonomy_pool.json'))
+
+
+class TaxonomySuggestionPool:
+    """
+    Validated taxonomy suggestions generated ahead of demand by a background
+    worker; /suggest-taxonomy takes one that does not match the caller's
+    existing domains (normalized name or spaCy vector similarity) instead of
+    waiting on Gemini
+    """
+    
+    def __init__(self, service, path=TAXONOMY_POOL_PATH):
+        self.service = service
+        self.path = path
+        self.size = int(os.getenv('TAXONOMY_POOL_SIZE', 20))
+        self.refill_below = int(os.getenv('TAXONOMY_POOL_REFILL_BELOW', max(1, self.size // 2)))
+        # Static vectors put distinct domains sharing a word close together
+        # ("Protection des données" / "Gouvernance des données" ~ 0.89)
+        self.similarity = float(os.getenv('TAXONOMY_POOL_SIMILARITY', 0.92))
+        self.retry_seconds = float(os.getenv('TAXONOMY_POOL_RETRY_SECONDS', 30))
+        self.persist = os.getenv('TAXONOMY_POOL_PERSIST', 'true').lower() == 'true'
+        self._entries = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.served = 0
+        self.misses = 0
+        self.generated = 0
+        self.rejected = 0
+        if self.persist:
+            self.load()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    # ----- matching -----
+    
+    @staticmethod
+    def normalize(name):
+        name = unicodedata.normalize('NFKD', (name or '').lower())
+        name = ''.join(c for c in name if not unicodedata.combining(c))
+        return ' '.join(re.findall(r'\w+', name))
+    
+    def _entry(self, suggestion):
+        name = suggestion['domain']['name']
+        vectors = name_vectors([name])
+        return {'suggestion': suggestion, 'key': self.normalize(name),
+                'vector': vectors[0] if vectors is not None else None}
+    
+    def _conflicts(self, entries, names):
+        """Per entry: does its domain match one of names (same normalized name or similar vector)"""
+        keys = {self.normalize(name) for name in names}
+        conflicts = np.array([entry['key'] in keys for entry in entries], dtype=bool)
+        if names and entries and all(entry['vector'] is not None for entry in entries):
+            existing = name_vectors(list(names))
+            if existing is not None:
+                similarity = np.stack([entry['vector'] for entry in entries]) @ existing.T
+                conflicts |= similarity.max(axis=1) >= self.similarity
+        return conflicts
+    
+    # ----- serving -----
+    
+    def take(self, existing_domains=None):
+        """A pooled suggestion whose domain is not among existing_domains (removed from the pool), or None"""
+        existing_domains = [d for d in (existing_domains or []) if isinstance(d, str) and d.strip()]
+        with self._lock:
+            entries = list(self._entries)
+        taken = None
+        if entries:
+            conflicts = self._conflicts(entries, existing_domains)
+            with self._lock:
+                # Entries hold numpy vectors: compare by identity, not ==
+                live = {id(e): i for i, e in enumerate(self._entries)}
+                for entry, conflict in zip(entries, conflicts):
+                    if not conflict and id(entry) in live:
+                        del self._entries[live[id(entry)]]
+                        taken = entry
+                        break
+        if taken is None:
+            self.misses += 1
+            metrics.increment('taxonomy_pool.misses')
+        else:
+            self.served += 1
+            metrics.increment('taxonomy_pool.hits')
+        if len(self) < self.refill_below:
+            self._wake.set()
+        return taken['suggestion'] if taken else None
+    
+    def suggest(self, existing_domains=None):
+        """Pooled suggestion when one fits, otherwise a synchronous Gemini round-trip"""
+        suggestion = self.take(existing_domains)
+        if suggestion is None:
+            suggestion = self.service.generate_taxonomy_suggestion(existing_domains)
+        return suggestion
+    
+    # ----- refilling -----
+    
+    def add(self, suggestion):
+        """Add a validated suggestion unless its domain duplicates one already pooled"""
+        entry = self._entry(suggestion)
+        with self._lock:
+            pooled = [e['suggestion']['domain']['name'] for e in self._entries]
+        if pooled and self._conflicts([entry], pooled)[0]:
+            self.rejected += 1
+            metrics.increment('taxonomy_pool.rejected')
+            return False
+        with self._lock:
+            self._entries.append(entry)
+        return True
+    
+    def refill_once(self):
+        """Generate one suggestion, steering Gemini away from the domains already pooled"""
+        with self._lock:
+            pooled = [e['suggestion']['domain']['name'] for e in self._entries]
+        prompt = self.service._create_taxonomy_prompt(pooled)
+        response = self.service._generate(prompt)
+        suggestion = self.service._parse_taxonomy_response(response.text, strict=True)
+        self.generated += 1
+        metrics.increment('taxonomy_pool.generated')
+        return self.add(suggestion)
+    
+    def run_worker(self):
+        # Refills compete with nothing interactive: lowest scheduler class
+        request_priority.set('bulk')
+        duplicates = 0
+        while not self._stop.is_set():
+            if len(self) >= self.size:
+                self._wake.wait(self.retry_seconds)
+                self._wake.clear()
+                continue
+            try:
+                # Gemini keeps proposing pooled domains: stop spending quota for a while
+                duplicates = 0 if self.refill_once() else duplicates + 1
+                if duplicates >= 3:
+                    duplicates = 0
+                    self._stop.wait(self.retry_seconds)
+            except Exception as e:
+                logger.warning(f"Taxonomy pool refill failed: {str(e)}")
+                metrics.increment('taxonomy_pool.refill_errors')
+                self._stop.wait(self.retry_seconds)
+    
+    def start_worker(self):
+        if self.size <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self.run_worker, name='taxonomy-pool', daemon=True)
+        self._thread.start()
+    
+    def stop_worker(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    # ----- persistence -----
+    
+    def save(self):
+        with self._lock:
+            suggestions = [e['suggestion'] for e in self._entries]
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(suggestions, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.error(f"Could not save taxonomy pool: {str(e)}")
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                suggestions = json.load(f)
+            for suggestion in suggestions[:self.size]:
+                self.add(self.service._validate_taxonomy_response(suggestion))
+            logger.info(f"Taxonomy pool loaded ({len(self)} suggestions)")
+        except Exception as e:
+            logger.error(f"Could not load taxonomy pool: {str(e)}")
+    
+    def stats(self):
+        requests = self.served + self.misses
+        return {
+            'size': len(self),
+            'target_size': self.size,
+            'served': self.served,
+            'misses': self.misses,
+            'hit_rate': round(self.served / requests, 3) if requests else None,
+            'generated': self.generated,
+            'rejected_duplicates': self.rejected,
+            'worker_running': bool(self._thread and self._thread.is_alive())
+        }
+
+
+taxonomy_pool = TaxonomySuggestionPool(nlp_service)
+if taxonomy_pool.persist:
+    atexit.register(taxonomy_pool.save)
+
+
+TAXONOMY_TREE_PATH = os.getenv('TAXONOMY_TREE_PATH', os.path.join(DATA_DIR, 'taxonomy_tree.json'))
+TAXONOMY_LEVELS = ('domain', 'theme', 'subtheme')
+
+
+class TaxonomyClassifier:
+    """
+    Maps descriptions onto the domain/theme/sub-theme tree managed by the C#
+    TaxonomyController. Each node keeps the sum of the name vectors of its
+    subtree, so adding, renaming, moving or deleting a node only touches its
+    ancestors; classification is one matrix product against the centroids
+    """
+    
+    def __init__(self, path=TAXONOMY_TREE_PATH):
+        self.path = path
+        self.persist = os.getenv('TAXONOMY_TREE_PERSIST', 'true').lower() == 'true'
+        self.min_score = float(os.getenv('TAXONOMY_MIN_SCORE', 0.5))
+        self._lock = threading.Lock()
+        self._nodes = {}
+        self._children = {}
+        self._snapshot = None
+        self.version = 0
+        if self.persist:
+            self.load()
+    
+    def __len__(self):
+        return len(self._nodes)
+    
+    # ----- ingestion -----
+    
+    @staticmethod
+    def flatten(tree):
+        """
+        [(level, id, name, parent id)] from either the flat lists returned by the
+        C# API ({'domains': [{domainId, name}], 'themes': [{themeId, domainId, name}],
+        'subthemes': [{subThemeId, themeId, name}]}) or nested domains with
+        'themes' and 'subThemes'/'subthemes'
+        """
+        if not isinstance(tree, dict):
+            raise TypeError("taxonomie (objet attendu)")
+        nodes = []
+        for domain in tree.get('domains') or []:
+            nodes.append(('domain', domain['domainId'], domain['name'], None))
+            for theme in domain.get('themes') or []:
+                nodes.append(('theme', theme['themeId'], theme['name'], domain['domainId']))
+                for sub in theme.get('subThemes') or theme.get('subthemes') or []:
+                    nodes.append(('subtheme', sub['subThemeId'], sub['name'], theme['themeId']))
+        for theme in tree.get('themes') or []:
+            nodes.append(('theme', theme['themeId'], theme['name'], theme['domainId']))
+        for sub in tree.get('subthemes') or tree.get('subThemes') or []:
+            nodes.append(('subtheme', sub['subThemeId'], sub['name'], sub['themeId']))
+        for level, node_id, name, _ in nodes:
+            if not isinstance(name, str) or not name.strip():
+                raise TypeError("name ({} {})".format(level, node_id))
+        return nodes
+    
+    def replace(self, tree):
+        """Load a whole tree (POST /taxonomy); an invalid tree leaves the current one in place"""
+        nodes = self.flatten(tree)
+        with self._lock:
+            previous = self._nodes, self._children
+            self._nodes, self._children = {}, {}
+            try:
+                self._upsert_nodes(nodes)
+            except Exception:
+                self._nodes, self._children = previous
+                raise
+            self._changed()
+    
+    def update(self, upsert=None, deleted=None):
+        """Incremental change: upsert nodes (same shapes as replace) and delete {'domains': [ids], ...}"""
+        # Validate the whole change before touching the tree
+        nodes = self.flatten(upsert or {})
+        if not isinstance(deleted or {}, dict):
+            raise TypeError("deleted (objet attendu)")
+        deletions = [(level, node_id)
+                     for level, key in (('domain', 'domains'), ('theme', 'themes'), ('subtheme', 'subthemes'))
+                     for node_id in (deleted or {}).get(key) or []]
+        vectors = self._node_vectors(nodes)
+        with self._lock:
+            # Subtree sums are updated in place: keep copies to roll back a failed change
+            previous_nodes = {key: dict(node, sum=node['sum'].copy()) for key, node in self._nodes.items()}
+            previous_children = {key: set(children) for key, children in self._children.items()}
+            try:
+                for node_key in deletions:
+                    self._delete(node_key)
+                self._upsert_nodes(nodes, vectors)
+            except Exception:
+                self._nodes, self._children = previous_nodes, previous_children
+                raise
+            self._changed()
+    
+    @staticmethod
+    def _node_vectors(nodes):
+        vectors = name_vectors([name for _, _, name, _ in nodes]) if nodes else None
+        if nodes and vectors is None:
+            raise RuntimeError("Modèle spaCy avec vecteurs requis pour la taxonomie")
+        return vectors
+    
+    def _upsert_nodes(self, nodes, vectors=None):
+        if vectors is None:
+            vectors = self._node_vectors(nodes)
+        # Parents first, so children can attach to nodes ingested in the same call
+        order = sorted(range(len(nodes)), key=lambda i: TAXONOMY_LEVELS.index(nodes[i][0]))
+        for i in order:
+            level, node_id, name, parent_id = nodes[i]
+            parent = (TAXONOMY_LEVELS[TAXONOMY_LEVELS.index(level) - 1], parent_id) if parent_id is not None else None
+            if parent is not None and parent not in self._nodes:
+                logger.warning(f"Taxonomy {level} {node_id} skipped: unknown parent {parent}")
+                continue
+            self._upsert((level, node_id), name, parent, vectors[i])
+    
+    def _upsert(self, key, name, parent, vector):
+        node = self._nodes.get(key)
+        if node is None:
+            # float64 sums: repeated incremental updates must not drift
+            node = {'name': name, 'parent': None, 'vector': vector, 'sum': vector.astype(np.float64), 'count': 1}
+            self._nodes[key] = node
+            self._children.setdefault(key, set())
+            self._attach(key, parent)
+            return
+        if node['parent'] != parent:
+            self._detach(key)
+            self._attach(key, parent)
+        if node['name'] != name:
+            # Rename: only the node's own contribution changes, along its path
+            delta = vector - node['vector']
+            node['name'] = name
+            node['vector'] = vector
+            for path_key in [key] + self._ancestors(key):
+                self._nodes[path_key]['sum'] += delta
+    
+    def _attach(self, key, parent):
+        node = self._nodes[key]
+        node['parent'] = parent
+        if parent is None:
+            return
+        self._children[parent].add(key)
+        for ancestor in [parent] + self._ancestors(parent):
+            self._nodes[ancestor]['sum'] += node['sum']
+            self._nodes[ancestor]['count'] += node['count']
+    
+    def _detach(self, key):
+        node = self._nodes[key]
+        parent = node['parent']
+        if parent is None:
+            return
+        self._children[parent].discard(key)
+        for ancestor in [parent] + self._ancestors(parent):
+            self._nodes[ancestor]['sum'] -= node['sum']
+            self._nodes[ancestor]['count'] -= node['count']
+        node['parent'] = None
+    
+    def _delete(self, key):
+        if key not in self._nodes:
+            return
+        self._detach(key)
+        stack = [key]
+        while stack:
+            current = stack.pop()
+            stack.extend(self._children.pop(current, ()))
+            self._nodes.pop(current, None)
+    
+    def _ancestors(self, key):
+        ancestors = []
+        parent = self._nodes[key]['parent']
+        while parent is not None:
+            ancestors.append(parent)
+            parent = self._nodes[parent]['parent']
+        return ancestors
+    
+    def _changed(self):
+        self.version += 1
+        self._snapshot = None
+        metrics.set_gauge('taxonomy.nodes', len(self._nodes))
+    
+    # ----- classification -----
+    
+    def _build_snapshot(self):
+        """Centroid matrix plus one (domain, theme, sub-theme) row triple per leaf path"""
+        keys = list(self._nodes)
+        rows = {key: i for i, key in enumerate(keys)}
+        centroids = np.stack([self._nodes[k]['sum'] / self._nodes[k]['count'] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+        if len(keys):
+            norms = np.linalg.norm(centroids, axis=1)
+            centroids[norms > 0] /= norms[norms > 0, None]
+        paths = []
+        for key in keys:
+            level = key[0]
+            # Leaves: sub-themes, themes without sub-themes, domains without themes
+            if level != 'subtheme' and self._children.get(key):
+                continue
+            chain = list(reversed([key] + self._ancestors(key)))
+            chain += [chain[-1]] * (3 - len(chain))
+            paths.append([rows[k] for k in chain])
+        return {
+            'keys': keys,
+            'centroids': centroids.astype(np.float32),
+            'paths': np.array(paths, dtype=np.int64).reshape(-1, 3),
+            'version': self.version
+        }
+    
+    def classify(self, texts, top_k=3):
+        """Best domain/theme/sub-theme paths per text; None for texts without a vector"""
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._build_snapshot()
+            snapshot = self._snapshot
+        if not len(snapshot['paths']):
+            return [None] * len(texts)
+        
+        # Same content-word vectors as the node names (no pipeline run needed)
+        vectors = name_vectors(texts)
+        valid = np.linalg.norm(vectors, axis=1) > 0
+        scores = vectors @ snapshot['centroids'].T
+        # Path score: mean of the three levels' similarities (batch x paths)
+        path_scores = scores[:, snapshot['paths']].mean(axis=2)
+        k = min(top_k, path_scores.shape[1])
+        top = np.argpartition(-path_scores, k - 1, axis=1)[:, :k]
+        
+        results = []
+        for i, ok in enumerate(valid):
+            if not ok:
+                results.append(None)
+                continue
+            ranked = top[i][np.argsort(-path_scores[i, top[i]])]
+            matches = [self._describe(snapshot, scores[i], p, float(path_scores[i, p])) for p in ranked]
+            results.append({
+                'match': matches[0] if matches[0]['score'] >= self.min_score else None,
+                'alternatives': matches,
+                'taxonomy_version': snapshot['version']
+            })
+        metrics.increment('taxonomy.classified', len(texts))
+        return results
+    
+    def _describe(self, snapshot, scores, path, path_score):
+        match = {'score': round(path_score, 4)}
+        for level, row in zip(TAXONOMY_LEVELS, snapshot['paths'][path]):
+            key = snapshot['keys'][row]
+            if key[0] == level:
+                match[level] = {'id': key[1], 'name': self._node_name(key), 'score': round(float(scores[row]), 4)}
+            else:
+                match[level] = None
+        return match
+    
+    def _node_name(self, key):
+        node = self._nodes.get(key)
+        return node['name'] if node else None
+    
+    # ----- persistence -----
+    
+    def export(self):
+        with self._lock:
+            nodes = [(key, node['name'], node['parent']) for key, node in self._nodes.items()]
+        tree = {'domains': [], 'themes': [], 'subthemes': []}
+        for (level, node_id), name, parent in nodes:
+            if level == 'domain':
+                tree['domains'].append({'domainId': node_id, 'name': name})
+            elif level == 'theme':
+                tree['themes'].append({'themeId': node_id, 'domainId': parent[1], 'name': name})
+            else:
+                tree['subthemes'].append({'subThemeId': node_id, 'themeId': parent[1], 'name': name})
+        return tree
+    
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.export(), f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.error(f"Could not save taxonomy tree: {str(e)}")
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.replace(json.load(f))
+            logger.info(f"Taxonomy tree loaded ({len(self)} nodes)")
+        except Exception as e:
+            logger.error(f"Could not load taxonomy tree: {str(e)}")
+    
+    def stats(self):
+        with self._lock:
+            counts = {level: 0 for level in TAXONOMY_LEVELS}
+            for level, _ in self._nodes:
+                counts[level] += 1
+        return dict(counts, nodes=sum(counts.values()), version=self.version)
+
+
+taxonomy_classifier = TaxonomyClassifier()
+
+
+def current_rss_bytes():
+    """Resident set size of this worker (Linux /proc, else peak RSS from getrusage)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+class MemoryGuard:
+    """
+    Per-worker memory instrumentation and RSS budget
+    The spaCy StringStore only grows (every unseen token of user text is
+    interned), so a long-running worker creeps upward. Every MEMORY_CHECK_EVERY
+    requests the guard samples RSS, StringStore and cache sizes into /metrics;
+    above MEMORY_BUDGET_MB it either reloads a fresh model in the background and
+    swaps it in (MEMORY_ACTION=reset) or stops accepting requests (503 +
+    Retry-After) and, once the in-flight responses are written, sends itself
+    SIGTERM so the process manager starts a fresh worker (MEMORY_ACTION=recycle,
+    only with MEMORY_SUPERVISED=true, e.g. under gunicorn)
+    """
+    
+    def __init__(self):
+        self.budget_bytes = int(float(os.getenv('MEMORY_BUDGET_MB', 0)) * 1024 * 1024)
+        self.action = os.getenv('MEMORY_ACTION', 'reset')
+        self.retry_after = int(os.getenv('MEMORY_RETRY_AFTER', 5))
+        if self.action == 'recycle' and os.getenv('MEMORY_SUPERVISED', 'false').lower() != 'true':
+            # Nothing would restart a recycled `python app.py`
+            logger.warning("MEMORY_ACTION=recycle requires MEMORY_SUPERVISED=true - falling back to reset")
+            self.action = 'reset'
+        self.check_every = max(int(os.getenv('MEMORY_CHECK_EVERY', 100)), 1)
+        # Freed pages are not always returned to the OS, so RSS can stay high right after a reset
+        self.reset_cooldown = float(os.getenv('MEMORY_RESET_COOLDOWN', 600))
+        self._last_reset = None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._in_flight = 0
+        self._resetting = False
+        self._draining = False
+        self.resets = 0
+    
+    def request_started(self):
+        """False when the worker is draining before a recycle: the request must be deflected"""
+        with self._lock:
+            if self._draining:
+                return False
+            self._in_flight += 1
+            return True
+    
+    def request_finished(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._requests += 1
+            due = self._requests % self.check_every == 0
+            recycle_now = self._draining and self._in_flight == 0
+        if recycle_now:
+            self._recycle()
+        elif due:
+            self.check()
+    
+    def sample(self):
+        """Current memory figures, also published as gauges"""
+        model = text_analyzer.nlp
+        figures = {
+            'rss_mb': round((current_rss_bytes() or 0) / (1024 * 1024), 1),
+            'budget_mb': round(self.budget_bytes / (1024 * 1024), 1) or None,
+            'stringstore_size': len(model.vocab.strings) if model else 0,
+            'vocab_lexemes': len(model.vocab) if model else 0,
+            'vectors_shared': int(bool(model) and isinstance(model.vocab.vectors.data, np.memmap)),
+            'doc_cache_size': len(doc_cache._docs),
+            'duplicate_index_size': len(duplicate_index),
+            'embedding_index_size': len(embedding_index),
+            'keyword_index_size': len(keyword_index),
+            'in_flight': self._in_flight,
+            'model_resets': self.resets
+        }
+        for name, value in figures.items():
+            if value is not None:
+                metrics.set_gauge('memory.' + name, value)
+        return figures
+    
+    def check(self):
+        figures = self.sample()
+        if not self.budget_bytes or figures['rss_mb'] * 1024 * 1024 <= self.budget_bytes:
+            return figures
+        
+        metrics.increment('memory.budget_exceeded')
+        logger.warning(f"Memory budget exceeded: {figures['rss_mb']} MB > {figures['budget_mb']} MB "
+                       f"(StringStore: {figures['stringstore_size']} strings)")
+        if self.action == 'recycle':
+            with self._lock:
+                self._draining = True
+                recycle_now = self._in_flight == 0
+            if recycle_now:
+                self._recycle()
+        else:
+            self.reset_model_in_background()
+        return figures
+    
+    def reset_model_in_background(self):
+        with self._lock:
+            cooling_down = self._last_reset is not None and time.monotonic() - self._last_reset < self.reset_cooldown
+            if self._resetting or cooling_down:
+                return False
+            self._resetting = True
+        threading.Thread(target=self._reset_model, daemon=True).start()
+        return True
+    
+    def _reset_model(self):
+        """Load a fresh model (new vocab/StringStore) and swap it in; requests keep running on the old one meanwhile"""
+        global nlp
+        try:
+            started = time.perf_counter()
+            fresh = load_nlp_model()
+            if fresh is None:
+                return
+            text_analyzer.nlp = fresh
+            doc_cache.swap_model(fresh)
+            nlp = fresh
+            # The old model may sit in the frozen generation (see gc.freeze below)
+            gc.unfreeze()
+            gc.collect()
+            self.resets += 1
+            metrics.increment('memory.model_resets')
+            metrics.observe('memory.model_reset_seconds', time.perf_counter() - started)
+            logger.info(f"spaCy model reloaded to reset the vocabulary ({self.sample()['rss_mb']} MB RSS)")
+        except Exception as e:
+            logger.error(f"Model reset failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._resetting = False
+                self._last_reset = time.monotonic()
+    
+    def _recycle(self):
+        with self._lock:
+            if not self._draining:
+                return
+            self._draining = False
+        logger.warning("Recycling worker after exceeding its memory budget")
+        metrics.increment('memory.recycles')
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+memory_guard = MemoryGuard()
+
+
+@app.before_request
+def track_request_start():
+    g.memory_tracked = memory_guard.request_started()
+    if not g.memory_tracked:
+        metrics.increment('memory.deflected_requests')
+        response = jsonify({"error": "Service en cours de redémarrage, réessayez"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(memory_guard.retry_after)
+        return response
+    # Callers may lower their own priority (X-Priority: batch / bulk); the default is interactive
+    priority = request.headers.get('X-Priority', 'interactive').lower()
+    request_priority.set(priority if priority in PRIORITY_CLASSES else 'interactive')
+
+
+@app.after_request
+def track_response_close(response):
+    # A request is finished once its body is written (a recycle must not cut it short)
+    if g.get('memory_tracked'):
+        g.memory_tracked = False
+        response.call_on_close(memory_guard.request_finished)
+    return response
+
+
+@app.teardown_request
+def track_request_end(exc):
+    # Requests that never produced a response (unhandled errors) end here
+    if g.get('memory_tracked'):
+        g.memory_tracked = False
+        memory_guard.request_finished()
+
+
+JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', os.path.join(DATA_DIR, 'jobs.sqlite'))
+
+
+def _job_prepare_docs(field):
+    # One nlp.pipe pass over the batch; the per-item analyses then hit the Doc cache
+    return lambda items: doc_cache.parse_many([item[field] for item in items])
+
+
+def _job_analyze_action(item):
+    return {
+        'actionId': item.get('actionId'),
+        'analysis': nlp_service.analyze_action_description(item['description'], item.get('domain'), item.get('theme'))
+    }
+
+
+def _job_analyze_text(item):
+    return {'id': item.get('id'), 'analysis': text_analyzer.analyze_text(item['text'])}
+
+
+# Job kind -> (required item field, batch preparation, per-item handler)
+JOB_HANDLERS = {
+    'analyze-action': ('description', _job_prepare_docs('description'), _job_analyze_action),
+    'analyze-text': ('text', _job_prepare_docs('text'), _job_analyze_text)
+}
+
+
+class JobQueue:
+    """
+    Durable SQLite queue for bulk analysis jobs
+    A job is a list of items; workers lease batches of pending items (the
+    lease expires if a worker dies), store each result as soon as it is
+    computed and release the rest on shutdown, so a restarted service resumes
+    a job without redoing completed items. Workers are threads of the service
+    (JOB_WORKER_THREADS) and/or separate job_worker.py processes
+    """
+    
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.path = path
+        self.batch_size = int(os.getenv('JOB_BATCH_SIZE', 16))
+        self.lease_seconds = float(os.getenv('JOB_LEASE_SECONDS', 300))
+        self.poll_interval = float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+        self.max_attempts = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+        self._local = threading.local()
+        self._schema_ready = False
+        self._stop = threading.Event()
+        self._threads = []
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,
+                        total INTEGER NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+                        finished_at TEXT, lexicon_version TEXT
+                    );
+                    CREATE TABLE IF NOT EXISTS job_items (
+                        job_id TEXT NOT NULL, seq INTEGER NOT NULL, payload TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+                        lease_owner TEXT, lease_expires REAL, result TEXT, error TEXT,
+                        PRIMARY KEY (job_id, seq)
+                    );
+                    CREATE INDEX IF NOT EXISTS job_items_claim ON job_items (status, lease_expires);
+                """)
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+    
+    def submit(self, kind, items):
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT INTO jobs (id, kind, status, total, created_at, updated_at, lexicon_version) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (job_id, kind, 'queued', len(items), now, now, lexicon_store.current.version))
+            conn.executemany('INSERT INTO job_items (job_id, seq, payload) VALUES (?, ?, ?)',
+                             ((job_id, seq, json.dumps(item, ensure_ascii=False)) for seq, item in enumerate(items)))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        metrics.increment('jobs.submitted')
+        metrics.increment('jobs.items_submitted', len(items))
+        return job_id
+    
+    def claim(self, owner):
+        """Lease the next batch of pending (or expired) items of the oldest job that has some"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # An expired lease on an item out of attempts means it killed its
+            # worker every time (OOM, crash): fail it instead of retrying forever
+            exhausted = [r['job_id'] for r in conn.execute(
+                "SELECT DISTINCT job_id FROM job_items WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)).fetchall()]
+            if exhausted:
+                conn.execute(
+                    "UPDATE job_items SET status = 'failed', lease_owner = NULL, "
+                    "error = 'Bail expiré après {} tentatives' "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?".format(self.max_attempts),
+                    (now, self.max_attempts))
+                for exhausted_job in exhausted:
+                    self._finish_if_done_locked(conn, exhausted_job)
+            row = conn.execute(
+                "SELECT i.job_id FROM job_items i JOIN jobs j ON j.id = i.job_id "
+                "WHERE j.status IN ('queued', 'running') AND (i.status = 'pending' "
+                "OR (i.status = 'leased' AND i.lease_expires < ? AND i.attempts < ?)) "
+                "ORDER BY j.created_at LIMIT 1", (now, self.max_attempts)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None, None, []
+            job_id = row['job_id']
+            rows = conn.execute(
+                "SELECT seq, payload FROM job_items WHERE job_id = ? AND (status = 'pending' "
+                "OR (status = 'leased' AND lease_expires < ? AND attempts < ?)) ORDER BY seq LIMIT ?",
+                (job_id, now, self.max_attempts, self.batch_size)).fetchall()
+            conn.executemany(
+                "UPDATE job_items SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE job_id = ? AND seq = ?",
+                ((owner, now + self.lease_seconds, job_id, r['seq']) for r in rows))
+            conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                         (datetime.now().isoformat(), job_id))
+            kind = conn.execute('SELECT kind FROM jobs WHERE id = ?', (job_id,)).fetchone()['kind']
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return job_id, kind, [(r['seq'], json.loads(r['payload'])) for r in rows]
+    
+    def _complete_items(self, job_id, owner, outcomes, retry=True):
+        """outcomes: (seq, result or None, error or None); only items still leased by owner are written"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for seq, result, error in outcomes:
+                if error is None:
+                    conn.execute(
+                        "UPDATE job_items SET status = 'done', result = ?, error = NULL, lease_owner = NULL "
+                        "WHERE job_id = ? AND seq = ? AND lease_owner = ? AND status = 'leased'",
+                        (json.dumps(result, ensure_ascii=False, default=service_json_default), job_id, seq, owner))
+                else:
+                    # Retry later unless the item has used all its attempts
+                    conn.execute(
+                        "UPDATE job_items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                        "error = ?, lease_owner = NULL WHERE job_id = ? AND seq = ? AND lease_owner = ? AND status = 'leased'",
+                        (self.max_attempts if retry else 0, error, job_id, seq, owner))
+            self._finish_if_done_locked(conn, job_id)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    @staticmethod
+    def _finish_if_done_locked(conn, job_id):
+        """Mark a running job completed once none of its items is pending or leased"""
+        open_items = conn.execute(
+            "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN ('pending', 'leased')",
+            (job_id,)).fetchone()[0]
+        now = datetime.now().isoformat()
+        if open_items == 0:
+            conn.execute("UPDATE jobs SET status = 'completed', updated_at = ?, finished_at = ? "
+                         "WHERE id = ? AND status = 'running'", (now, now, job_id))
+        else:
+            conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (now, job_id))
+    
+    def _release(self, job_id, owner, seqs):
+        """Give leased items back (shutdown) without counting the attempt"""
+        if not seqs:
+            return
+        conn = self._connect()
+        conn.executemany(
+            "UPDATE job_items SET status = 'pending', lease_owner = NULL, attempts = attempts - 1 "
+            "WHERE job_id = ? AND seq = ? AND lease_owner = ? AND status = 'leased'",
+            ((job_id, seq, owner) for seq in seqs))
+    
+    def process_batch(self, owner, stop=None):
+        """Claim and process one batch; returns the number of items handled (0 when idle)"""
+        job_id, kind, batch = self.claim(owner)
+        if not batch:
+            return 0
+        field, prepare, handle = JOB_HANDLERS.get(kind, (None, None, None))
+        if handle is None:
+            self._complete_items(job_id, owner, [(seq, None, "Type de tâche inconnu: {}".format(kind)) for seq, _ in batch],
+                                 retry=False)
+            return len(batch)
+        
+        valid = [(seq, item) for seq, item in batch if isinstance(item, dict) and item.get(field)]
+        invalid = [(seq, None, "Élément invalide ({} requis)".format(field))
+                   for seq, item in batch if not (isinstance(item, dict) and item.get(field))]
+        if invalid:
+            self._complete_items(job_id, owner, invalid, retry=False)
+        
+        started = time.perf_counter()
+        if valid:
+            try:
+                prepare([item for _, item in valid])
+            except Exception as e:
+                logger.warning(f"Job {job_id}: batch preparation failed: {str(e)}")
+        
+        # Each result is stored as soon as it exists, so a crash only loses the item in progress
+        for position, (seq, item) in enumerate(valid):
+            if stop is not None and stop.is_set():
+                self._release(job_id, owner, [s for s, _ in valid[position:]])
+                break
+            try:
+                outcome = (seq, handle(item), None)
+            except Exception as e:
+                logger.error(f"Job {job_id} item {seq} failed: {str(e)}")
+                outcome = (seq, None, str(e))
+            self._complete_items(job_id, owner, [outcome])
+            metrics.increment('jobs.items_processed')
+        
+        metrics.observe('jobs.batch_seconds', time.perf_counter() - started)
+        return len(batch)
+    
+    def run_worker(self, owner=None, stop=None):
+        owner = owner or '{}:{}:{}'.format(os.uname().nodename if hasattr(os, 'uname') else 'local',
+                                           os.getpid(), threading.get_ident())
+        stop = stop or self._stop
+        # Background jobs run in the lowest priority class
+        request_priority.set('bulk')
+        logger.info(f"Job worker {owner} started")
+        while not stop.is_set():
+            try:
+                if not self.process_batch(owner, stop):
+                    stop.wait(self.poll_interval)
+            except sqlite3.Error as e:
+                logger.error(f"Job queue error: {str(e)}")
+                stop.wait(self.poll_interval)
+        # Anything still leased by this worker goes back to the queue
+        self._release_owner(owner)
+        logger.info(f"Job worker {owner} stopped")
+    
+    def _release_owner(self, owner):
+        try:
+            self._connect().execute(
+                "UPDATE job_items SET status = 'pending', lease_owner = NULL, attempts = attempts - 1 "
+                "WHERE lease_owner = ? AND status = 'leased'",
+                (owner,))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not release leases of {owner}: {str(e)}")
+    
+    def start_workers(self, count):
+        for i in range(count):
+            thread = threading.Thread(target=self.run_worker, name='job-worker-{}'.format(i), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop_workers(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    def cancel(self, job_id):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (datetime.now().isoformat(), job_id)).rowcount
+            if updated:
+                conn.execute("UPDATE job_items SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return bool(updated)
+    
+    def status(self, job_id):
+        conn = self._connect()
+        job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if job is None:
+            return None
+        counts = dict(conn.execute(
+            'SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status', (job_id,)).fetchall())
+        done = counts.get('done', 0)
+        failed = counts.get('failed', 0)
+        return {
+            'job_id': job['id'],
+            'kind': job['kind'],
+            'status': job['status'],
+            'total': job['total'],
+            'done': done,
+            'failed': failed,
+            'pending': counts.get('pending', 0),
+            'in_progress': counts.get('leased', 0),
+            'progress': round(100 * (done + failed) / job['total'], 1) if job['total'] else 100.0,
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+            'finished_at': job['finished_at'],
+            'lexicon_version': job['lexicon_version']
+        }
+    
+    def results(self, job_id, offset=0, limit=100):
+        rows = self._connect().execute(
+            "SELECT seq, status, result, error FROM job_items WHERE job_id = ? AND status IN ('done', 'failed') "
+            "ORDER BY seq LIMIT ? OFFSET ?", (job_id, limit, offset)).fetchall()
+        return [
+            {'index': r['seq'], 'status': r['status'],
+             'result': json.loads(r['result']) if r['result'] else None, 'error': r['error']}
+            for r in rows
+        ]
+    
+    def list_jobs(self, limit=50):
+        rows = self._connect().execute(
+            'SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+        return [self.status(r['id']) for r in rows]
+
+
+job_queue = JobQueue()
+JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', 1))
+_background_workers_started = False
+
+
+def start_background_workers():
+    """
+    Start the in-process job workers and the taxonomy pool refill (Gemini
+    calls). Never done on import (scripts such as train_classifier.py import
+    this module): `python app.py` calls it, and
+    other servers opt in with START_BACKGROUND_WORKERS=true or by calling it
+    from their worker hook (e.g. gunicorn post_fork)
+    """
+    global _background_workers_started
+    if _background_workers_started:
+        return
+    _background_workers_started = True
+    if JOB_WORKER_THREADS > 0:
+        job_queue.start_workers(JOB_WORKER_THREADS)
+    # The pool refill calls Gemini: one refill worker per serving process only
+    if os.getenv('TAXONOMY_POOL_WORKER', 'true').lower() == 'true':
+        taxonomy_pool.start_worker()
+
+
+# Under a preforking server (gunicorn --preload) the model and indexes are
+# loaded once in the master; freezing them keeps the garbage collector from
+# touching those pages in the workers, so they stay shared copy-on-write
+gc.freeze()
+
+if os.getenv('START_BACKGROUND_WORKERS', 'false').lower() == 'true':
+    start_background_workers()
 
 
 # ============== API ENDPOINTS ==============
@@ -2097,10 +6345,58 @@ def health_check():
         "status": "healthy",
         "service": "Service d'Analyse NLP",
         "nlp_model":  nlp_status,
-        "model_name": "fr_core_news_md" if nlp else None
+        "model_name": "fr_core_news_md" if nlp else None,
+        "lexicon_version": lexicon_store.current.version
     })
 
 
+def _admin_authorized():
+    """Admin endpoints require X-Admin-Token when NLP_ADMIN_TOKEN is configured"""
+    expected = os.getenv('NLP_ADMIN_TOKEN')
+    return not expected or request.headers.get('X-Admin-Token') == expected
+
+
+@app.route('/admin/lexicons', methods=['GET'])
+def lexicon_status():
+    """Active lexicon version and per-file versions"""
+    return jsonify({"success": True, "lexicons": lexicon_store.status()})
+
+
+@app.route('/admin/reload-lexicons', methods=['POST'])
+def reload_lexicons():
+    """Hot reload the lexicon files without reloading the spaCy model"""
+    if not _admin_authorized():
+        return jsonify({"error": "Non autorisé"}), 403
+    
+    try:
+        lexicon_store.reload()
+        return jsonify({"success": True, "lexicons": lexicon_store.status()})
+    except Exception as e:
+        logger.error(f"Lexicon reload failed: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": "Rechargement des lexiques impossible: {}".format(str(e)),
+            "lexicons": lexicon_store.status()
+        }), 400
+
+
+@app.route('/metrics', methods=['GET'])
+def service_metrics():
+    """In-process service metrics (counters, gauges, latency summaries)"""
+    memory_guard.sample()
+    return jsonify(dict(metrics.snapshot(), doc_cache=doc_cache.stats(),
+                        schedulers={'spacy': nlp_scheduler.stats(), 'gemini': gemini_scheduler.stats()},
+                        gemini_quota=gemini_rate_limiter.stats(), taxonomy_pool=taxonomy_pool.stats(),
+                        plan_cache=plan_cache.stats(), report_cache=performance_nlp.cache_stats(),
+                        statistics_history=statistics_history.stats(), anomaly_detector=anomaly_detector.stats()))
+
+
+@app.route('/classifier-stats', methods=['GET'])
+def classifier_stats():
+    """Local classifier skip rate and agreement with Gemini"""
+    return jsonify({"success": True, "classifier": action_classifier.stats()})
+
+
 @app.route('/analyze-action', methods=['POST'])
 def analyze_action():
     """Analyze action plan description and generate tips using NLP + Gemini"""
@@ -2139,7 +6435,7 @@ def suggest_taxonomy():
         data = request.get_json()
         existing_domains = data.get('existing_domains', []) if data else []
         
-        suggestion = nlp_service.generate_taxonomy_suggestion(existing_domains)
+        suggestion = taxonomy_pool.suggest(existing_domains)
         
         return jsonify({
             "success": True,
@@ -2155,6 +6451,105 @@ def suggest_taxonomy():
         }), 200
 
 
+@app.route('/taxonomy', methods=['GET', 'POST', 'PATCH'])
+def taxonomy_tree():
+    """
+    Taxonomy used by /classify-taxonomy. POST replaces the tree (flat lists as
+    returned by the C# taxonomy API, or nested domains); PATCH applies an
+    incremental change: {"upsert": {...}, "deleted": {"domains": [ids], "themes": [...], "subthemes": [...]}}
+    """
+    if request.method == 'GET':
+        return jsonify({"success": True, "taxonomy": taxonomy_classifier.stats()})
+    
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Taxonomie requise"}), 400
+        
+        if request.method == 'POST':
+            taxonomy_classifier.replace(data)
+        else:
+            taxonomy_classifier.update(data.get('upsert'), data.get('deleted'))
+        if taxonomy_classifier.persist:
+            taxonomy_classifier.save()
+        
+        return jsonify({"success": True, "taxonomy": taxonomy_classifier.stats()})
+    
+    except (KeyError, TypeError) as e:
+        return jsonify({"success": False, "error": f"Taxonomie invalide: champ manquant ou invalide {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Error in taxonomy_tree endpoint: {str(e)}")
+        return jsonify({"success": False, "error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/classify-taxonomy', methods=['POST'])
+def classify_taxonomy():
+    """Place one description ("description") or several ("descriptions") in the taxonomy tree"""
+    try:
+        data = request.get_json()
+        if not data or not (data.get('description') or data.get('descriptions')):
+            return jsonify({"error": "Description requise"}), 400
+        if not len(taxonomy_classifier):
+            return jsonify({"success": False, "error": "Aucune taxonomie chargée"}), 409
+        
+        single = 'descriptions' not in data
+        descriptions = [data['description']] if single else data['descriptions']
+        results = taxonomy_classifier.classify(descriptions, top_k=int(data.get('top_k', 3)))
+        
+        if single:
+            return jsonify({"success": True, "classification": results[0]})
+        return jsonify({"success": True, "classifications": results, "count": len(results)})
+    
+    except Exception as e:
+        logger.error(f"Error in classify_taxonomy endpoint: {str(e)}")
+        return jsonify({"success": False, "error": "Erreur interne du serveur"}), 500
+
+
+def _sse(event, data):
+    return 'event: {}\ndata: {}\n\n'.format(event, app.json.dumps(data))
+
+
+@app.route('/analyze-action/stream', methods=['GET', 'POST'])
+def analyze_action_stream():
+    """
+    Server-sent events variant of /analyze-action: 'nlp' (nlp_insights, right
+    after spaCy), 'chunk' events with the Gemini text as it is generated, then
+    'result' with the validated analysis
+    """
+    data = request.get_json(silent=True) if request.method == 'POST' else request.args
+    
+    if not data or not data.get('description'):
+        return jsonify({"error": "Description requise"}), 400
+    
+    description = data['description']
+    domain = data.get('domain')
+    theme = data.get('theme')
+    
+    def events():
+        started = time.perf_counter()
+        sent_nlp = False
+        try:
+            for event, payload in nlp_service.analyze_action_events(description, domain, theme, stream=True):
+                if event == 'nlp':
+                    sent_nlp = True
+                    metrics.observe('stream.first_event_seconds', time.perf_counter() - started)
+                    yield _sse('nlp', payload)
+                elif event == 'chunk':
+                    yield _sse('chunk', {'text': payload})
+                else:
+                    # Reused or local analyses skip the intermediate steps
+                    if not sent_nlp and payload.get('nlp_insights'):
+                        yield _sse('nlp', payload['nlp_insights'])
+                    yield _sse('result', {"success": True, "analysis": payload, "nlp_used": True})
+        except Exception as e:
+            logger.error(f"Error in analyze_action_stream: {str(e)}")
+            yield _sse('error', {"error": "Erreur interne du serveur"})
+        metrics.observe('stream.total_seconds', time.perf_counter() - started)
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app. route('/batch-analyze', methods=['POST'])
 def batch_analyze():
     """Analyze multiple action descriptions at once with NLP"""
@@ -2167,17 +6562,19 @@ def batch_analyze():
         actions = data['actions']
         results = []
         
-        for action in actions:
-            if 'description' in action:
-                analysis = nlp_service.analyze_action_description(
-                    action['description'],
-                    action.get('domain'),
-                    action. get('theme')
-                )
-                results.append({
-                    "actionId": action.get('actionId'),
-                    "analysis": analysis
-                })
+        # Batches yield to interactive calls on the spaCy and Gemini paths
+        with priority_class('batch'):
+            for action in actions:
+                if 'description' in action:
+                    analysis = nlp_service.analyze_action_description(
+                        action['description'],
+                        action.get('domain'),
+                        action. get('theme')
+                    )
+                    results.append({
+                        "actionId": action.get('actionId'),
+                        "analysis": analysis
+                    })
         
         return jsonify({
             "success":  True,
@@ -2191,6 +6588,280 @@ def batch_analyze():
         return jsonify({"error": "Erreur interne du serveur"}), 500
 
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a bulk analysis job (kind: analyze-action or analyze-text); returns its id immediately"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('items'), list) or not data['items']:
+            return jsonify({"error": "Liste d'éléments requise (items)"}), 400
+        
+        kind = data.get('kind', 'analyze-action')
+        if kind not in JOB_HANDLERS:
+            return jsonify({"error": "Type de tâche invalide ({})".format(', '.join(JOB_HANDLERS))}), 400
+        
+        job_id = job_queue.submit(kind, data['items'])
+        
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status_url": "/jobs/{}".format(job_id),
+            "results_url": "/jobs/{}/results".format(job_id),
+            "total": len(data['items'])
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error in submit_job endpoint: {str(e)}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Most recent jobs with their progress"""
+    return jsonify({"success": True, "jobs": job_queue.list_jobs(int(request.args.get('limit', 50)))})
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status and progress of a job"""
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Tâche introuvable"}), 404
+    return jsonify({"success": True, "job": status})
+
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """Finished items of a job, in submission order (paged with offset/limit)"""
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Tâche introuvable"}), 404
+    offset = int(request.args.get('offset', 0))
+    limit = min(int(request.args.get('limit', 100)), 1000)
+    return jsonify({
+        "success": True,
+        "job": status,
+        "results": job_queue.results(job_id, offset, limit),
+        "offset": offset,
+        "limit": limit
+    })
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel the items of a job that have not started yet"""
+    cancelled = job_queue.cancel(job_id)
+    return jsonify({"success": cancelled}), 200 if cancelled else 404
+
+
+@app.route('/index-descriptions', methods=['POST'])
+def index_descriptions():
+    """Add action descriptions to the near-duplicate index"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('items'), list):
+            return jsonify({"error": "Liste d'éléments requise (items: [{id, description}])"}), 400
+        
+        indexed = 0
+        for item in data['items']:
+            if item.get('id') is not None and item.get('description'):
+                duplicate_index.add(str(item['id']), item['description'])
+                indexed += 1
+        
+        if duplicate_index.persist:
+            duplicate_index.save_in_background()
+        
+        return jsonify({
+            "success": True,
+            "indexed": indexed,
+            "index": duplicate_index.stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in index_descriptions endpoint: {str(e)}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/index-descriptions/<item_id>', methods=['DELETE'])
+def remove_indexed_description(item_id):
+    """Remove a description from the near-duplicate index"""
+    removed = duplicate_index.remove(item_id)
+    return jsonify({"success": removed}), 200 if removed else 404
+
+
+@app.route('/find-duplicates', methods=['POST'])
+def find_duplicates():
+    """Find near-duplicate descriptions (MinHash/LSH estimated Jaccard similarity)"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('description'):
+            return jsonify({"error": "Description requise"}), 400
+        
+        try:
+            threshold = float(data.get('threshold', 0.8))
+            limit = int(data.get('limit', 10))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Paramètres threshold et limit numériques requis"}), 400
+        
+        started = time.perf_counter()
+        matches = duplicate_index.query(data['description'], threshold=threshold, limit=limit)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        return jsonify({
+            "success": True,
+            "duplicates": [{k: v for k, v in m.items() if not k.startswith('_')} for m in matches],
+            "count": len(matches),
+            "search_time_ms": round(elapsed_ms, 3),
+            "indexed_descriptions": len(duplicate_index)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in find_duplicates endpoint: {str(e)}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/index-embeddings', methods=['POST'])
+def index_embeddings():
+    """Add regulatory texts or action plans to the semantic search index"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('items'), list):
+            return jsonify({"error": "Liste d'éléments requise (items: [{id, text, kind}])"}), 400
+        if not text_analyzer.nlp:
+            return jsonify({"error": "Modèle NLP non disponible"}), 503
+        
+        items = [item for item in data['items'] if item.get('id') is not None and item.get('text')]
+        skipped = embedding_index.add_many(items)
+        
+        if embedding_index.persist:
+            embedding_index.save_in_background()
+        
+        return jsonify({
+            "success": True,
+            "indexed": len(items) - len(skipped),
+            "skipped": skipped,
+            "index": embedding_index.stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in index_embeddings endpoint: {str(e)}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/index-embeddings/<item_id>', methods=['DELETE'])
+def remove_indexed_embedding(item_id):
+    """Remove an item from the semantic search index"""
+    removed = embedding_index.remove(item_id)
+    return jsonify({"success": removed}), 200 if removed else 404
+
+
+@app.route('/semantic-search', methods=['POST'])
+def semantic_search():
+    """Most similar indexed texts/actions (cosine similarity of spaCy vectors) for one or several queries"""
+    try:
+        data = request.get_json()
+        
+        if not data or not (data.get('text') or isinstance(data.get('texts'), list)):
+            return jsonify({"error": "Texte requis (text ou texts)"}), 400
+        if not text_analyzer.nlp:
+            return jsonify({"error": "Modèle NLP non disponible"}), 503
+        
+        batch = isinstance(data.get('texts'), list)
+        texts = data['texts'] if batch else [data['text']]
+        k = int(data.get('k', 10))
+        min_score = data.get('min_score')
+        
+        started = time.perf_counter()
+        results = embedding_index.search(
+            texts, k=k, kind=data.get('kind'),
+            min_score=float(min_score) if min_score is not None else None
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        return jsonify({
+            "success": True,
+            "results": results if batch else results[0],
+            "search_time_ms": round(elapsed_ms, 3),
+            "indexed_items": len(embedding_index)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in semantic_search endpoint: {str(e)}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/index-texts', methods=['POST'])
+def index_texts():
+    """Add regulatory texts to the BM25 keyword index"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('items'), list):
+            return jsonify({"error": "Liste d'éléments requise (items: [{id, text, title}])"}), 400
+        if not text_analyzer.nlp:
+            return jsonify({"error": "Modèle NLP non disponible"}), 503
+        
+        items = [item for item in data['items'] if item.get('id') is not None and item.get('text')]
+        indexed = keyword_index.add_many(items)
+        
+        if keyword_index.persist:
+            keyword_index.save_in_background()
+        
+        return jsonify({
+            "success": True,
+            "indexed": indexed,
+            "index": keyword_index.stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in index_texts endpoint: {str(e)}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/index-texts/<item_id>', methods=['DELETE'])
+def remove_indexed_text(item_id):
+    """Remove a text from the BM25 keyword index"""
+    removed = keyword_index.remove(item_id)
+    return jsonify({"success": removed}), 200 if removed else 404
+
+
+@app.route('/keyword-search', methods=['POST'])
+def keyword_search():
+    """BM25 search over the lemmas of the indexed texts (operator: 'or' or 'and')"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('query'):
+            return jsonify({"error": "Requête requise (query)"}), 400
+        if not text_analyzer.nlp:
+            return jsonify({"error": "Modèle NLP non disponible"}), 503
+        
+        operator = data.get('operator', 'or')
+        if operator not in ('or', 'and'):
+            return jsonify({"error": "Opérateur invalide (or, and)"}), 400
+        
+        started = time.perf_counter()
+        results, terms = keyword_index.search(data['query'], k=max(int(data.get('k', 10)), 1), operator=operator)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        return jsonify({
+            "success": True,
+            "results": results,
+            "query_terms": terms,
+            "count": len(results),
+            "search_time_ms": round(elapsed_ms, 3),
+            "indexed_documents": len(keyword_index)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in keyword_search endpoint: {str(e)}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+
 @app.route('/test-model', methods=['GET'])
 def test_model():
     """Test endpoint to verify model availability"""
@@ -2212,7 +6883,8 @@ def test_model():
         return jsonify({
             "success": True,
             "gemini_models": available_models,
-            "current_gemini_model": "gemini-flash-latest",
+            "current_gemini_model": GEMINI_MODEL_NAME,
+            "generative_backend": GENERATIVE_BACKEND,
             "spacy_model": "fr_core_news_md" if nlp else "not_loaded",
             "spacy_test": spacy_test
         })
@@ -2286,9 +6958,47 @@ def generate_performance_report():
             return jsonify({"error": "Statistiques requises"}), 400
         
         statistics = data['statistics']
-        report = performance_nlp.generate_performance_report(statistics)
-        
-        return jsonify(report)
+        tenant = str(data.get('tenant') or 'global')
+        
+        # Every report request is a snapshot of the tenant's history; recorded
+        # first so the trend (and the validator) account for it
+        if statistics_history.enabled:
+            try:
+                statistics_history.record(statistics, tenant)
+            except Exception as e:
+                logger.warning(f"Could not record statistics snapshot: {e}")
+        if anomaly_detector.enabled:
+            try:
+                if anomaly_detector.update(statistics, tenant) is None:
+                    logger.warning(f"Anomaly detector tenant cap reached, {tenant} not tracked")
+            except Exception as e:
+                logger.warning(f"Could not update anomaly detector: {e}")
+        
+        # Weak validator: the same statistics and history give the same report (up
+        # to generated_at), so a matching ETag needs neither the report nor the
+        # transfer. The ETag is per representation (JSON / MessagePack / CBOR).
+        # A 304 on this POST is a private contract with the C# server, which
+        # sends If-None-Match with the ETag of the report it already holds;
+        # generic HTTP caches do not revalidate POST responses
+        representation = negotiated_binary_format() or 'json'
+        etag = '{}-{}'.format(performance_nlp.report_fingerprint(statistics, tenant), representation)
+        if request.if_none_match.contains_weak(etag):
+            metrics.increment('report_cache.not_modified')
+            response = app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            # Same Vary as the 200 it validates (compress_response skips 304s)
+            if BINARY_MIMETYPES:
+                response.vary.add('Accept')
+            if COMPRESSION_ENCODINGS:
+                response.vary.add('Accept-Encoding')
+            return response
+        
+        report, fingerprint = performance_nlp.cached_performance_report(statistics, tenant)
+        response = jsonify(report)
+        # Only successful reports get a validator (fallbacks must not be revalidated)
+        if report.get('success'):
+            response.set_etag('{}-{}'.format(fingerprint, representation), weak=True)
+        return response
         
     except Exception as e:
         logger. error(f"Error in generate_performance_report endpoint: {str(e)}")
@@ -2299,6 +7009,201 @@ def generate_performance_report():
         }), 200
 
 
+@app.route('/generate-performance-reports', methods=['POST'])
+def generate_performance_reports():
+    """
+    Per-company performance reports for many statistics records in one call:
+    {"records": [{"id": ..., "statistics": {...}}, ...]} (or bare statistics objects)
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('records'), list) or not data['records']:
+            return jsonify({"error": "Liste d'enregistrements statistiques requise (records)"}), 400
+        
+        max_records = int(os.getenv('BULK_REPORT_MAX_RECORDS', 10000))
+        if len(data['records']) > max_records:
+            return jsonify({"error": "Trop d'enregistrements (maximum {})".format(max_records)}), 413
+        
+        ids = []
+        records = []
+        for index, record in enumerate(data['records']):
+            if not isinstance(record, dict):
+                return jsonify({"error": "Enregistrement {} invalide".format(index)}), 400
+            statistics = record.get('statistics', record)
+            if not isinstance(statistics, dict):
+                return jsonify({"error": "Statistiques de l'enregistrement {} invalides".format(index)}), 400
+            invalid_field = invalid_statistics_field(statistics)
+            if invalid_field:
+                return jsonify({"error": "Statistiques de l'enregistrement {} invalides: {} doit être numérique".format(
+                    index, invalid_field)}), 400
+            ids.append(record.get('id', statistics.get('companyId', index)))
+            records.append(statistics)
+        
+        reports = performance_nlp.generate_bulk_reports(records)
+        
+        return jsonify({
+            "success": True,
+            "reports": [dict(report, id=record_id) for record_id, report in zip(ids, reports)],
+            "count": len(reports)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in generate_performance_reports endpoint: {str(e)}")
+        return jsonify({"success": False, "error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/statistics-history', methods=['POST'])
+def record_statistics_history():
+    """
+    Record (or backfill) statistics snapshots of a tenant:
+    {"tenant": ..., "snapshots": [{"timestamp": ..., "statistics": {...}}, ...]}
+    or a single {"tenant": ..., "timestamp": ..., "statistics": {...}}
+    """
+    try:
+        data = request.get_json()
+        
+        if not statistics_history.enabled:
+            return jsonify({"error": "Historique des statistiques désactivé"}), 503
+        if not data or not ('statistics' in data or isinstance(data.get('snapshots'), list)):
+            return jsonify({"error": "Statistiques requises (statistics ou snapshots)"}), 400
+        
+        tenant = str(data.get('tenant') or 'global')
+        snapshots = data.get('snapshots') or [{'statistics': data['statistics'], 'timestamp': data.get('timestamp')}]
+        parsed = []
+        for index, snapshot in enumerate(snapshots):
+            if not isinstance(snapshot, dict) or not isinstance(snapshot.get('statistics'), dict):
+                return jsonify({"error": "Instantané {} invalide".format(index)}), 400
+            timestamp = snapshot.get('timestamp')
+            try:
+                if isinstance(timestamp, str):
+                    timestamp = datetime.fromisoformat(timestamp).timestamp()
+                elif timestamp is not None:
+                    timestamp = float(timestamp)
+            except (TypeError, ValueError):
+                return jsonify({"error": "Horodatage invalide (ISO 8601 ou secondes epoch)"}), 400
+            try:
+                StatisticsHistory.snapshot_metrics(snapshot['statistics'])
+            except ValueError as e:
+                return jsonify({"error": "Statistiques de l'instantané {} invalides: {}".format(index, e)}), 400
+            parsed.append((snapshot, timestamp))
+        
+        buckets = []
+        for snapshot, timestamp in parsed:
+            buckets.append(statistics_history.record(snapshot['statistics'], tenant, timestamp))
+            if not anomaly_detector.enabled:
+                continue
+            try:
+                if anomaly_detector.update(snapshot['statistics'], tenant, timestamp) is None:
+                    logger.warning(f"Anomaly detector tenant cap reached, {tenant} not tracked")
+            except Exception as e:
+                logger.warning(f"Could not update anomaly detector: {e}")
+        
+        return jsonify({
+            "success": True,
+            "tenant": tenant,
+            "recorded": len(buckets),
+            "revision": statistics_history.revision(tenant)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in record_statistics_history endpoint: {str(e)}")
+        return jsonify({"success": False, "error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/anomalies', methods=['POST'])
+def push_anomaly_snapshot():
+    """
+    Push a statistics snapshot to the online anomaly detector:
+    {"tenant": ..., "timestamp": ..., "statistics": {...}}; returns the metrics it flags
+    """
+    try:
+        data = request.get_json()
+        
+        if not anomaly_detector.enabled:
+            return jsonify({"error": "Détection d'anomalies désactivée"}), 503
+        if not data or not isinstance(data.get('statistics'), dict):
+            return jsonify({"error": "Statistiques requises"}), 400
+        
+        tenant = str(data.get('tenant') or 'global')
+        timestamp = data.get('timestamp')
+        try:
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp).timestamp()
+            elif timestamp is not None:
+                timestamp = float(timestamp)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Horodatage invalide (ISO 8601 ou secondes epoch)"}), 400
+        try:
+            StatisticsHistory.snapshot_metrics(data['statistics'])
+        except ValueError as e:
+            return jsonify({"error": "Statistiques invalides: {}".format(e)}), 400
+        
+        anomalies = anomaly_detector.update(data['statistics'], tenant, timestamp)
+        if anomalies is None:
+            return jsonify({"error": "Nombre maximal de clients suivis atteint ({})".format(
+                anomaly_detector.max_tenants)}), 429
+        
+        return jsonify({
+            "success": True,
+            "tenant": tenant,
+            "anomalies": anomalies,
+            "count": len(anomalies)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in push_anomaly_snapshot endpoint: {str(e)}")
+        return jsonify({"success": False, "error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/anomalies/<tenant>', methods=['GET'])
+def anomaly_state(tenant):
+    """Current detector state of a tenant (?active=true for the flagged metrics only)"""
+    try:
+        if not anomaly_detector.enabled:
+            return jsonify({"error": "Détection d'anomalies désactivée"}), 503
+        state = anomaly_detector.state(tenant)
+        if state is None:
+            return jsonify({"error": "Aucun instantané pour ce client"}), 404
+        
+        active = [s for s in state.values() if s['anomalous']]
+        if request.args.get('active', 'false').lower() == 'true':
+            state = {s['metric']: s for s in active}
+        
+        return jsonify({
+            "success": True,
+            "tenant": tenant,
+            "metrics": state,
+            "active_anomalies": len(active)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in anomaly_state endpoint: {str(e)}")
+        return jsonify({"success": False, "error": "Erreur interne du serveur"}), 500
+
+
+@app.route('/statistics-history/<tenant>/trends', methods=['GET'])
+def statistics_history_trends(tenant):
+    """Trends of a tenant's recorded series (?metrics=a,b to restrict them)"""
+    try:
+        if not statistics_history.enabled:
+            return jsonify({"error": "Historique des statistiques désactivé"}), 503
+        
+        requested = [m for m in request.args.get('metrics', '').split(',') if m.strip()]
+        trends = statistics_history.analyze(tenant, [m.strip() for m in requested] or None)
+        
+        return jsonify({
+            "success": True,
+            "tenant": tenant,
+            "trends": trends,
+            "count": len(trends)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in statistics_history_trends endpoint: {str(e)}")
+        return jsonify({"success": False, "error": "Erreur interne du serveur"}), 500
+
+
 @app.route('/text-similarity', methods=['POST'])
 def text_similarity():
     """Calculate semantic similarity between two texts"""
@@ -2352,7 +7257,14 @@ def extract_keywords():
 
 
 if __name__ == '__main__':
+    # SIGTERM exits normally so the indexes, pool and detector state are saved (atexit)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    debug = True
+    # With the debug reloader this module also runs in the watching parent:
+    # only the serving child (WERKZEUG_RUN_MAIN) gets background workers
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
     port = int(os. getenv('FLASK_PORT', 5000))
     logger.info("Starting NLP Service on port {}".format(port))
     logger.info("spaCy model loaded: {}".format(nlp is not None))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Benchmark corpus built from the documents bundled with the C# server
+
+Sources are read offline from server/Uploads/Texts and server/wwwroot/pdfs.
+Real PDFs go through pypdf; some review exports are plain text saved with a
+.pdf extension and are read as UTF-8. Duplicate documents are dropped, and
+inputs of a given size are cut deterministically from the concatenated text.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import random
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SOURCE_DIRS = [
+    os.path.join(REPO_ROOT, 'server', 'Uploads', 'Texts'),
+    os.path.join(REPO_ROOT, 'server', 'wwwroot', 'pdfs')
+]
+MIN_DOCUMENT_WORDS = 5
+
+
+def extract_text(path):
+    """Text of one bundled document (PDF or plain text with a .pdf extension)"""
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    if not content.startswith(b'%PDF'):
+        return content.decode('utf-8', errors='replace')
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("pypdf est requis pour les benchmarks: pip install -r requirements-dev.txt")
+
+    import io
+    reader = PdfReader(io.BytesIO(content))
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+class BenchmarkCorpus:
+    """Deduplicated documents plus deterministic samplers of words, texts and statistics"""
+
+    def __init__(self, source_dirs=SOURCE_DIRS, seed=42):
+        self.seed = seed
+        self.documents = []
+        self.sources = []
+        self.skipped = []
+        seen = set()
+
+        for directory in source_dirs:
+            for path in sorted(glob.glob(os.path.join(directory, '*.pdf'))):
+                relative = os.path.relpath(path, REPO_ROOT)
+                try:
+                    text = ' '.join(extract_text(path).split())
+                except Exception as e:
+                    self.skipped.append({'source': relative, 'reason': str(e)})
+                    continue
+                digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                if len(text.split()) < MIN_DOCUMENT_WORDS or digest in seen:
+                    continue
+                seen.add(digest)
+                self.documents.append(text)
+                self.sources.append({'source': relative, 'sha256': digest, 'words': len(text.split())})
+
+        if not self.documents:
+            raise RuntimeError("Aucun document exploitable dans {}".format(', '.join(source_dirs)))
+
+        self.words = ' '.join(self.documents).split()
+        self.sentences = [s.strip() + '.' for doc in self.documents for s in doc.split('.') if len(s.split()) >= 3]
+
+    def fingerprint(self):
+        digest = hashlib.sha256()
+        for source in self.sources:
+            digest.update(source['sha256'].encode('utf-8'))
+        return digest.hexdigest()
+
+    def describe(self):
+        return {
+            'documents': len(self.documents),
+            'words': len(self.words),
+            'sentences': len(self.sentences),
+            'sha256': self.fingerprint(),
+            'sources': self.sources,
+            'skipped': self.skipped
+        }
+
+    def text(self, n_words, variant=0):
+        """n_words of corpus text; variants start at different offsets (wrapping around)"""
+        start = (variant * 997) % len(self.words)
+        return ' '.join(self.words[(start + i) % len(self.words)] for i in range(n_words))
+
+    def texts(self, count, n_words, variant=0):
+        return [self.text(n_words, variant * count + i) for i in range(count)]
+
+    def plans(self, count, variant=0):
+        """Subscription plans whose names and features are drawn from corpus sentences"""
+        rng = random.Random(self.seed + variant)
+        plans = []
+        for plan_id in range(1, count + 1):
+            features = rng.sample(self.sentences, min(len(self.sentences), rng.randint(3, 6)))
+            plans.append({
+                'planId': plan_id,
+                'name': ' '.join(rng.sample(self.words, 2)).title(),
+                'basePrice': round(rng.uniform(10, 200), 2),
+                'discount': rng.choice([0, 0, 5, 10]),
+                'userLimit': rng.choice([5, 10, 25, 50]),
+                'features': json.dumps(features, ensure_ascii=False)
+            })
+        return plans
+
+    def statistics(self, plan_count, variant=0, plans=None):
+        """Statistics payload shaped like the C# StatisticsController output"""
+        rng = random.Random(self.seed * 31 + variant)
+        plans = plans or self.plans(plan_count, variant)
+        total_companies = rng.randint(50, 500)
+        active_companies = rng.randint(total_companies // 3, total_companies)
+        total_actions = rng.randint(100, 5000)
+        total_texts = rng.randint(50, 2000)
+        return {
+            'totalCompanies': total_companies,
+            'activeCompanies': active_companies,
+            'avgUsersPerCompany': round(rng.uniform(1, 15), 2),
+            'totalActions': total_actions,
+            'completedActions': rng.randint(0, total_actions),
+            'totalTexts': total_texts,
+            'compliantTexts': rng.randint(0, total_texts),
+            'subscriptionDistribution': [
+                {
+                    'planId': plan['planId'],
+                    'planName': plan['name'],
+                    'count': rng.randint(0, active_companies // 2),
+                    'avgUsers': round(rng.uniform(1, plan['userLimit']), 2)
+                }
+                for plan in plans
+            ]
+        }
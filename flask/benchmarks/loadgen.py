@@ -0,0 +1,172 @@
+"""
+Load generator for the NLP service HTTP endpoints
+
+Sends concurrent requests built from the benchmark corpus and reports
+end-to-end throughput and tail latency per endpoint. Either targets a running
+service (--url) or starts the app in-process on the local Gemini stand-in
+(--in-process), so load tests never reach the real Gemini API.
+
+Usage (from the flask/ directory):
+    GENERATIVE_BACKEND=standin python app.py &
+    python benchmarks/loadgen.py --url http://localhost:5000 --concurrency 16 --duration 30
+    python benchmarks/loadgen.py --in-process --endpoint analyze-action --requests 500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np  # noqa: E402
+
+from corpus import BenchmarkCorpus  # noqa: E402
+
+
+def description(corpus, rng):
+    """A distinct action description (random corpus window) so duplicate reuse does not kick in"""
+    return corpus.text(rng.randint(15, 60), rng.randint(0, 10 ** 6))
+
+
+PAYLOADS = {
+    'analyze-action': lambda corpus, rng: {
+        'description': description(corpus, rng),
+        'domain': rng.choice([None, 'Environnement', 'Qualité', 'Santé et sécurité au travail'])
+    },
+    'batch-analyze': lambda corpus, rng: {
+        'actions': [{'actionId': i, 'description': description(corpus, rng)} for i in range(rng.randint(5, 20))]
+    },
+    'analyze-text': lambda corpus, rng: {'text': description(corpus, rng)},
+    'suggest-taxonomy': lambda corpus, rng: {'existing_domains': ['Environnement', 'Qualité']},
+    'generate-performance-report': lambda corpus, rng: {
+        'statistics': corpus.statistics(rng.randint(3, 10), rng.randint(0, 10 ** 6))
+    }
+}
+
+
+class EndpointStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.status_codes = {}
+
+    def record(self, latency, status):
+        with self.lock:
+            self.latencies.append(latency)
+            self.status_codes[status] = self.status_codes.get(status, 0) + 1
+            if status != 200:
+                self.errors += 1
+
+    def summary(self, elapsed):
+        latencies_ms = np.array(self.latencies or [0.0]) * 1000
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'status_codes': {str(k): v for k, v in self.status_codes.items()},
+            'throughput_per_s': round(len(self.latencies) / elapsed, 3) if elapsed else 0,
+            'latency_ms': {
+                'p50': round(float(np.percentile(latencies_ms, 50)), 2),
+                'p90': round(float(np.percentile(latencies_ms, 90)), 2),
+                'p99': round(float(np.percentile(latencies_ms, 99)), 2),
+                'max': round(float(latencies_ms.max()), 2)
+            }
+        }
+
+
+def post(url, payload, timeout):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return 0
+
+
+def start_in_process_server():
+    """Run the app on the stand-in backend in a background thread; returns its base URL"""
+    os.environ['GENERATIVE_BACKEND'] = 'standin'
+    os.environ.setdefault('CLASSIFIER_RECORD_PAIRS', 'false')
+    os.environ.setdefault('DUPLICATE_INDEX_PERSIST', 'false')
+    os.environ.setdefault('DOC_CACHE_PERSIST', 'false')
+    os.environ.setdefault('TAXONOMY_POOL_PERSIST', 'false')
+    os.environ.setdefault('STATS_HISTORY_ENABLED', 'false')
+    os.environ.setdefault('ANOMALY_DETECTOR_ENABLED', 'false')
+    from werkzeug.serving import make_server
+    import app
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return 'http://127.0.0.1:{}'.format(server.server_port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NLP service load generator")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--in-process', action='store_true', help="Start the app locally on the Gemini stand-in")
+    parser.add_argument('--endpoint', action='append', choices=sorted(PAYLOADS),
+                        help="Endpoints to exercise (default: analyze-action and batch-analyze)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds to run (ignored with --requests)")
+    parser.add_argument('--requests', type=int, help="Total number of requests instead of a duration")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the JSON summary to this file")
+    args = parser.parse_args()
+
+    base_url = start_in_process_server() if args.in_process else args.url.rstrip('/')
+    endpoints = args.endpoint or ['analyze-action', 'batch-analyze']
+    corpus = BenchmarkCorpus(seed=args.seed)
+    stats = {endpoint: EndpointStats() for endpoint in endpoints}
+    counter = {'sent': 0}
+    counter_lock = threading.Lock()
+    started = time.perf_counter()
+
+    def worker(worker_id):
+        rng = random.Random(args.seed * 1000 + worker_id)
+        while True:
+            with counter_lock:
+                if args.requests is not None and counter['sent'] >= args.requests:
+                    return
+                if args.requests is None and time.perf_counter() - started >= args.duration:
+                    return
+                counter['sent'] += 1
+            endpoint = rng.choice(endpoints)
+            payload = PAYLOADS[endpoint](corpus, rng)
+            t0 = time.perf_counter()
+            status = post('{}/{}'.format(base_url, endpoint), payload, args.timeout)
+            stats[endpoint].record(time.perf_counter() - t0, status)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        'target': base_url,
+        'in_process': args.in_process,
+        'concurrency': args.concurrency,
+        'elapsed_s': round(elapsed, 2),
+        'endpoints': {endpoint: s.summary(elapsed) for endpoint, s in stats.items()}
+    }
+    for endpoint, result in summary['endpoints'].items():
+        print("{:<30} {:>6} req  {:>4} err  {:>8.2f}/s  p50 {:>9.1f} ms  p99 {:>9.1f} ms".format(
+            endpoint, result['requests'], result['errors'], result['throughput_per_s'],
+            result['latency_ms']['p50'], result['latency_ms']['p99']))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
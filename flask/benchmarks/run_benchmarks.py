@@ -0,0 +1,308 @@
+"""
+Reproducible benchmarks for the NLP service
+
+Measures the main TextAnalyzer / NLPService / PerformanceReportNLP entry points
+at several input sizes on a corpus extracted from the bundled documents, and
+writes throughput, p50/p99 latency, peak traced memory and the number of
+allocations still held by the result to a JSON file.
+
+Usage (from the flask/ directory):
+    python benchmarks/run_benchmarks.py [--quick] [--only NAME] [--output PATH]
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<old>.json
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from importlib import metadata
+
+# Benchmarks must not write training pairs or persist indexes
+os.environ.setdefault('CLASSIFIER_RECORD_PAIRS', 'false')
+os.environ.setdefault('DUPLICATE_INDEX_PERSIST', 'false')
+os.environ.setdefault('DOC_CACHE_PERSIST', 'false')
+os.environ.setdefault('EMBEDDING_INDEX_PERSIST', 'false')
+os.environ.setdefault('KEYWORD_INDEX_PERSIST', 'false')
+os.environ.setdefault('JOB_WORKER_THREADS', '0')
+os.environ.setdefault('TAXONOMY_POOL_WORKER', 'false')
+os.environ.setdefault('TAXONOMY_POOL_PERSIST', 'false')
+os.environ.setdefault('TAXONOMY_TREE_PERSIST', 'false')
+os.environ.setdefault('STATS_HISTORY_ENABLED', 'false')
+os.environ.setdefault('ANOMALY_DETECTOR_ENABLED', 'false')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np  # noqa: E402
+
+import app  # noqa: E402
+from corpus import BenchmarkCorpus, REPO_ROOT  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+# ============== BENCHMARK CASES ==============
+# Each case maps a size to a list of prepared inputs (one per iteration) and a
+# callable taking one input. Inputs differ per iteration and the Doc cache is
+# cleared before each measured pass, so caches do not hide the parsing cost.
+
+def case_analyze_text(corpus, size, iterations):
+    inputs = [corpus.text(size, i) for i in range(iterations)]
+    return inputs, app.text_analyzer.analyze_text
+
+
+def case_extract_keywords_tfidf(corpus, size, iterations):
+    inputs = [corpus.texts(size, 100, i) for i in range(iterations)]
+    return inputs, app.text_analyzer.extract_keywords_tfidf
+
+
+def case_calculate_text_similarity(corpus, size, iterations):
+    inputs = [(corpus.text(size, 2 * i), corpus.text(size, 2 * i + 1)) for i in range(iterations)]
+    return inputs, lambda pair: app.text_analyzer.calculate_text_similarity(*pair)
+
+
+def case_analyze_subscription_patterns(corpus, size, iterations):
+    inputs = []
+    for i in range(iterations):
+        plans = corpus.plans(size, i)
+        inputs.append((corpus.statistics(size, i, plans), plans))
+    return inputs, lambda args: app.nlp_service.analyze_subscription_patterns(*args)
+
+
+def case_generate_performance_report(corpus, size, iterations):
+    inputs = [corpus.statistics(size, i) for i in range(iterations)]
+    return inputs, app.performance_nlp.generate_performance_report
+
+
+BENCHMARKS = {
+    'analyze_text': ('words', [50, 500, 5000], case_analyze_text),
+    'extract_keywords_tfidf': ('documents', [10, 100, 1000], case_extract_keywords_tfidf),
+    'calculate_text_similarity': ('words', [50, 500, 5000], case_calculate_text_similarity),
+    'analyze_subscription_patterns': ('plans', [3, 10, 30], case_analyze_subscription_patterns),
+    'generate_performance_report': ('plans', [3, 30, 300], case_generate_performance_report)
+}
+
+
+# ============== MEASUREMENT ==============
+
+def measure(fn, inputs, warmup):
+    for item in inputs[:warmup]:
+        fn(item)
+    inputs = inputs[warmup:]
+
+    app.doc_cache.clear()
+    app.plan_cache.clear()
+    app.performance_nlp.clear_cache()
+    gc.collect()
+    latencies = []
+    started = time.perf_counter()
+    for item in inputs:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    # Peak memory is measured on a separate run: tracemalloc slows everything down.
+    # Blocks still traced while the result is alive are the allocations it retains.
+    app.doc_cache.clear()
+    app.plan_cache.clear()
+    app.performance_nlp.clear_cache()
+    gc.collect()
+    tracemalloc.start()
+    result = fn(inputs[0])
+    _, peak = tracemalloc.get_traced_memory()
+    retained = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'iterations': len(inputs),
+        'throughput_per_s': round(len(inputs) / elapsed, 3),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies_ms, 50)), 3),
+            'p99': round(float(np.percentile(latencies_ms, 99)), 3),
+            'mean': round(float(latencies_ms.mean()), 3),
+            'min': round(float(latencies_ms.min()), 3),
+            'max': round(float(latencies_ms.max()), 3)
+        },
+        'peak_memory_kb': round(peak / 1024, 1),
+        'retained_blocks': sum(stat.count for stat in retained.statistics('filename'))
+    }
+
+
+def serialization_payloads(corpus, quick):
+    """Response bodies of the large endpoints, built without calling Gemini"""
+    batch_size = 10 if quick else 100
+    batch = {
+        'success': True,
+        'results': [
+            {'actionId': i, 'analysis': app.nlp_service._get_fallback_response(corpus.text(40, i))}
+            for i in range(batch_size)
+        ],
+        'nlp_used': True,
+        'count': batch_size
+    }
+    plans = corpus.plans(10 if quick else 30)
+    subscription = {
+        'success': True,
+        'analysis': app.nlp_service.analyze_subscription_patterns(corpus.statistics(len(plans), plans=plans), plans)
+    }
+    report = app.performance_nlp.generate_performance_report(corpus.statistics(30 if quick else 300))
+    return {
+        'batch-analyze ({} actions)'.format(batch_size): batch,
+        'analyze-subscription-performance ({} plans)'.format(len(plans)): subscription,
+        'generate-performance-report': report
+    }
+
+
+def serialization_report(corpus, quick, repeat=20):
+    """Serialization time and payload size: Flask stdlib JSON vs orjson, raw vs gzip/brotli"""
+    import json as stdlib_json
+
+    def timed(fn):
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = fn()
+            samples.append(time.perf_counter() - t0)
+        return out, round(float(np.percentile(np.array(samples) * 1000, 50)), 4)
+
+    rows = []
+    for name, payload in serialization_payloads(corpus, quick).items():
+        # Flask's DefaultJSONProvider settings (compact, sorted keys, ASCII escapes)
+        stdlib_body, stdlib_ms = timed(lambda: stdlib_json.dumps(
+            payload, ensure_ascii=True, sort_keys=True, separators=(',', ':'),
+            default=app.service_json_default).encode('utf-8'))
+        row = {
+            'payload': name,
+            'stdlib_json': {'ms': stdlib_ms, 'bytes': len(stdlib_body)}
+        }
+        body = stdlib_body
+        if app.orjson:
+            body, orjson_ms = timed(lambda: app.orjson.dumps(
+                payload, default=app.service_json_default, option=app.OrjsonProvider.options))
+            row['orjson'] = {'ms': orjson_ms, 'bytes': len(body)}
+        compressed, gzip_ms = timed(lambda: app.compress_payload(body, 'gzip'))
+        row['gzip'] = {'ms': gzip_ms, 'bytes': len(compressed)}
+        if app.brotli:
+            compressed, br_ms = timed(lambda: app.compress_payload(body, 'br'))
+            row['br'] = {'ms': br_ms, 'bytes': len(compressed)}
+        rows.append(row)
+
+        print("{:<48} ".format(name) + '  '.join(
+            "{} {:.3f} ms / {} B".format(k, v['ms'], v['bytes']) for k, v in row.items() if k != 'payload'))
+    return rows
+
+
+def environment(corpus, seed, iterations):
+    def git(*args):
+        try:
+            return subprocess.check_output(['git'] + list(args), cwd=REPO_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+        except Exception:
+            return None
+
+    versions = {}
+    for package in ('spacy', 'numpy', 'scikit-learn', 'flask', 'fr_core_news_md'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    return {
+        'git_commit': git('rev-parse', 'HEAD'),
+        'git_dirty': bool(git('status', '--porcelain', '--', 'flask')),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+        'nlp_model': 'fr_core_news_md' if app.nlp else None,
+        'lexicon_version': app.lexicon_store.current.version,
+        'seed': seed,
+        'iterations': iterations,
+        'corpus': corpus.describe()
+    }
+
+
+def compare(current, baseline_path, tolerance):
+    """Print p50 ratios against a previous result file; returns the regressions"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['benchmark'], r['size']): r for r in baseline['results']}
+    regressions = []
+
+    print("\n{:<32} {:>8} {:>12} {:>12} {:>8}".format('benchmark', 'size', 'p50 before', 'p50 after', 'ratio'))
+    for result in current['results']:
+        old = previous.get((result['benchmark'], result['size']))
+        if not old:
+            continue
+        before = old['latency_ms']['p50']
+        after = result['latency_ms']['p50']
+        ratio = after / before if before else float('inf')
+        flag = ' !' if ratio > 1 + tolerance else ''
+        print("{:<32} {:>8} {:>12.3f} {:>12.3f} {:>7.2f}x{}".format(
+            result['benchmark'], result['size'], before, after, ratio, flag))
+        if flag:
+            regressions.append(result['benchmark'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NLP service benchmarks")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--quick', action='store_true', help="Smallest size of each benchmark, 5 iterations")
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument('--output', help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="Previous result file to diff against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed p50 slowdown before flagging")
+    parser.add_argument('--no-serialization', action='store_true', help="Skip the serialization/compression report")
+    args = parser.parse_args()
+
+    if not app.nlp:
+        logger.warning("spaCy model not loaded - NLP timings will only cover the fallback paths")
+
+    iterations = 5 if args.quick else args.iterations
+    corpus = BenchmarkCorpus(seed=args.seed)
+    report = {'meta': environment(corpus, args.seed, iterations), 'results': []}
+
+    for name in args.only or list(BENCHMARKS):
+        unit, sizes, make_case = BENCHMARKS[name]
+        for size in (sizes[:1] if args.quick else sizes):
+            inputs, fn = make_case(corpus, size, iterations + args.warmup)
+            result = measure(fn, inputs, args.warmup)
+            report['results'].append(dict({'benchmark': name, 'size': size, 'size_unit': unit}, **result))
+            print("{:<32} {:>6} {:<9} p50 {:>10.3f} ms  p99 {:>10.3f} ms  {:>9.2f}/s  peak {:>10.1f} KB  "
+                  "retained {:>7} blocks".format(
+                      name, size, unit, result['latency_ms']['p50'], result['latency_ms']['p99'],
+                      result['throughput_per_s'], result['peak_memory_kb'], result['retained_blocks']))
+
+    if not args.no_serialization:
+        print()
+        report['serialization'] = serialization_report(corpus, args.quick)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, '{}.json'.format((report['meta']['git_commit'] or 'unknown')[:12]))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("\nResults written to {}".format(output))
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Standalone worker for the bulk analysis job queue
+
+Drains jobs submitted through POST /jobs from the shared SQLite queue, in
+batches, through the same spaCy + Gemini pipeline as the service. Run as many
+processes as needed; SIGTERM / Ctrl+C finishes the current item and gives the
+rest of the batch back to the queue.
+
+Usage: python job_worker.py [--threads N]
+"""
+import argparse
+import logging
+import os
+import signal
+import threading
+
+# The service must not start its own background workers inside this process
+os.environ['JOB_WORKER_THREADS'] = '0'
+os.environ['TAXONOMY_POOL_WORKER'] = 'false'
+
+from app import job_queue  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued analysis jobs")
+    parser.add_argument('--threads', type=int, default=1, help="Worker threads in this process")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info("Stopping job worker after the current item")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    threads = [
+        threading.Thread(target=job_queue.run_worker, kwargs={'stop': stop}, name='job-worker-{}'.format(i))
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(0.5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Offline training of the local priority/effort classifier
+
+Reads the (spaCy features, Gemini labels) pairs recorded by /analyze-action,
+fits the ActionClassifier and writes the model the service hot-loads.
+
+Usage: python train_classifier.py [--pairs PATH] [--min-area-support N]
+"""
+import argparse
+import json
+import logging
+import os
+
+# Offline training must not run queued jobs or refill the taxonomy pool
+os.environ['JOB_WORKER_THREADS'] = '0'
+os.environ['TAXONOMY_POOL_WORKER'] = 'false'
+
+from app import action_classifier, CLASSIFIER_PAIRS_PATH  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def load_pairs(path):
+    pairs = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                pairs.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed pair on line {line_number}")
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local action classifier")
+    parser.add_argument('--pairs', default=CLASSIFIER_PAIRS_PATH, help="JSONL file of recorded pairs")
+    parser.add_argument('--min-area-support', type=int, default=5,
+                        help="Minimum occurrences for a compliance area to become a label")
+    parser.add_argument('--test-size', type=float, default=0.2, help="Holdout fraction for evaluation")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.pairs)
+    logger.info(f"Loaded {len(pairs)} pairs from {args.pairs}")
+
+    try:
+        metadata = action_classifier.train(pairs, min_area_support=args.min_area_support, test_size=args.test_size)
+    except ValueError as e:
+        raise SystemExit("Entraînement impossible: {}".format(e))
+    print(json.dumps(metadata, indent=2, ensure_ascii=False))
+    print("Model written to {}".format(action_classifier.model_path))
+
+
+if __name__ == '__main__':
+    main()